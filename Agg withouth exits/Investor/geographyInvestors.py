@@ -1,14 +1,6 @@
 import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import Library as mylib
 
-# Optional dependency for city -> US state mapping (works offline)
-try:
-    import pgeocode  # uses local GeoNames data packaged in the library
-    HAS_PGEO = True
-except ImportError:
-    HAS_PGEO = False
 
 # Load data from DB_Out using Library helpers
 df_inv = mylib.openDB("investors").copy()
@@ -57,117 +49,37 @@ df_world = (
     .nunique()
     .rename(columns={"InvestorID": "Investors"})
 )
-df_world["CountryISO3"] = df_world["Country"].apply(mylib.to_iso3)
+df_world["CountryISO3"] = mylib.countryISO3(df_world["Country"])
 df_world = df_world[df_world["CountryISO3"].notna()]
 
 # World map (countries only, USA excluded)
-fig_world = px.choropleth(
+fig_world = mylib.choroplethMap(
     df_world,
-    locations="CountryISO3",
-    color="Investors",
-    hover_name="Country",
-    color_continuous_scale="Reds",
-    projection="natural earth",
-)
-fig_world.update_layout(
+    "CountryISO3",
+    "Investors",
     title="Investors per Country (USA detailed separately)",
-    coloraxis_colorbar_title="Investors",
-    margin=dict(l=0, r=0, t=40, b=0),
+    decimals=0,
+    hover_name="Country",
 )
-fig_world.update_layout(font=dict(size=16))
-for _, row in df_world.iterrows():
-    fig_world.add_trace(
-        go.Scattergeo(
-            locationmode="ISO-3",
-            locations=[row["CountryISO3"]],
-            text=[int(row["Investors"])],
-            mode="text",
-            showlegend=False,
-        )
-    )
 fig_world.show()
 
 # ----- USA state-level map -----
-def _normalize_city_name(value):
-    if not isinstance(value, str):
-        return None
-    norm = value.strip()
-    return norm.casefold() if norm else None
-
-
-def build_city_to_state_map(cities):
-    """Resolve a set of US city names to USPS state codes using pgeocode.
-
-    Returns (mapping: dict[str,str], ambiguous: set[str], missing: set[str])
-    - mapping: only cities that resolve unambiguously to a single state
-    - ambiguous: cities that map to more than one state in GeoNames
-    - missing: cities not found in GeoNames dataset
-    """
-    mapping = {}
-    ambiguous = set()
-    missing = set()
-
-    if not HAS_PGEO:
-        # If pgeocode is not available, instruct to install it.
-        raise ImportError(
-            "pgeocode is required for city->state resolution. Install with: pip install pgeocode"
-        )
-
-    nomi = pgeocode.Nominatim("US")
-    data = nomi._data  # pandas DataFrame with columns including place_name and state_code
-
-    # Normalize once
-    series_place = data["place_name"].astype(str).str.strip()
-    cf_place = series_place.str.casefold()
-
-    for city in cities:
-        key_norm = _normalize_city_name(city)
-        if not key_norm:
-            continue
-        key_display = city.strip()
-        mask = cf_place == key_norm
-        matches = data.loc[mask]
-        if matches.empty:
-            # try a looser match (start of place name), e.g., "st louis" vs "saint louis"
-            # but do not auto-resolve across multiple states
-            loose = cf_place.str.startswith(key_norm)
-            matches = data.loc[loose]
-
-        if matches.empty:
-            missing.add(key_display)
-            continue
-
-        states = set(matches["state_code"].dropna().astype(str).str.upper().tolist())
-        if len(states) == 1:
-            mapping[key_norm] = next(iter(states))
-        else:
-            ambiguous.add(key_display)
-
-    return mapping, ambiguous, missing
-
-
 df_usa = df_inv[df_inv["Country"] == "United States"].copy()
 
-# Resolve US cities to state codes using pgeocode to avoid manual catalogs
-unique_cities = (
-    df_usa["City"].dropna().astype(str).str.strip().drop_duplicates().tolist()
-)
+# Resolve US cities to state codes with the shared GeoNames index (Library.resolveUSStates)
 try:
-    city_state_map, ambiguous_cities, missing_cities = build_city_to_state_map(unique_cities)
+    df_usa["StateCode"], ambiguous_cities, missing_cities = mylib.resolveUSStates(df_usa["City"])
 except ImportError as e:
-    # If pgeocode isn't installed, provide a clear message and stop US mapping gracefully
+    # No place index yet and pgeocode isn't installed: provide a clear message and stop US mapping gracefully
     print(str(e))
-    city_state_map, ambiguous_cities, missing_cities = {}, set(), set()
+    df_usa["StateCode"], ambiguous_cities, missing_cities = None, set(), set()
 
 if ambiguous_cities:
     print(f"Ambiguous cities (need manual resolution): {sorted(ambiguous_cities)[:20]}... total={len(ambiguous_cities)}")
 if missing_cities:
     print(f"Cities not found in GeoNames: {sorted(missing_cities)[:20]}... total={len(missing_cities)}")
 
-df_usa["CityNorm"] = df_usa["City"].map(_normalize_city_name)
-df_usa["StateCode"] = df_usa["CityNorm"].map(city_state_map)
 df_usa = df_usa[df_usa["StateCode"].notna()].copy()
-df_usa.drop(columns=["CityNorm"], inplace=True)
 
 df_usa_counts = (
     df_usa.groupby("StateCode", as_index=False)["InvestorID"]
@@ -175,21 +87,14 @@ df_usa_counts = (
     .rename(columns={"InvestorID": "Investors"})
 )
 
-fig_usa = go.Figure(
-    data=go.Choropleth(
-        locations=df_usa_counts["StateCode"],
-        z=df_usa_counts["Investors"],
-        locationmode="USA-states",
-        colorscale="Reds",
-        colorbar_title="Investors",
-    )
-)
-fig_usa.update_layout(
-    title_text="Investors per US State",
-    geo_scope="usa",
-    margin=dict(l=0, r=0, t=40, b=0),
+fig_usa = mylib.choroplethMap(
+    df_usa_counts,
+    "StateCode",
+    "Investors",
+    scope="usa",
+    title="Investors per US State",
+    labels=False,
 )
-fig_usa.update_layout(font=dict(size=16))
 
 # Show both figures
 fig_usa.show()
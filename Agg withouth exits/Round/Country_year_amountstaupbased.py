@@ -1,4 +1,3 @@
-import pandas as pd
 import Library as mylib
 import numpy as np
 import matplotlib.pyplot as plt
@@ -14,25 +13,21 @@ plt.rcParams.update({
 })
 
 #countryList=["Germany", "Italy", "United States", "France", "United Kingdom", "China"]
-df_round=mylib.openDB("rounds")
-db_exp=pd.read_parquet("DB_Out/DB_export.parquet", columns=["company_id","company_all_tags"])
-db_exp=mylib.space(db_exp, "company_id", True)
-db_exp=db_exp["company_id"]
-df_round=df_round[df_round["company_id"].isin(db_exp)]
-df_round=mylib.filterExits(df_round)
-df_round=df_round[["company_country", "round_date", "round_amount_usd"]]
-df_round.rename(columns={"company_country":"Country"}, inplace=True)
-df_round=mylib.toEU(df_round)
-df_round.rename(columns={"Country":"company_country"}, inplace=True)
-df_round["round_amount_usd"]=df_round["round_amount_usd"]/1000000000
+# space rounds summed by country and year from the round cube (filterExits only acts on a
+# "Round type" column, absent from DB_rounds, so the rounds were never exit-filtered here);
+# rounds without a country of their own are left out, not counted under their firm's country
+df_round=mylib.rollupCube(["company_country", "year"], where={"space": 1})
+df_round=df_round.dropna(subset=["company_country"])
+df_round=mylib.toEU(df_round, "company_country")
+df_round["round_amount_usd"]=df_round["amount_usd"]/1000000000
 df_top_c=df_round[["company_country", "round_amount_usd"]].groupby("company_country").sum()
 df_top_c.reset_index(inplace=True)
 df_top_c.sort_values(by="round_amount_usd", inplace=True, ascending=False)
 top_c=df_top_c["company_country"].head(5).to_list()
-df_round["round_date"]=df_round["round_date"].apply(mylib.getYear, by_row="compat")
+df_round=df_round.rename(columns={"year":"round_date"})
 df_round=df_round[df_round["round_date"]>=2010]
 df_round=df_round[df_round["company_country"].isin(top_c)]
-df_round=df_round.groupby(by=["company_country", "round_date"], sort=True).sum()
+df_round=df_round.groupby(by=["company_country", "round_date"], sort=True)[["round_amount_usd"]].sum()
 #df_round.reset_index(inplace=True)
 #df_round.sort_values(by="round_amount_usd", inplace=True, ascending=False)
 df_round=df_round.groupby("company_country")
@@ -1,6 +1,3 @@
-import json
-from pathlib import Path
-
 import matplotlib.pyplot as plt
 import pandas as pd
 
@@ -17,33 +14,6 @@ plt.rcParams.update({
 })
 
 
-def load_round_normalization():
-    """Load mapping between raw round labels and normalized round types."""
-    normalization_path = (
-        Path(__file__)
-        .resolve()
-        .parents[2]
-        / "Specialization_investigation"
-        / "Descriptive"
-        / "Round"
-        / "RoundNormaliz.JSON"
-    )
-    with normalization_path.open("r", encoding="utf-8") as json_file:
-        round_map = json.load(json_file)
-    label_to_round_type = {}
-    for round_type, raw_labels in round_map.items():
-        for raw_label in raw_labels:
-            label_to_round_type[raw_label.strip().lower()] = round_type
-    return label_to_round_type
-
-
-def normalize_round_label(raw_label, label_mapping):
-    if pd.isna(raw_label):
-        return "Other"
-    normalized_label = str(raw_label).strip().lower()
-    return label_mapping.get(normalized_label, "Other")
-
-
 df_merge = mylib.openDB("rounds")
 df_merge=mylib.space(df_merge, "company_id", True)
 df_rt_og = df_merge[["round_label", "round_amount_usd"]]
@@ -57,10 +27,7 @@ df_rt_og.loc[:, "round_amount_usd"] = df_rt_og["round_amount_usd"].apply(
     lambda value: value / 1_000_000_000 if not pd.isna(value) else value
 )
 
-round_label_mapping = load_round_normalization()
-df_rt_og.loc[:, "round_type"] = df_rt_og["round_label"].apply(
-    lambda label: normalize_round_label(label, round_label_mapping)
-)
+df_rt_og.loc[:, "round_type"] = mylib.stdRound(df_rt_og, default=mylib.OTHER_ROUND_STAGE)
 df_rt_og = df_rt_og[["round_type", "round_amount_usd"]]
 
 # aggregate by sum
@@ -31,28 +31,20 @@ def get_space_rounds() -> pd.DataFrame:
     rounds = rounds[rounds["company_id"].isin(set(space_ids))]
     return rounds
 
-def _parse_round_date(value) -> pd.Timestamp:
-    """Normalise date values through the helper in Library, returning NaT when parsing fails."""
-    if pd.isna(value):
-        return pd.NaT
-    if isinstance(value, pd.Timestamp):
-        return value
-    value_str = str(value).strip()
-    if value_str == "":
-        return pd.NaT
-    lowered = value_str.lower()
-    if lowered in {"nan", "nat", "none"}:
-        return pd.NaT
-    try:
-        return mylib.convertToDatetime(lowered)
-    except Exception:
-        return pd.NaT
+def _parse_round_dates(values: pd.Series) -> pd.Series:
+    """Normalise date values through the bulk parser in Library, returning NaT when parsing fails."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    cleaned = values.str.strip().str.lower().fillna(values)
+    cleaned = cleaned.mask(cleaned.isin(["", "nan", "nat", "none"]))
+    parsed = mylib.convertToDatetimeBulk(cleaned, errors="coerce")
+    return parsed.mask(cleaned.isna())
 
 def prepare_yearly_amounts(rounds: pd.DataFrame) -> pd.DataFrame:
     """Aggregate total USD invested by year and round type, excluding exits."""
     filtered = mylib.filterExits(rounds.copy())
     filtered["round_amount_usd"] = pd.to_numeric(filtered["round_amount_usd"], errors="coerce")
-    filtered["Round date"] = filtered["Round date"].apply(_parse_round_date)
+    filtered["Round date"] = _parse_round_dates(filtered["Round date"])
     filtered = filtered.dropna(subset=["Round type", "Round date", "round_amount_usd"])
     filtered["Year"] = filtered["Round date"].dt.year.astype(int)
 
@@ -2,49 +2,13 @@ import pandas as pd
 import Library as mylib
 import Tesi_SpaceEconomy.Specialization_investigation.flagSpaceSpec as flag
 from sklearn.preprocessing import RobustScaler
-import json
-from pathlib import Path
-
-def _load_round_normalization(json_path: Path) -> dict:
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    # Build reverse map: raw_label_lower -> standardized_category
-    reverse = {}
-    for std_cat, raw_list in data.items():
-        for raw in raw_list:
-            if raw is None:
-                continue
-            key = str(raw).strip().lower()
-            if key:
-                reverse[key] = std_cat
-    return reverse
-
-def _standardize_round_labels(df: pd.DataFrame, normalizer: dict) -> pd.Series:
-    # Accept either 'round_label' or 'Round type' as the source column
-    source_col = None
-    for c in ("round_label", "Round type"):
-        if c in df.columns:
-            source_col = c
-            break
-    if source_col is None:
-        raise KeyError("Neither 'round_label' nor 'Round type' column found in rounds DB")
-
-    def map_label(val):
-        if pd.isna(val):
-            return None
-        key = str(val).strip().lower()
-        return normalizer.get(key)
-
-    return df[source_col].apply(map_label)
 
 #Open the tables with the data
 inv=mylib.openDB("investors")
 rounds=mylib.openDB("rounds")
 
 #Normalise the round label
-norm=_load_round_normalization("Tesi_SpaceEconomy\Specialization_investigation\Descriptive\Round\RoundNormaliz.JSON")
-rounds["round_label"]=_standardize_round_labels(rounds, norm)
+rounds["round_label"]=mylib.stdRound(rounds)
 
 #Add the information of investor country, investor Launch Year and space specialization
 inv=flag.spacePercentage(inv, 2020, 0)
@@ -4,9 +4,10 @@ import numpy as np
 
 dfInv=pd.read_parquet("DB_Out/AmountbyInvType.parquet")
 dfLoc=pd.read_parquet("DB_Out/Inv_Loc_finale.parquet")
+#one country per investor: the one its locations point to the most (share = its fraction)
+dfLoc=mylib.polish_loc(dfLoc, "country")
 dfFin=pd.merge(dfInv, dfLoc, on="Investor", how="left")
 dfFin.sort_values(by="Amount in EUR", inplace=True, ascending=False)   
-dfFin=mylib.polish_loc(dfFin)
 dfFin.to_excel("Output.xlsx")
 print(dfFin.head())
 dfMap=dfFin[["country", "Amount in EUR"]]
@@ -15,7 +16,7 @@ dfMap.reset_index(inplace=True)
 dfMap.rename(columns={"country" : "company_country", "Amount in EUR" : "Total amount"}, inplace=True)
 dfMap.fillna("", inplace=True)
 fig=mylib.makeMap(dfMap, "Total amount")
-fig.write_html("InvestorTotalAmountCountry.html")
+mylib.writeMap(fig, "InvestorTotalAmountCountry.html")
 
 """dfMap=dfFin[["country", "Investor"]]
 dfMap=dfMap.groupby(by="country").count()
@@ -23,4 +24,4 @@ dfMap.reset_index(inplace=True)
 dfMap.rename(columns={"country" : "company_country", "Investor" : "Number of investor"}, inplace=True)
 dfMap.fillna("", inplace=True)
 fig=mylib.makeMap(dfMap, "Number of investor")
-fig.write_html("NumberofInvestorsCountries.html")"""
+mylib.writeMap(fig, "NumberofInvestorsCountries.html")"""
@@ -1,15 +1,28 @@
 import pandas as pd
-import requests
 import json
 import openpyxl 
 import pyarrow
+import pyarrow.compute
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
 import traceback
+import os
+import hashlib
+import re
+import unicodedata
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
 import pycountry
+from collections import OrderedDict
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Optional, Literal, Iterable, TypedDict
+
+# Optional dependency for US city -> state mapping (works offline)
+try:
+    import pgeocode  # uses local GeoNames data packaged in the library
+    HAS_PGEO = True
+except ImportError:
+    HAS_PGEO = False
 
 def isfloat(value):#True if is float
     try:
@@ -52,62 +65,150 @@ def investorInfo(df): #Returns a df of the columns: Investor, Investor type
     return_df.drop_duplicates(inplace=True)
     return return_df
         
-def roundSplit(listAdd, df):#Divides each round made in each rows, the columns are: "Investor", "Amount", "Currency", "Amount in EUR", "Round type", "Round date"
-    j=0
-    listAdd=list()
-    for i in range(len(df)): 
-        try: 
-            if "space" in df.loc[i, "Tags"]:
-                investorListi=df.loc[i, "Each round investors"].split(";")
-                amountListi=df.loc[i, "Each round amount"].split(";")
-                currencyListi=df.loc[i, "Each round currency"].split(";")
-                roundTypeListi=df.loc[i, "Each round type"].split(";")
-                roundDateListi=df.loc[i, "Each round date"].split(";")
-                firmTarget=df.loc[i, "Name"]
-                firmTarget="" if pd.isna(firmTarget) else firmTarget
-                firmId=df.loc[i, "ID"]
-                firmId="" if pd.isna(firmId) else firmId
-                firmTargetCountry=df.loc[i, "HQ country"]
-                firmTargetCountry="" if pd.isna(firmTargetCountry) else firmTargetCountry
-                for a in range(len(investorListi)):
-                    roundType=roundTypeListi[a] 
-                    roundDate=convertToDatetime(roundDateListi[a])
-                    amountListi[a]=0 if pd.isna(amountListi[a]) or amountListi[a]=="n/a" else float(amountListi[a])
-                    if "+" in investorListi[a]:
-                        investorsA=investorListi[a].split("++")
-                        if amountListi[a]!="n/a":
-                            valuePlus=float(amountListi[a])/len(investorsA)
-                        else:
-                            valuePlus=0
-                        for x in investorsA: 
-                            listAdd.append([x, valuePlus, currencyListi[a], 0, roundType, roundDate, firmTarget, firmId, firmTargetCountry])
-                    else:
-                        listAdd.append([investorListi[a], amountListi[a], currencyListi[a], 0, roundType, roundDate, firmTarget, firmId, firmTargetCountry])
-        except Exception as e: 
-            inv=df.loc[i, "Each round investors"]
-            amount=df.loc[i, "Each round amount"]
-            amount=0 if pd.isna(amount) or amount=="n/a" else float(amount)
-            firmTarget=df.loc[i, "Name"]
-            firmTarget="" if pd.isna(firmTarget) else firmTarget
-            firmId=df.loc[i, "ID"]
-            firmId="" if pd.isna(firmId) else firmId
-            firmTargetCountry=df.loc[i, "HQ country"]
-            firmTargetCountry="" if pd.isna(firmTargetCountry) else firmTargetCountry
-            if pd.isna(inv):
-                continue
-            elif not pd.isna(inv) and ";" not in inv and not pd.isna(amount):
-                listAdd.append([inv, amount, "EUR", 0, df.loc[i, "Each round type"], convertToDatetime(df.loc[i, "Each round date"]), firmTarget, firmId, firmTargetCountry])
-            elif pd.isna(inv) and pd.isna(amount):
-                continue
-            elif not pd.isna(inv) and pd.isna(amount):
-                continue
-            else:
-                traceback.print_exc() 
-                j=j+1
-            continue
-    final_df=pd.DataFrame(listAdd, columns=["Investor", "Amount", "Currency", "Amount in EUR", "Round type", "Round date", "Target firm", "company_id","company_country"])
-    final_df.astype({"Investor":"string", "Amount":"float", "Currency":"string", "Amount in EUR":"float", "Round type":"string", "Round date":"string", "Target firm":"string", "company_id" : "int", "company_country":"string"})
-    print(j)
+ROUND_SPLIT_COLUMNS = ["Investor", "Amount", "Currency", "Amount in EUR", "Round type", "Round date", "Target firm", "company_id", "company_country"]
+ROUND_COLUMNS = {
+    "Investor": "Each round investors",
+    "Amount": "Each round amount",
+    "Currency": "Each round currency",
+    "Round type": "Each round type",
+    "Round date": "Each round date",
+}
+
+
+def _explode_positions(lists: pd.Series, name: str) -> pd.DataFrame:
+    """Explode a Series of lists into (row, pos, value) records, pos being the index inside each list."""
+    exploded = lists.dropna().explode()
+    pos = exploded.groupby(level=0).cumcount()
+    return pd.DataFrame({"row": exploded.index.to_numpy(), "pos": pos.to_numpy(), name: exploded.to_numpy()})
+
+
+def _parse_amounts(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Vectorized float(value) with the "n/a" -> 0 rule; returns (amounts, parsed_ok)."""
+    text = values.astype(object)
+    amounts = pd.to_numeric(text, errors="coerce")
+    is_na_text = text.isna() | (text == "n/a")
+    nan_literal = text.astype(str).str.strip().str.lower().isin(["nan", "+nan", "-nan"])
+    retry = amounts.isna() & ~is_na_text & ~nan_literal
+    if retry.any():
+        # the few spellings float() accepts but to_numeric does not (e.g. "1_000")
+        def _to_float(value):
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                return np.nan
+        amounts[retry] = text[retry].map(_to_float)
+    ok = ~retry | amounts.notna()
+    amounts = amounts.mask(is_na_text, 0.0)
+    return amounts, ok
+
+
+def roundSplit(listAdd, df, return_malformed: bool = False):#Divides each round made in each rows, the columns are: "Investor", "Amount", "Currency", "Amount in EUR", "Round type", "Round date"
+    """Split the `;`-separated "Each round *" columns of the raw export into one row per investor and round.
+
+    Columnar pipeline: the aligned round columns are split and exploded with the pandas
+    string kernels, "++" co-investors share the round amount evenly and the dates are
+    parsed once per distinct string. Only companies tagged "space" are split; a round
+    list that cannot be aligned keeps the rounds before the first bad entry. Rows that
+    cannot be parsed at all are left out and, with return_malformed=True, returned as a
+    second dataframe (columns: row, ID, Name, reason). `listAdd` is kept for
+    compatibility and ignored.
+    """
+    df = df.reset_index(drop=True)
+    n_rows = len(df)
+    row_ids = pd.RangeIndex(n_rows)
+
+    firm_target = df["Name"].astype(object).where(df["Name"].notna(), "")
+    firm_id = df["ID"].astype(object).where(df["ID"].notna(), "")
+    firm_country = df["HQ country"].astype(object).where(df["HQ country"].notna(), "")
+
+    has_space = df["Tags"].astype(object).str.contains("space", regex=False)
+    main_rows = has_space.eq(True).to_numpy()
+    # rows whose tag cannot be inspected (missing/non-text) go straight to the single-round fallback
+    fallback_rows = has_space.isna().to_numpy(copy=True)
+
+    # --- split and explode the aligned round columns of the space rows
+    split = {
+        out: df.loc[main_rows, col].astype(object).str.split(";")
+        for out, col in ROUND_COLUMNS.items()
+    }
+    complete = pd.Series(True, index=row_ids[main_rows])
+    for lists in split.values():
+        complete &= lists.notna()
+    fallback_rows[complete[~complete].index.to_numpy()] = True
+
+    rounds = _explode_positions(split["Investor"][complete], "Investor")
+    for out in ("Amount", "Currency", "Round type", "Round date"):
+        part = _explode_positions(split[out][complete], out)
+        rounds = rounds.merge(part, on=["row", "pos"], how="left")
+
+    amounts, amount_ok = _parse_amounts(rounds["Amount"])
+    dates, date_ok = _parse_dates(rounds["Round date"])
+    valid = (
+        rounds["Round type"].notna()
+        & rounds["Currency"].notna()
+        & rounds["Amount"].notna() & amount_ok
+        & rounds["Round date"].notna() & date_ok
+    )
+    rounds["Amount"] = amounts
+    rounds["Round date"] = dates
+
+    # keep each round list up to its first misaligned/unparsable entry
+    n_rounds = rounds.groupby("row")["pos"].transform("size")
+    first_bad = rounds["pos"].where(~valid, n_rounds).groupby(rounds["row"]).transform("min")
+    broken = rounds.loc[first_bad < n_rounds, "row"].unique()
+    fallback_rows[broken] = True
+    rounds = rounds[rounds["pos"] < first_bad]
+
+    # co-investors joined with "++" share the round amount evenly
+    rounds["Investor"] = rounds["Investor"].astype(object).str.split("++", regex=False)
+    rounds["Amount"] = rounds["Amount"] / rounds["Investor"].str.len()
+    rounds = rounds.explode("Investor")
+    rounds["sub"] = rounds.groupby(["row", "pos"]).cumcount()
+
+    # --- fallback: rows holding a single, unsplit round
+    raw_inv = df["Each round investors"]
+    fb = row_ids[fallback_rows & raw_inv.notna().to_numpy()]
+    fb_inv = raw_inv.iloc[fb]
+    single = fb_inv.map(lambda value: isinstance(value, str) and ";" not in value).to_numpy(dtype=bool)
+    malformed = [pd.DataFrame({"row": fb[~single], "reason": "unaligned round lists"})]
+
+    fb = fb[single]
+    fb_amount, fb_amount_ok = _parse_amounts(df["Each round amount"].iloc[fb].reset_index(drop=True))
+    fb_date, fb_date_ok = _parse_dates(df["Each round date"].iloc[fb].reset_index(drop=True))
+    fb_ok = (fb_amount_ok & fb_date_ok).to_numpy()
+    malformed.append(pd.DataFrame({"row": fb[~fb_ok], "reason": "unparsable amount or date"}))
+    single_rounds = pd.DataFrame({
+        "row": fb,
+        "pos": 0,
+        "sub": 0,
+        "Investor": df["Each round investors"].iloc[fb].to_numpy(),
+        "Amount": fb_amount.to_numpy(),
+        "Currency": "EUR",
+        "Round type": df["Each round type"].iloc[fb].to_numpy(),
+        "Round date": fb_date.to_numpy(),
+    })[fb_ok & fb_amount.notna().to_numpy()]
+
+    final = pd.concat([rounds, single_rounds], ignore_index=True)
+    final = final.sort_values(["row", "pos", "sub"], kind="stable")
+    rows = final["row"].to_numpy(dtype=np.int64)
+    final_df = pd.DataFrame([], columns=ROUND_SPLIT_COLUMNS) if final.empty else pd.DataFrame({
+        "Investor": final["Investor"].to_numpy(),
+        "Amount": final["Amount"].astype(float).to_numpy(),
+        "Currency": final["Currency"].to_numpy(),
+        "Amount in EUR": np.zeros(len(final), dtype=np.int64),
+        "Round type": final["Round type"].to_numpy(),
+        "Round date": final["Round date"].to_numpy(),
+        "Target firm": firm_target.to_numpy()[rows],
+        "company_id": firm_id.to_numpy()[rows],
+        "company_country": firm_country.to_numpy()[rows],
+    }).infer_objects()
+
+    malformed_df = pd.concat(malformed, ignore_index=True).sort_values("row", kind="stable")
+    malformed_df.insert(1, "ID", firm_id.to_numpy()[malformed_df["row"].to_numpy()])
+    malformed_df.insert(2, "Name", firm_target.to_numpy()[malformed_df["row"].to_numpy()])
+    malformed_df = malformed_df.reset_index(drop=True)
+    if return_malformed:
+        return final_df, malformed_df
     return final_df
 
 def operConv(row, conversion_dict):
@@ -117,14 +218,51 @@ def operConv(row, conversion_dict):
     except:
         return 0
 
-def amountsConv(target_df, conversion_dict):# converts the amount from the currency to euros and cuts the columns linked to "Amount" and "Currency"
-    i=0
-    try:
-        #target_df.loc[i, "Amount in EUR"]=float(target_df.loc[i, "Amount"])/float(conversion_dict.get(target_df.loc[i, "Currency"], 0))
-        #target_df["Amount in EUR"]=target_df.apply(lambda row: float(row["Amount"])/float(conversion_dict.get(row["Currency"], 0)), axis=1)
-        target_df["Amount in EUR"]=target_df.apply(operConv, conversion_dict=conversion_dict, axis=1)
-    except Exception as e:
-        traceback.print_exc()
+def amountsConv(
+    target_df,
+    conversion_dict,
+    fx_rates: Optional[pd.DataFrame] = None,
+    date_column: str = "Round date",
+):# converts the amount from the currency to euros and cuts the columns linked to "Amount" and "Currency"
+    """Fill "Amount in EUR" = Amount / rate(Currency) for the whole frame at once.
+
+    `conversion_dict` maps a currency code to its units per EUR. `fx_rates`, if given,
+    is a date-dependent table with columns Currency, date, rate (same convention):
+    each row takes the latest rate on or before its `date_column` value (as-of join),
+    falling back to `conversion_dict` when no dated rate exists. Rows whose currency
+    has no usable rate get 0 and are flagged in the "Currency unknown" column.
+    Missing (None, NaN) and unparsable amounts convert to 0, as operConv did for
+    None and text (it passed a float NaN through as NaN).
+    """
+    n_rows = len(target_df)
+    currency = target_df["Currency"].astype("category")
+    rates = pd.to_numeric(
+        pd.Series(currency.map(conversion_dict), index=target_df.index).astype(object),
+        errors="coerce",
+    ).to_numpy(dtype=np.float64, copy=True)
+
+    if fx_rates is not None:
+        left = pd.DataFrame({
+            "_pos": np.arange(n_rows),
+            "Currency": target_df["Currency"].astype(str).to_numpy(),
+            "date": pd.to_datetime(target_df[date_column], errors="coerce").to_numpy(),
+        }).dropna(subset=["date"]).sort_values("date")
+        right = fx_rates[["Currency", "date", "rate"]].copy()
+        right["Currency"] = right["Currency"].astype(str)
+        right["date"] = pd.to_datetime(right["date"]).astype(left["date"].dtype)
+        right = right.dropna(subset=["date", "rate"]).sort_values("date")
+        matched = pd.merge_asof(left, right, on="date", by="Currency", direction="backward")
+        dated = matched.dropna(subset=["rate"])
+        rates[dated["_pos"].to_numpy()] = dated["rate"].to_numpy(dtype=np.float64)
+
+    amounts = pd.to_numeric(target_df["Amount"], errors="coerce").to_numpy(dtype=np.float64)
+    unknown = np.isnan(rates) | (rates == 0)
+
+    converted = np.zeros(n_rows, dtype=np.float64)
+    usable = ~unknown & ~np.isnan(amounts)
+    np.divide(amounts, rates, out=converted, where=usable)
+    target_df["Amount in EUR"] = converted
+    target_df["Currency unknown"] = unknown
     return target_df
 
 
@@ -233,101 +371,85 @@ def countryID(row) -> str:
     return country
 
 def to_iso3(name:str)->str:
-    try:
-        return pycountry.countries.lookup(name).alpha_3
-    except LookupError:
-        if name=="Russia":
-            return "RUS"
-        if name == "Kosovo":
-            return "XKX"
+    """ISO3 code of one country name (None if unknown); use countryISO3 for whole columns."""
+    if not isinstance(name, str):
         return None
+    lookup, _ = _country_table()
+    return lookup.get(_country_key(name))
 
-def makeMap(df: pd.DataFrame, column: str) -> px.choropleth:
-    df[countrColumn]=df["company_country"].apply(to_iso3)
-    listColumns=[countrColumn, "company_country", column]
-    df=df[listColumns]
-    missing=df[df[countrColumn].isna()]
+def makeMap(df: pd.DataFrame, column: str) -> go.Figure:
+    df=df.copy()
+    df["iso3"]=countryISO3(df["company_country"])
+    missing=df[df["iso3"].isna()]
     if not missing.empty:
-        print(missing)
-    fig=px.choropleth(df, locations=countrColumn, color=column, hover_name="company_country", color_continuous_scale="Reds", projection="natural earth")
-    fig.update_layout(title=column, coloraxis_colorbar_title="Value", margin=dict(l=0, r=0, t=40, b=0),)
-    for i, row in df.iterrows():
-        fig.add_trace(go.Scattergeo(locationmode="country names", locations=[row["company_country"]], text=[round(row[column])], mode="text", showlegend=False ))
+        print(missing[["company_country", column]])
+    fig=choroplethMap(df, "iso3", column, title=column, colorbar_title="Value", decimals=0, hover_name="company_country")
     fig.show() 
     return fig
 
-def findLocation(investor : str):
-    if len(investor)==0:
-        return {"Investor" : "missing"}
-    API_KEY="API_Key"
-    url="https://places.googleapis.com/v1/places:searchText"
+def _geocode_cache_path() -> Path:
+    return _find_db_out_dir() / "Cache" / "InvestorGeocode.parquet"
 
-    headers = {
-        "Content-Type" : "application/json",
-        "X-Goog-Api-Key": API_KEY,
-        "X-Goog-FieldMask": "places.id" 
-    }
 
-    body= {
-        "textQuery" : str(investor)+" headquarter",
-        "languageCode":"en"
-    }
+def geocodeInvestors(investors: Iterable[str], backend=None, concurrency: Optional[int] = None, refresh: bool = False) -> pd.DataFrame:
+    """Locations of many investors (one row per matched place: Investor + address component columns).
 
-    r = requests.post(url, headers=headers, json=body, timeout=30)
-    dict_r=r.json()
-    print(dict_r)
-    ret=list()
-    try:
-        place_id_list=dict_r.get("places", "")
-        for place in place_id_list:
-            place_id=place.get("id", "")
-            print(place_id)
-            if place_id!="":
-                url="https://places.googleapis.com/v1/places/"+place_id
-                headers = {
-                "X-Goog-Api-Key": API_KEY,
-                "X-Goog-FieldMask": "id,addressComponents"
-                }
-                r=requests.get(url, headers=headers, timeout=30)
-                retI=dict()
-                retI["Investor"]= investor
-                dict_r=r.json()
-                print(dict_r)
-                for component in dict_r.get("addressComponents"):
-                    retI[component.get("types", "")[0]] = component.get("longText", "")
-                ret.append(retI)
-        if len(ret)==0:
-            return {"Investor" : investor}
-        else:
-            return ret
-            
-    except:
-        traceback.print_exc()
-        return {"Investor" : investor}
+    Answers are cached in DB_Out/Cache/InvestorGeocode.parquet, so only names not
+    geocoded yet reach `backend` (default: Google Places, key from the
+    GOOGLE_PLACES_API_KEY environment variable); they are queried concurrently.
+    See geocoding.py for the backends. Investors without a location keep a row
+    with only Investor set.
+    """
+    import geocoding
+
+    results = geocoding.geocode_investors(
+        investors,
+        cache=_geocode_cache_path(),
+        backend=backend,
+        concurrency=concurrency or geocoding.DEFAULT_CONCURRENCY,
+        refresh=refresh,
+    )
+    rows = [location for investor, locations in results.items() for location in (locations or [{"Investor": investor}])]
+    return pd.DataFrame(rows, columns=None if rows else ["Investor"])
+
+
+def findLocation(investor : str, backend=None):
+    """Locations of one investor: a list of {Investor, <address component type>: name} dicts,
+    or {"Investor": investor} when nothing is found (cached, see geocodeInvestors).
+
+    The cache and the default backend are shared across calls; new answers are saved
+    every geocoding.CHECKPOINT_EVERY lookups and at exit, not on every call."""
+    if len(investor)==0:
+        return {"Investor" : "missing"}
+    import geocoding
+
+    locations = geocoding.geocode_investors([investor], cache=_geocode_cache_path(), backend=backend, save=False)
+    return locations.get(investor) or {"Investor" : investor}
     
-def polish_loc(df: pd.DataFrame) -> pd.DataFrame:
+def polish_loc(df: pd.DataFrame, countryColumn: str = "country", weight: Optional[str] = None) -> pd.DataFrame:
     """
-    Takes in a dataframe with columns Investor and country 
-    Returns a dataframe that keeps only the information of the country appearing the most linked to the investor
-    Returns df -> columns=["Investor", countrColumn]
+    Takes in a dataframe with columns Investor and countryColumn (one row per known location)
+    Returns one row per investor with the country linked to it the most and its share of the links
+    Returns df -> columns=["Investor", countryColumn, "share"]
+
+    weight: optional column (e.g. the invested amount) weighting each location row instead of counting it.
+    Ties go to the country appearing first in df; missing countries do not vote.
     """
-    rows=list()
-    for investor, group in df.groupby("Investor"):
-        occurences=dict()
-        for index, row in group.iterrows():
-            try:
-                occurences[row[countrColumn]]+=1
-            except KeyError:
-                occurences[row[countrColumn]]=1
-        maxValue=0
-        country=str()
-        for key, values in occurences.items():
-            if values>maxValue:
-                maxValue=values
-                country=key
-        rows.append([investor, country])
-    retDf=pd.DataFrame(rows, columns=["Investor", countrColumn])
-    return retDf
+    data = df[["Investor", countryColumn]].copy()
+    data["_votes"] = pd.to_numeric(df[weight], errors="coerce").fillna(0).to_numpy() if weight else 1.0
+    data["_first"] = np.arange(len(data))
+    data = data[data["Investor"].notna()]
+    votes = (
+        data[data[countryColumn].notna()]
+        .groupby(["Investor", countryColumn], sort=False, observed=True)
+        .agg(_votes=("_votes", "sum"), _first=("_first", "min"))
+        .reset_index()
+    )
+    votes["_total"] = votes.groupby("Investor", sort=False, observed=True)["_votes"].transform("sum")
+    best = votes.sort_values(["_votes", "_first"], ascending=[False, True], kind="stable").drop_duplicates("Investor")
+    best["share"] = best["_votes"] / best["_total"].where(best["_total"] > 0)
+    investors = pd.DataFrame({"Investor": data["Investor"].drop_duplicates().sort_values().to_numpy()})
+    return investors.merge(best[["Investor", countryColumn, "share"]], on="Investor", how="left")
 
 def valuations(df: pd.DataFrame):
     listAdd=list()
@@ -336,7 +458,7 @@ def valuations(df: pd.DataFrame):
     #print(df[["Historical valuations - dates", "Historical valuations - values (EUR M)"]][:100])
     try:
         df=df.explode(column=["Historical valuations - dates", "Historical valuations - values (EUR M)"], ignore_index=True)
-        df["Historical valuations - dates"]=df["Historical valuations - dates"].apply(convertToDatetime, by_row="compat")
+        df["Historical valuations - dates"]=convertToDatetimeBulk(df["Historical valuations - dates"])
         df["Historical valuations - values (EUR M)"]=df["Historical valuations - values (EUR M)"].apply(avgValuation, by_row="compat")
     except Exception as e:
         """df["Historical valuations - dates"]=df["Historical valuations - dates"].apply(len, by_row="compat")
@@ -392,6 +514,90 @@ def convertToDatetime(date : str) -> pd.Timestamp:
         return pd.to_datetime(str(date), format="%Y")
 
 
+MONTH_ABBREVIATIONS = ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"]
+DATE_SENTINEL = pd.Timestamp("1970-01-01")
+_MONTH_NAME_SHAPE = r"^(?P<month>" + "|".join(MONTH_ABBREVIATIONS) + r")/(?P<year>\d{4})$"
+_MONTH_NUMBER_SHAPE = r"^(?P<month>\d{1,2})-(?P<year>\d{4})$"
+_YEAR_SHAPE = r"^(?P<year>\d{4})$"
+
+
+def _dates_from_parts(year: pd.Series, month) -> pd.Series:
+    parts = pd.DataFrame({"year": pd.to_numeric(year), "month": month, "day": 1})
+    return pd.to_datetime(parts, errors="coerce")
+
+
+def _parse_dates(values: pd.Series) -> tuple[pd.Series, pd.Series]:
+    """Bulk version of convertToDatetime; returns (dates, parsed_ok) aligned with `values`.
+
+    Every distinct value is parsed once. Strings shaped like "mon/YYYY", "MM-YYYY"
+    and "YYYY" are classified with regex masks and converted with one to_datetime
+    call per shape; anything else goes through convertToDatetime itself, so the
+    results match it exactly. Missing values get the 1970 sentinel; values that
+    convertToDatetime would reject are NaT with parsed_ok False.
+    """
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype("datetime64[ns]"), pd.Series(True, index=values.index)
+
+    text = values.astype(object)
+    missing = text.isna().to_numpy()
+    uniques = pd.Series(pd.unique(text[~missing].to_numpy()), dtype=object)
+    parsed = pd.Series(pd.NaT, index=uniques.index, dtype="datetime64[ns]")
+    resolved = pd.Series(False, index=uniques.index)
+    ok = pd.Series(True, index=uniques.index)
+
+    is_text = uniques.map(lambda value: isinstance(value, str)).astype(bool)
+    stamps = ~is_text & uniques.map(lambda value: isinstance(value, (pd.Timestamp, np.datetime64))).astype(bool)
+    parsed[stamps] = pd.to_datetime(uniques[stamps])
+    resolved |= stamps
+
+    strings = uniques.where(is_text)
+    month_names = strings.str.extract(_MONTH_NAME_SHAPE)
+    hit = month_names["month"].notna()
+    month_numbers = month_names.loc[hit, "month"].map({name: i + 1 for i, name in enumerate(MONTH_ABBREVIATIONS)})
+    parsed[hit] = _dates_from_parts(month_names.loc[hit, "year"], month_numbers)
+    resolved |= hit & parsed.notna()
+
+    numeric = strings.str.extract(_MONTH_NUMBER_SHAPE)
+    hit = numeric["month"].notna()
+    parsed[hit] = _dates_from_parts(numeric.loc[hit, "year"], pd.to_numeric(numeric.loc[hit, "month"]))
+    resolved |= hit & parsed.notna()  # out-of-range values fall through to the scalar parser
+
+    years = strings.str.extract(_YEAR_SHAPE)["year"]
+    hit = years.notna()
+    parsed[hit] = _dates_from_parts(years[hit], 1)
+    resolved |= hit & parsed.notna()
+
+    # irregular spellings: defer to the scalar parser so behaviour stays identical
+    for pos in resolved.index[~resolved.to_numpy()]:
+        try:
+            stamp = convertToDatetime(uniques[pos])
+            parsed[pos] = pd.NaT if stamp is None else pd.Timestamp(stamp).as_unit("ns")
+        except (ValueError, TypeError):
+            ok[pos] = False
+
+    positions = pd.Index(uniques).get_indexer(text[~missing])
+    dates = pd.Series(DATE_SENTINEL, index=values.index, dtype="datetime64[ns]")
+    dates[~missing] = parsed.to_numpy()[positions]
+    parsed_ok = pd.Series(True, index=values.index)
+    parsed_ok[~missing] = ok.to_numpy()[positions]
+    return dates, parsed_ok
+
+
+def convertToDatetimeBulk(values, errors: Literal["raise", "coerce"] = "raise") -> pd.Series:
+    """Vectorized convertToDatetime for a whole column; returns a datetime64 Series.
+
+    Missing values get the 1970 sentinel, as in convertToDatetime. With
+    errors="raise" an unparsable value raises ValueError, with errors="coerce" it
+    becomes NaT.
+    """
+    dates, ok = _parse_dates(pd.Series(values))
+    if errors == "raise" and not ok.all():
+        bad = pd.Series(values)[~ok.to_numpy()].iloc[0]
+        raise ValueError(f"Unparsable date: {bad!r}")
+    return dates
+
+
 def avgValuation(val) -> float:
     if pd.isna(val):
         return 0
@@ -412,8 +618,7 @@ def filterExits(df: pd.DataFrame) -> pd.DataFrame:
     if "Round type" not in df.columns:
         return df
     else:
-        listExits=["BUYOUT", "ACQUISITION", "POST IPO EQUITY", "POST IPO CONVERTIBLE", "POST IPO DEBT", "POST IPO SECONDARY", "SPAC IPO", "SPAC PRIVATE PLACEMENT", "IPO"]
-        df["Round type"]=df["Round type"].mask(df["Round type"].isin(listExits), other="NULL")
+        df["Round type"]=df["Round type"].mask(df["Round type"].isin(EXIT_ROUND_TYPES), other="NULL")
         df=df[df["Round type"]!="NULL"]
         return df
 
@@ -422,24 +627,75 @@ def toEU(df : pd.DataFrame, countrColumn: str) -> pd.DataFrame:
     Accepts a dataframe with the column countrColumn and rename the EU countries as "EU"
     Returns a dataframe 
     """
-    EU=["Italy", "Germany", "France", "Spain", "Portugal", "Greece", "Netherlands", "Belgium", "Luxemburg", "Finland", "Sweden", "Austria", "Denmark", "Bulgaria", "Romania", "Estonia", "Latvia", "Poland", "Lithuania", "Ireland", "Malta", "Croatia", "Czech republic", "Hungary", "Cyprus", "Liechtenstein", "Slovenia", "Slovakia"]
-    df[countrColumn]=df[countrColumn].mask(df[countrColumn].isin(EU), other="EU")
+    values=df[countrColumn]
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values=values.astype(object)
+    df[countrColumn]=values.mask(countryISO3(values).isin(EU_ROLLUP_ISO3), other="EU")
     return df
 
 
 
-def space(df: pd.DataFrame, column : str, filter : bool) -> pd.DataFrame:
-    """Accepts a dataframe with the firm Id in the 'column', adds the flag space based on the Table, returns the dataframe with the flag if filter is 0, returns the dataframe filtered if filter is 1"""
-    df_space=openDB("updown")
-    df_space=df_space["space"]
-    df_fin=pd.merge(left=df, right=df_space, left_on=column, right_index=True, how="left")
-    df_fin.fillna({"space":0}, inplace=True)
+COMPANY_FLAGS: tuple[str, ...] = ("space", "upstream", "downstream")
+# company_id -> (space, upstream, downstream) lookup built once from DB_updown and
+# rebuilt only when the parquet changes: (file signature, company index, flag matrix)
+_COMPANY_FLAG_INDEX: Optional[tuple[tuple[int, int], pd.Index, np.ndarray]] = None
+
+
+def _company_flag_index() -> tuple[pd.Index, np.ndarray]:
+    """Return the company_id index of DB_updown and the aligned 0/1 flag matrix (COMPANY_FLAGS order)."""
+    global _COMPANY_FLAG_INDEX
+    signature = _file_signature(_find_db_out_dir() / "DB_updown.parquet")
+    if _COMPANY_FLAG_INDEX is not None and _COMPANY_FLAG_INDEX[0] == signature:
+        return _COMPANY_FLAG_INDEX[1], _COMPANY_FLAG_INDEX[2]
+
+    df_flags = openDB("updown")
+    # a company appearing twice would make the lookup ambiguous: keep its first row
+    df_flags = df_flags[~df_flags.index.duplicated(keep="first")]
+    matrix = np.zeros((len(df_flags), len(COMPANY_FLAGS)), dtype=np.float64)
+    for pos, flag in enumerate(COMPANY_FLAGS):
+        if flag in df_flags.columns:
+            matrix[:, pos] = pd.to_numeric(df_flags[flag], errors="coerce").fillna(0).to_numpy(np.float64)
+    _COMPANY_FLAG_INDEX = (signature, df_flags.index, matrix)
+    return df_flags.index, matrix
+
+
+def companyFlags(company_ids, flag: str = "space") -> np.ndarray:
+    """Return the 0/1 `flag` (one of COMPANY_FLAGS) for each company id; unknown ids get 0."""
+    if flag not in COMPANY_FLAGS:
+        raise ValueError(f"flag must be one of {COMPANY_FLAGS}, got {flag!r}")
+    index, matrix = _company_flag_index()
+    positions = index.get_indexer(pd.Index(company_ids))
+    values = matrix[positions, COMPANY_FLAGS.index(flag)]
+    values[positions == -1] = 0.0
+    return values
+
+
+def space(
+    df: pd.DataFrame,
+    column: str,
+    filter: bool,
+    mask_only: bool = False,
+    flags: tuple[str, ...] = ("space",),
+):
+    """Accepts a dataframe with the firm Id in the 'column', adds the flag space based on the Table, returns the dataframe with the flag if filter is 0, returns the dataframe filtered if filter is 1
+
+    The flags come from a company_id lookup built once from DB_updown (no merge, row
+    order and index are preserved). `flags` selects which of COMPANY_FLAGS to attach;
+    with mask_only=True only the boolean "is space" Series aligned to df is returned.
+    """
+    if mask_only:
+        return pd.Series(companyFlags(df[column], "space") == 1, index=df.index, name="space")
+
+    df_fin = df.copy(deep=False)
+    for flag in flags:
+        df_fin[flag] = companyFlags(df[column], flag)
     if filter:
-        return df_fin[df_fin["space"]==1]
+        is_space = df_fin["space"] if "space" in flags else companyFlags(df[column], "space")
+        return df_fin[np.asarray(is_space) == 1]
     else:
         return df_fin
 
-    
+
 
 #add it here
 def _find_db_out_dir(start: Optional[Path] = None) -> Path:
@@ -462,10 +718,347 @@ def _find_db_out_dir(start: Optional[Path] = None) -> Path:
     )
 
 
-DBTableName = Literal["investors", "rounds", "valuation", "export", "updown"]
+DBTableName = Literal["investors", "rounds", "valuation", "export", "updown", "firms"]
+# Partition key of the hive datasets written by writePartitionedDB (DB_<name>/round_year=YYYY/)
+PARTITION_COLUMN = "round_year"
+
+# Process-wide cache of the parquet tables read through openDB. Entries are keyed
+# by table name plus the requested columns/filters and validated against the file
+# mtime/size, so a rebuilt parquet is picked up on the next call without
+# restarting the interpreter.
+# CACHE_MAX_BYTES bounds the memory held by the cache (None = unbounded, 0 = disabled).
+CACHE_MAX_BYTES: Optional[int] = 4 * 1024**3
+_TABLE_CACHE: "OrderedDict[tuple, tuple[tuple[int, int], pd.DataFrame, int]]" = OrderedDict()
+
+
+class DBFilters(TypedDict, total=False):
+    """Row filters accepted by openDB and pushed down into the parquet reader.
+
+    - years: inclusive (first_year, last_year) range on round_date; either bound may be None
+    - investor_id: collection of investor ids to keep
+    - company_id: collection of company ids to keep
+    """
+    years: tuple[Optional[int], Optional[int]]
+    investor_id: Iterable
+    company_id: Iterable
+
+
+def _freeze_filters(filters: Optional[DBFilters]) -> tuple:
+    """Hashable representation of the filters, used as part of the cache key."""
+    if not filters:
+        return ()
+    frozen = []
+    for name in sorted(filters):
+        value = filters[name]
+        if name == "years":
+            frozen.append((name, tuple(value)))
+        else:
+            frozen.append((name, frozenset(pd.Series(list(value)).dropna().tolist())))
+    return tuple(frozen)
+
+
+def _build_dataset_filter(schema: pyarrow.Schema, filters: Optional[DBFilters]):
+    """Translate DBFilters into a pyarrow expression.
+
+    Returns (expression, leftover) where leftover holds the filters that cannot be
+    expressed on the stored column types (e.g. dates saved as strings) and must be
+    applied on the decoded frame instead.
+    """
+    if not filters:
+        return None, {}
+    unknown = set(filters) - {"years", "investor_id", "company_id"}
+    if unknown:
+        raise ValueError(f"Unsupported filters: {sorted(unknown)}")
+
+    expression = None
+    leftover: dict = {}
+
+    def _and(expr):
+        return expr if expression is None else expression & expr
+
+    for id_col in ("investor_id", "company_id"):
+        if id_col not in filters:
+            continue
+        if id_col not in schema.names:
+            raise KeyError(f"Cannot filter on '{id_col}': column not in table")
+        values = pd.Series(list(filters[id_col])).dropna().unique().tolist()
+        try:
+            value_set = pyarrow.array(values).cast(schema.field(id_col).type, safe=False)
+            expression = _and(pads.field(id_col).isin(value_set))
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowNotImplementedError, pyarrow.ArrowTypeError):
+            leftover[id_col] = values
+
+    if "years" in filters:
+        if "round_date" not in schema.names:
+            raise KeyError("Cannot filter on years: column 'round_date' not in table")
+        first, last = filters["years"]
+        date_type = schema.field("round_date").type
+        if pyarrow.types.is_timestamp(date_type) or pyarrow.types.is_date(date_type):
+            if first is not None:
+                bound = pyarrow.scalar(pd.Timestamp(year=int(first), month=1, day=1)).cast(date_type)
+                expression = _and(pads.field("round_date") >= bound)
+            if last is not None:
+                bound = pyarrow.scalar(pd.Timestamp(year=int(last) + 1, month=1, day=1)).cast(date_type)
+                expression = _and(pads.field("round_date") < bound)
+        else:
+            leftover["years"] = (first, last)
+        if PARTITION_COLUMN in schema.names:
+            # year-partitioned layout: the partition key lets the reader skip whole files
+            if first is not None:
+                expression = _and(pads.field(PARTITION_COLUMN) >= int(first))
+            if last is not None:
+                expression = _and(pads.field(PARTITION_COLUMN) <= int(last))
+
+    return expression, leftover
+
+
+def _apply_leftover_filters(df: pd.DataFrame, leftover: dict) -> pd.DataFrame:
+    if not leftover:
+        return df
+    mask = pd.Series(True, index=df.index)
+    for id_col in ("investor_id", "company_id"):
+        if id_col in leftover:
+            mask &= df[id_col].isin(leftover[id_col])
+    if "years" in leftover:
+        first, last = leftover["years"]
+        years = pd.to_datetime(df["round_date"], errors="coerce").dt.year
+        if first is not None:
+            mask &= years >= int(first)
+        if last is not None:
+            mask &= years <= int(last)
+    return df[mask].reset_index(drop=True)
+
+
+def _read_table(
+    parquet_path: Path,
+    columns: Optional[list[str]],
+    filters: Optional[DBFilters],
+) -> pd.DataFrame:
+    """Read a parquet table reading only the requested columns and matching row groups."""
+    partitioned = parquet_path.is_dir()
+    dataset = pads.dataset(parquet_path, format="parquet", partitioning="hive" if partitioned else None)
+    schema = dataset.schema
+    if partitioned and columns is None:
+        # the partition key is a storage detail: return the same columns as the single file
+        columns = [c for c in schema.names if c != PARTITION_COLUMN]
+    if columns is not None:
+        missing = [c for c in columns if c not in schema.names]
+        if missing:
+            raise KeyError(f"Missing columns in {parquet_path.name}: {missing}")
+
+    expression, leftover = _build_dataset_filter(schema, filters)
+    read_columns = None
+    if columns is not None:
+        # Columns needed by the filters applied after decoding are read too, then dropped
+        extra = [c for c in leftover if c in ("investor_id", "company_id") and c not in columns]
+        if "years" in leftover and "round_date" not in columns:
+            extra.append("round_date")
+        # Keep the stored pandas index (e.g. company_id on DB_updown) when projecting
+        index_cols = [
+            c for c in (schema.pandas_metadata or {}).get("index_columns", [])
+            if isinstance(c, str) and c not in columns
+        ]
+        read_columns = list(columns) + extra + index_cols
+
+    table = dataset.to_table(columns=read_columns, filter=expression)
+    df = table.to_pandas()
+    df = _apply_leftover_filters(df, leftover)
+    if columns is not None:
+        df = df[list(columns)]
+    return df
+
+
+def _file_signature(path: Path) -> tuple[int, int]:
+    if path.is_dir():
+        stats = [p.stat() for p in path.rglob("*.parquet")]
+        return max((s.st_mtime_ns for s in stats), default=0), sum(s.st_size for s in stats)
+    stat = path.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _resolve_table_path(db_dir: Path, key: str) -> Path:
+    """Return the partitioned dataset `DB_<key>/` when it is up to date, else `DB_<key>.parquet`.
+
+    A partitioned copy older than the single file (e.g. the file was rebuilt and
+    writePartitionedDB was not rerun) is ignored.
+    """
+    parquet_path = db_dir / f"DB_{key}.parquet"
+    dataset_path = db_dir / f"DB_{key}"
+    if dataset_path.is_dir() and any(dataset_path.rglob("*.parquet")):
+        if not parquet_path.is_file() or _file_signature(dataset_path)[0] >= parquet_path.stat().st_mtime_ns:
+            return dataset_path
+    return parquet_path
 
 
-def openDB(parameter: DBTableName) -> pd.DataFrame:
+def writePartitionedDB(
+    parameter: DBTableName = "rounds",
+    date_column: str = "round_date",
+    sort_by: str = "investor_id",
+    row_group_size: int = 50_000,
+) -> Path:
+    """Rewrite DB_<parameter>.parquet as a hive dataset DB_<parameter>/round_year=YYYY/.
+
+    Rows are sorted by `sort_by` inside each year and written in row groups of
+    `row_group_size` with column statistics, so year filters in openDB open only
+    the matching files and id filters skip row groups inside them. Rows without a
+    date go to the round_year=__HIVE_DEFAULT_PARTITION__ folder. The single file
+    is kept; openDB prefers the dataset while it is newer than the file.
+    """
+    import shutil
+
+    db_dir = _find_db_out_dir()
+    key = parameter.strip().lower()
+    source = db_dir / f"DB_{key}.parquet"
+    target = db_dir / f"DB_{key}"
+    staging = db_dir / f".DB_{key}.partitioning"
+
+    table = pq.read_table(source)
+    dates = table.column(date_column)
+    if not (pyarrow.types.is_timestamp(dates.type) or pyarrow.types.is_date(dates.type)):
+        dates = pyarrow.array(pd.to_datetime(dates.to_pandas(), errors="coerce"))
+    years = pyarrow.compute.year(dates)
+    table = table.append_column(PARTITION_COLUMN, years)
+    table = table.sort_by([(PARTITION_COLUMN, "ascending"), (sort_by, "ascending")])
+
+    shutil.rmtree(staging, ignore_errors=True)
+    year_values = table.column(PARTITION_COLUMN)
+    for year in pyarrow.compute.unique(year_values).to_pylist():
+        if year is None:
+            mask = pyarrow.compute.is_null(year_values)
+            folder = "__HIVE_DEFAULT_PARTITION__"
+        else:
+            mask = pyarrow.compute.equal(year_values, year)
+            folder = str(year)
+        part = table.filter(mask).drop_columns([PARTITION_COLUMN])
+        directory = staging / f"{PARTITION_COLUMN}={folder}"
+        directory.mkdir(parents=True)
+        pq.write_table(part, directory / "part-0.parquet", row_group_size=row_group_size, write_statistics=True)
+
+    shutil.rmtree(target, ignore_errors=True)
+    staging.rename(target)
+    clearDBCache(key)
+    return target
+
+
+def _cache_size() -> int:
+    return sum(entry[2] for entry in _TABLE_CACHE.values())
+
+
+def _cache_store(key: tuple, signature: tuple[int, int], df: pd.DataFrame) -> None:
+    """Insert a table in the cache, evicting the least recently used entries when over budget."""
+    if CACHE_MAX_BYTES == 0:
+        return
+    nbytes = int(df.memory_usage(index=True, deep=True).sum())
+    if CACHE_MAX_BYTES is not None and nbytes > CACHE_MAX_BYTES:
+        return
+    _TABLE_CACHE[key] = (signature, df, nbytes)
+    _TABLE_CACHE.move_to_end(key)
+    if CACHE_MAX_BYTES is not None:
+        while _cache_size() > CACHE_MAX_BYTES and len(_TABLE_CACHE) > 1:
+            _TABLE_CACHE.popitem(last=False)
+
+
+def _shared_view(df: pd.DataFrame) -> pd.DataFrame:
+    """Hand out a frame callers can freely modify without touching the cached one.
+
+    With pandas copy-on-write enabled (default from pandas 3) a shallow copy is
+    enough: buffers are shared until the caller writes to them. Otherwise fall
+    back to a deep copy, which is still far cheaper than decoding the parquet.
+    """
+    cow = int(pd.__version__.split(".")[0]) >= 3 or pd.options.mode.copy_on_write is True
+    return df.copy(deep=not cow)
+
+
+def clearDBCache(parameter: Optional[DBTableName] = None) -> None:
+    """Drop cached tables: all of them, or only the ones for `parameter`."""
+    if parameter is None:
+        _TABLE_CACHE.clear()
+        return
+    key = parameter.strip().lower()
+    for cached in [k for k in _TABLE_CACHE if k[0] == key]:
+        del _TABLE_CACHE[cached]
+
+
+# Schema applied by openDB(compact=True): label columns become categoricals (whitespace
+# stripped, "" -> missing), ids the smallest integer type that holds them and amounts float64.
+CATEGORICAL_COLUMNS = ("company_country", "investor_country", "round_label", "investor_types", "company_continent")
+ID_COLUMNS = ("investor_id", "company_id")
+AMOUNT_COLUMNS = ("round_amount_usd",)
+
+
+def _as_label_categorical(values: pd.Series) -> pd.Series:
+    """Categorical of stripped labels; the cleaning runs on the distinct values only."""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    cleaned = pd.Index(uniques, dtype=object).astype(str).str.strip()
+    categories = pd.Index(sorted(set(cleaned) - {""}), dtype=object)
+    mapping = np.append(categories.get_indexer(cleaned), -1)
+    return pd.Series(
+        pd.Categorical.from_codes(mapping[codes], categories=categories),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def _as_compact_id(values: pd.Series) -> pd.Series:
+    if not pd.api.types.is_numeric_dtype(values):
+        return values
+    numeric = values
+    present = numeric.dropna()
+    if len(present) and not (present == np.floor(present)).all():
+        return values
+    if numeric.isna().any():
+        return numeric.astype("Int64")
+    if len(present) == 0 or (present.min() >= np.iinfo(np.int32).min and present.max() <= np.iinfo(np.int32).max):
+        return numeric.astype(np.int32)
+    return numeric.astype(np.int64)
+
+
+def compactDtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Apply the compact schema (CATEGORICAL_COLUMNS, ID_COLUMNS, AMOUNT_COLUMNS) to the columns present in df.
+
+    Categoricals make groupbys on country/label run on integer codes; compare label
+    columns coming from different tables with sameLabel, not with ==.
+    """
+    df = df.copy(deep=False)
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = _as_label_categorical(df[col])
+    for col in ID_COLUMNS:
+        if col in df.columns:
+            df[col] = _as_compact_id(df[col])
+    for col in AMOUNT_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype(np.float64)
+    return df
+
+
+def sameLabel(left: pd.Series, right: pd.Series) -> pd.Series:
+    """Row-wise equality of two label columns ignoring case and surrounding whitespace.
+
+    Works on object or categorical columns (also with different categories) and
+    casefolds only the distinct values. Missing values compare equal to "" as in
+    the `.fillna("").str.strip().str.casefold()` comparisons it replaces.
+    """
+    def _codes(values: pd.Series):
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        keys = pd.Index(uniques, dtype=object).astype(str).str.strip().str.casefold()
+        return codes, keys
+
+    left_codes, left_keys = _codes(left)
+    right_codes, right_keys = _codes(right)
+    vocabulary = left_keys.append(right_keys).append(pd.Index([""])).unique()
+    left_ids = np.append(vocabulary.get_indexer(left_keys), vocabulary.get_loc(""))[left_codes]
+    right_ids = np.append(vocabulary.get_indexer(right_keys), vocabulary.get_loc(""))[right_codes]
+    return pd.Series(left_ids == right_ids, index=left.index)
+
+
+def openDB(
+    parameter: DBTableName,
+    columns: Optional[list[str]] = None,
+    filters: Optional[DBFilters] = None,
+    cache: bool = True,
+    compact: bool = False,
+) -> pd.DataFrame:
     """Open a parquet table from 'DB_Out' using a constrained set of names.
 
     Allowed values for `parameter` (offered by IDE autocompletion):
@@ -474,10 +1067,24 @@ def openDB(parameter: DBTableName) -> pd.DataFrame:
     - "valuation"
     - "export"
     - "updown"
+    - "firms"
+
+    Returns a pandas.DataFrame for the file `DB_<parameter>.parquet`, or for the
+    year-partitioned dataset `DB_<parameter>/` when writePartitionedDB has built an
+    up-to-date one (only the partitions matching filters["years"] are read).
+    Tables are memoized process-wide (see CACHE_MAX_BYTES) and invalidated when the
+    file changes on disk; every call returns an independent frame, so callers can
+    modify it without corrupting the cached copy. Pass cache=False to force a read.
+
+    `columns` restricts the read to the listed columns and `filters` (see DBFilters)
+    is pushed down into the pyarrow dataset reader, so row groups outside the
+    requested years/ids are skipped instead of decoded. Example:
+        openDB("rounds", columns=["investor_id", "round_date"], filters={"years": (2021, 2024)})
 
-    Returns a pandas.DataFrame for the file `DB_<parameter>.parquet`.
+    compact=True applies compactDtypes: country/label columns come back as
+    categoricals, ids as int32/Int64 and amounts as float64.
     """
-    allowed: tuple[str, ...] = ("investors", "rounds", "valuation", "export", "updown")
+    allowed: tuple[str, ...] = ("investors", "rounds", "valuation", "export", "updown", "firms")
 
     if not isinstance(parameter, str):
         raise TypeError("parameter must be a string literal")
@@ -490,12 +1097,967 @@ def openDB(parameter: DBTableName) -> pd.DataFrame:
 
     db_dir = _find_db_out_dir()
     parquet_name = f"DB_{key}.parquet"
-    parquet_path = db_dir / parquet_name
+    parquet_path = _resolve_table_path(db_dir, key)
 
-    if not parquet_path.is_file():
+    if not parquet_path.exists():
         available = ", ".join(p.name for p in sorted(db_dir.glob("*.parquet")))
         raise FileNotFoundError(
             f"Expected '{parquet_name}' in DB_Out. Available: {available if available else 'none'}"
         )
 
-    return pd.read_parquet(parquet_path)
+    if columns is not None:
+        columns = list(columns)
+
+    if not cache:
+        df = _read_table(parquet_path, columns, filters)
+        return compactDtypes(df) if compact else df
+
+    cache_key = (
+        key, str(parquet_path), None if columns is None else tuple(columns), _freeze_filters(filters), compact
+    )
+    signature = _file_signature(parquet_path)
+    entry = _TABLE_CACHE.get(cache_key)
+    if entry is not None and entry[0] == signature:
+        _TABLE_CACHE.move_to_end(cache_key)
+        return _shared_view(entry[1])
+
+    df = _read_table(parquet_path, columns, filters)
+    if compact:
+        df = compactDtypes(df)
+    _cache_store(cache_key, signature, df)
+    return _shared_view(df)
+
+
+# --- Investor eligibility dimension -------------------------------------------------
+# Baseline investor filter shared by the specialization scripts: venture capital type,
+# at least MIN_DEALS rounds over the whole rounds table and at least one round in a
+# European space company. Materialized in DB_Out/Dim/DimInvestorEligibility.parquet.
+# flag_venture_capital is per investor (any DB_investors row of a VC type);
+# flag_european_space matches company_continent == "Europe" exactly, as flagSpaceSpec
+# always did, and flag_european_space_casefold also accepts other casings/whitespace
+# (the window1518 scripts' rule).
+VC_PATTERN = r"\bventure[_ ]?capital\b"
+MIN_DEALS = 4
+ELIGIBILITY_COLUMNS = [
+    "investor_id", "deal_count", "european_space_deals", "european_space_deals_casefold",
+    "flag_venture_capital", "flag_min_deals", "flag_european_space", "flag_european_space_casefold", "eligible",
+]
+# source tables behind each part of the dimension: only the stale parts are recomputed
+_ELIGIBILITY_SOURCES = {"vc": ("investors",), "deals": ("rounds", "firms", "updown")}
+
+
+def _eligibility_path() -> Path:
+    return _find_db_out_dir() / "Dim" / "DimInvestorEligibility.parquet"
+
+
+def _source_signatures(names: Iterable[str]) -> dict[str, list[int]]:
+    db_dir = _find_db_out_dir()
+    return {name: list(_file_signature(_resolve_table_path(db_dir, name))) for name in names}
+
+
+def _eligibility_vc() -> pd.DataFrame:
+    investors = openDB("investors", columns=["investor_id", "investor_types"])
+    is_vc = investors["investor_types"].astype(str).str.contains(VC_PATTERN, case=False, regex=True, na=False)
+    flag = is_vc.groupby(investors["investor_id"]).max().astype(int)
+    return flag.rename("flag_venture_capital").to_frame()
+
+
+def _eligibility_deals() -> pd.DataFrame:
+    rounds = openDB("rounds", columns=["investor_id", "company_id"]).dropna(subset=["investor_id"])
+    firms = openDB("firms", columns=["company_id", "company_continent"])
+    continent = firms["company_continent"].astype(str)
+    europe_ids = firms.loc[continent == "Europe", "company_id"].dropna().unique()
+    europe_casefold_ids = firms.loc[continent.str.strip().str.casefold() == "europe", "company_id"].dropna().unique()
+    space_mask = space(rounds, "company_id", False, mask_only=True)
+    return pd.DataFrame({
+        "deal_count": rounds.groupby("investor_id").size(),
+        "european_space_deals": (space_mask & rounds["company_id"].isin(europe_ids)).groupby(rounds["investor_id"]).sum(),
+        "european_space_deals_casefold": (
+            (space_mask & rounds["company_id"].isin(europe_casefold_ids)).groupby(rounds["investor_id"]).sum()
+        ),
+    })
+
+
+def buildInvestorEligibility(force: bool = False) -> pd.DataFrame:
+    """(Re)build DimInvestorEligibility when its source tables changed, and return it.
+
+    The signatures of the source tables are stored in the parquet metadata: when
+    only DB_investors changed the VC flag is recomputed and the deal counts are
+    reused (and vice versa). Pass force=True to rebuild everything.
+    """
+    path = _eligibility_path()
+    current = _source_signatures(name for names in _ELIGIBILITY_SOURCES.values() for name in names)
+    stored, previous = None, {}
+    if path.is_file() and not force:
+        metadata = pq.read_schema(path).metadata or {}
+        previous = json.loads(metadata.get(b"sources", b"{}"))
+        stored = pd.read_parquet(path)
+        if list(stored.columns) != ELIGIBILITY_COLUMNS:  # older layout: rebuild everything
+            stored, previous = None, {}
+        elif previous == current:
+            return stored
+        else:
+            stored = stored.set_index("investor_id")
+
+    def _stale(part: str) -> bool:
+        return stored is None or any(previous.get(name) != current[name] for name in _ELIGIBILITY_SOURCES[part])
+
+    vc = _eligibility_vc() if _stale("vc") else stored[["flag_venture_capital"]]
+    deal_columns = ["deal_count", "european_space_deals", "european_space_deals_casefold"]
+    deals = _eligibility_deals() if _stale("deals") else stored[deal_columns]
+
+    dim = pd.concat([deals, vc], axis=1).fillna(0).astype(int)
+    dim.index.name = "investor_id"
+    dim["flag_min_deals"] = (dim["deal_count"] >= MIN_DEALS).astype(int)
+    dim["flag_european_space"] = (dim["european_space_deals"] > 0).astype(int)
+    dim["flag_european_space_casefold"] = (dim["european_space_deals_casefold"] > 0).astype(int)
+    dim["eligible"] = dim["flag_venture_capital"] & dim["flag_min_deals"] & dim["flag_european_space"]
+    dim = dim.reset_index()[ELIGIBILITY_COLUMNS]
+
+    table = pyarrow.Table.from_pandas(dim, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"sources": json.dumps(current).encode()})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_suffix(".tmp")
+    pq.write_table(table, staging)
+    staging.replace(path)
+    return dim
+
+
+def investorEligibility(
+    eligible_only: bool = False,
+    require: Iterable[str] = ("flag_venture_capital", "flag_min_deals", "flag_european_space"),
+) -> pd.DataFrame:
+    """Load DimInvestorEligibility (refreshed first if the source tables changed).
+
+    Columns: investor_id, deal_count, european_space_deals, european_space_deals_casefold,
+    flag_venture_capital, flag_min_deals, flag_european_space, flag_european_space_casefold,
+    eligible. With eligible_only=True only the
+    investors passing every flag listed in `require` are returned, e.g.
+    require=("flag_min_deals", "flag_european_space") when the VC filter is applied elsewhere.
+    """
+    dim = buildInvestorEligibility()
+    if eligible_only:
+        mask = np.ones(len(dim), dtype=bool)
+        for flag in require:
+            mask &= dim[flag].to_numpy() == 1
+        dim = dim[mask].reset_index(drop=True)
+    return dim
+
+
+# --- Round label normalization -------------------------------------------------------
+ROUND_NORMALIZATION_PATH = Path(__file__).resolve().parent / "Specialization_investigation" / "Descriptive" / "Round" / "RoundNormaliz.JSON"
+ROUND_STAGES = ("Seed", "Early Stage", "Early Growth", "Later Stage")
+OTHER_ROUND_STAGE = "Other"
+STD_ROUND_COLUMN = "std_round"
+# raw label (stripped, lowercase) -> stage, read once from RoundNormaliz.JSON and
+# reloaded only when the file changes: (file signature, lookup)
+_ROUND_NORMALIZER: Optional[tuple[tuple[int, int], dict[str, str]]] = None
+
+
+def roundNormalizer() -> dict[str, str]:
+    """Return the RoundNormaliz.JSON lookup: raw round label (stripped, lowercase) -> round stage."""
+    global _ROUND_NORMALIZER
+    signature = _file_signature(ROUND_NORMALIZATION_PATH)
+    if _ROUND_NORMALIZER is not None and _ROUND_NORMALIZER[0] == signature:
+        return _ROUND_NORMALIZER[1]
+
+    with open(ROUND_NORMALIZATION_PATH, "r", encoding="utf-8") as handle:
+        raw = json.load(handle)
+    lookup: dict[str, str] = {}
+    for stage, aliases in raw.items():
+        for alias in aliases or ():
+            if alias is None:
+                continue
+            key = str(alias).strip().lower()
+            if key:
+                lookup[key] = stage
+    _ROUND_NORMALIZER = (signature, lookup)
+    return lookup
+
+
+def normalizeRoundLabels(labels: pd.Series, default: Optional[str] = None) -> pd.Series:
+    """Map raw round labels to their RoundNormaliz.JSON stage; unmapped and missing labels get `default`.
+
+    The labels are turned into a categorical, so the strip/lowercase lookup runs on
+    the distinct labels only (a few hundred) and every row just takes the stage of
+    its category code.
+    """
+    labels = pd.Series(labels)
+    categorical = labels.astype("category")
+    categories = categorical.cat.categories
+    stages = categories.astype(str).str.strip().str.lower().to_series(index=categories).map(roundNormalizer())
+    stages = stages.astype(object).where(stages.notna(), default)
+    # the trailing entry serves the missing labels (code -1)
+    lookup = np.append(stages.to_numpy(dtype=object), np.array([default], dtype=object))
+    return pd.Series(lookup[categorical.cat.codes.to_numpy()], index=labels.index, name=STD_ROUND_COLUMN, dtype=object)
+
+
+def stdRound(rounds: pd.DataFrame, default: Optional[str] = None) -> pd.Series:
+    """Standardized round stage of each row of a rounds table.
+
+    Uses the std_round column stored at ingestion (storeStdRound / ingestExport) when
+    present, otherwise normalizes "round_label" (DB_rounds) or "Round type" (RoundSplit).
+    Unmapped and missing labels get `default`.
+    """
+    if STD_ROUND_COLUMN in rounds.columns:
+        stored = rounds[STD_ROUND_COLUMN].astype(object)
+        return stored.where(stored.notna(), default).rename(STD_ROUND_COLUMN)
+    for column in ("round_label", "Round type"):
+        if column in rounds.columns:
+            return normalizeRoundLabels(rounds[column], default=default)
+    raise KeyError("Neither 'round_label' nor 'Round type' column found in rounds DB")
+
+
+def storeStdRound(db_dir: Optional[Path] = None, force: bool = False) -> Path:
+    """Add (or refresh) the std_round column of DB_rounds.parquet from its round_label.
+
+    The RoundNormaliz.JSON signature is kept in the parquet metadata, so the file is
+    rewritten only when the normalization changed. A partitioned DB_rounds/ copy
+    becomes stale and is ignored by openDB until writePartitionedDB is rerun.
+    """
+    db_dir = db_dir or _find_db_out_dir()
+    path = db_dir / "DB_rounds.parquet"
+    signature = json.dumps(list(_file_signature(ROUND_NORMALIZATION_PATH))).encode()
+    schema = pq.read_schema(path)
+    metadata = schema.metadata or {}
+    if not force and STD_ROUND_COLUMN in schema.names and metadata.get(b"round_normalization") == signature:
+        return path
+
+    table = pq.read_table(path)
+    labels = table.column("round_label").to_pandas()
+    std_round = pyarrow.array(normalizeRoundLabels(labels).to_numpy(), type=pyarrow.string())
+    if STD_ROUND_COLUMN in table.column_names:
+        table = table.set_column(table.column_names.index(STD_ROUND_COLUMN), STD_ROUND_COLUMN, std_round)
+    else:
+        table = table.append_column(STD_ROUND_COLUMN, std_round)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"round_normalization": signature})
+    staging = path.with_suffix(".tmp")
+    pq.write_table(table, staging)
+    staging.replace(path)
+    return path
+
+
+# --- Country normalization -----------------------------------------------------------
+COUNTRY_DIM_COLUMNS = ("iso3", "country", "continent", "eu")
+# EU-27 members
+EU_MEMBERS_ISO3 = frozenset({
+    "AUT", "BEL", "BGR", "HRV", "CYP", "CZE", "DNK", "EST", "FIN", "FRA", "DEU", "GRC", "HUN", "IRL",
+    "ITA", "LVA", "LTU", "LUX", "MLT", "NLD", "POL", "PRT", "ROU", "SVK", "SVN", "ESP", "SWE",
+})
+# countries toEU folds into "EU": the members plus Liechtenstein, as it always did
+EU_ROLLUP_ISO3 = EU_MEMBERS_ISO3 | {"LIE"}
+# continent -> ISO alpha-2 codes (UN M49 regions, the Americas split at Panama/Colombia)
+CONTINENT_ALPHA2 = {
+    "Europe": "AD AL AT AX BA BE BG BY CH CY CZ DE DK EE ES FI FO FR GB GG GI GR HR HU IE IM IS IT JE LI LT "
+              "LU LV MC MD ME MK MT NL NO PL PT RO RS RU SE SI SJ SK SM UA VA XK",
+    "Asia": "AE AF AM AZ BD BH BN BT CN GE HK ID IL IN IQ IR JO JP KG KH KP KR KW KZ LA LB LK MM MN MO MV MY "
+            "NP OM PH PK PS QA SA SG SY TH TJ TL TM TR TW UZ VN YE",
+    "Africa": "AO BF BI BJ BW CD CF CG CI CM CV DJ DZ EG EH ER ET GA GH GM GN GQ GW IO KE KM LR LS LY MA MG ML "
+              "MR MU MW MZ NA NE NG RE RW SC SD SH SL SN SO SS ST SZ TD TG TN TZ UG YT ZA ZM ZW",
+    "North America": "AG AI AW BB BL BM BQ BS BZ CA CR CU CW DM DO GD GL GP GT HN HT JM KN KY LC MF MQ MS MX NI "
+                     "PA PM PR SV SX TC TT US VC VG VI",
+    "South America": "AR BO BR CL CO EC FK GF GY PE PY SR UY VE",
+    "Oceania": "AS AU CC CK CX FJ FM GU KI MH MP NC NF NR NU NZ PF PG PN PW SB TK TO TV UM VU WF WS",
+    "Antarctica": "AQ BV GS HM TF",
+}
+# spellings pycountry does not know (its names, official/common names and codes are all keys already)
+COUNTRY_ALIASES = {
+    "Russia": "RUS", "Kosovo": "XKX", "Turkey": "TUR", "Turkiye": "TUR", "UK": "GBR", "Great Britain": "GBR",
+    "England": "GBR", "Scotland": "GBR", "Wales": "GBR", "Northern Ireland": "GBR", "Luxemburg": "LUX",
+    "Holland": "NLD", "Ivory Coast": "CIV", "Macedonia": "MKD", "Palestine": "PSE", "Brunei": "BRN",
+    "Cape Verde": "CPV", "Swaziland": "SWZ", "DR Congo": "COD", "DRC": "COD",
+    "Democratic Republic of the Congo": "COD", "Macau": "MAC", "Micronesia": "FSM", "Vatican": "VAT",
+    "Vatican City": "VAT", "East Timor": "TLS", "Burma": "MMR", "Korea": "KOR", "UAE": "ARE",
+    "Bosnia": "BIH", "Trinidad": "TTO", "Antigua": "ATG", "Saint Kitts": "KNA", "Falkland Islands": "FLK",
+    "Saint Martin": "MAF", "Sint Maarten": "SXM", "Brasil": "BRA",
+}
+# (normalized name/alias -> ISO3, dim table indexed by ISO3), built once from pycountry
+_COUNTRY_TABLE: Optional[tuple[dict[str, str], pd.DataFrame]] = None
+
+
+def _country_key(name) -> str:
+    """Lookup key of a country spelling: accents dropped, casefolded, "St." -> "saint", no leading "the"."""
+    text = unicodedata.normalize("NFKD", str(name))
+    text = "".join(char for char in text if not unicodedata.combining(char)).casefold()
+    text = re.sub(r"\bst\.?\s", "saint ", text.replace("&", " and "))
+    text = re.sub(r"\s+", " ", text).strip()
+    return text[4:] if text.startswith("the ") else text
+
+
+def _country_table() -> tuple[dict[str, str], pd.DataFrame]:
+    global _COUNTRY_TABLE
+    if _COUNTRY_TABLE is not None:
+        return _COUNTRY_TABLE
+
+    continents = {code: continent for continent, codes in CONTINENT_ALPHA2.items() for code in codes.split()}
+    records = [("XKX", "XK", "Kosovo", ())]
+    for entry in pycountry.countries:
+        spellings = tuple(getattr(entry, field, None) for field in ("name", "official_name", "common_name"))
+        records.append((entry.alpha_3, entry.alpha_2, getattr(entry, "common_name", None) or entry.name, spellings))
+    lookup: dict[str, str] = {}
+    rows = []
+    for iso3, alpha2, name, spellings in records:
+        for spelling in (iso3, alpha2, name, *spellings):
+            if spelling:
+                lookup.setdefault(_country_key(spelling), iso3)
+        rows.append((iso3, name, continents.get(alpha2), iso3 in EU_MEMBERS_ISO3))
+    for alias, iso3 in COUNTRY_ALIASES.items():
+        lookup[_country_key(alias)] = iso3
+    table = pd.DataFrame(rows, columns=list(COUNTRY_DIM_COLUMNS)).set_index("iso3")
+    _COUNTRY_TABLE = (lookup, table)
+    return _COUNTRY_TABLE
+
+
+def normalizeCountries(names: pd.Series) -> pd.DataFrame:
+    """ISO3, continent and EU membership of every country name (unknown and missing names get NA).
+
+    The names are turned into a categorical, so the lookup runs once per distinct
+    name (a few hundred) and every row just takes the result of its category code.
+    """
+    names = pd.Series(names)
+    lookup, table = _country_table()
+    categorical = names.astype("category")
+    iso3 = np.array([lookup.get(_country_key(name)) for name in categorical.cat.categories] + [None], dtype=object)
+    codes = pd.Series(iso3[categorical.cat.codes.to_numpy()], index=names.index, dtype=object)
+    info = table.reindex(codes.to_numpy())
+    return pd.DataFrame(
+        {
+            "iso3": codes,
+            "continent": info["continent"].to_numpy(dtype=object),
+            "eu": pd.array(info["eu"].to_numpy(dtype=object), dtype="boolean"),
+        },
+        index=names.index,
+    )
+
+
+def countryISO3(names: pd.Series) -> pd.Series:
+    """ISO3 code of every country name, None when the name is unknown or missing."""
+    return normalizeCountries(names)["iso3"].rename(getattr(names, "name", None))
+
+
+def _country_dim_path() -> Path:
+    return _find_db_out_dir() / "Dim" / "DimCountry.parquet"
+
+
+def _country_signature() -> bytes:
+    lookup, table = _country_table()
+    payload = json.dumps([sorted(lookup.items()), table.reset_index().astype(str).values.tolist()])
+    return hashlib.sha1(payload.encode()).hexdigest().encode()
+
+
+def buildCountryDim(force: bool = False) -> Path:
+    """Write DimCountry (alias key -> ISO3, country, continent, EU flag) and return its path.
+
+    Rewritten only when the alias table or the pycountry data changed (the
+    signature is kept in the parquet metadata).
+    """
+    path = _country_dim_path()
+    signature = _country_signature()
+    if not force and path.is_file() and (pq.read_schema(path).metadata or {}).get(b"country_normalization") == signature:
+        return path
+    lookup, table = _country_table()
+    dim = pd.DataFrame(list(lookup.items()), columns=["key", "iso3"]).join(table, on="iso3")
+    dim = dim.sort_values(["iso3", "key"], ignore_index=True)
+    arrow = pyarrow.Table.from_pandas(dim, preserve_index=False)
+    arrow = arrow.replace_schema_metadata({**(arrow.schema.metadata or {}), b"country_normalization": signature})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_suffix(".tmp")
+    pq.write_table(arrow, staging)
+    staging.replace(path)
+    return path
+
+
+def storeCountryCodes(db_dir: Optional[Path] = None, force: bool = False) -> list[Path]:
+    """Add (or refresh) ISO3 and EU flag columns on DB_firms (company_iso3, company_eu)
+    and DB_investors (investor_iso3, investor_eu) from their country columns.
+
+    Like storeStdRound, a file is rewritten only when the normalization changed.
+    """
+    db_dir = db_dir or _find_db_out_dir()
+    signature = _country_signature()
+    written = []
+    for file_name, prefix in (("DB_firms.parquet", "company"), ("DB_investors.parquet", "investor")):
+        path = db_dir / file_name
+        if not path.is_file():
+            continue
+        iso3_column, eu_column = f"{prefix}_iso3", f"{prefix}_eu"
+        schema = pq.read_schema(path)
+        metadata = schema.metadata or {}
+        if not force and iso3_column in schema.names and metadata.get(b"country_normalization") == signature:
+            written.append(path)
+            continue
+
+        table = pq.read_table(path)
+        info = normalizeCountries(table.column(f"{prefix}_country").to_pandas())
+        columns = {
+            iso3_column: pyarrow.array(info["iso3"].to_numpy(), type=pyarrow.string()),
+            eu_column: pyarrow.array(info["eu"], type=pyarrow.bool_()),
+        }
+        for name, values in columns.items():
+            if name in table.column_names:
+                table = table.set_column(table.column_names.index(name), name, values)
+            else:
+                table = table.append_column(name, values)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"country_normalization": signature})
+        staging = path.with_suffix(".tmp")
+        pq.write_table(table, staging)
+        staging.replace(path)
+        written.append(path)
+    return written
+
+
+# --- Round cube ----------------------------------------------------------------------
+ROUND_CUBE_DIMENSIONS = (
+    "year",
+    "company_country",
+    "firm_country",
+    "company_continent",
+    "round_stage",
+    "upstream",
+    "downstream",
+    "space",
+    "exit",
+    "investor_type",
+)
+# amount_usd: summed round_amount_usd; n_rounds: DB_rounds rows (one per investor and
+# round); n_amounts: rows with a known amount (denominator of average round sizes)
+# company_country: the round's own country (missing when the round has none);
+# firm_country: DB_firms' company_country, which can disagree with the round's
+ROUND_CUBE_MEASURES = ("amount_usd", "n_rounds", "n_amounts")
+EXIT_ROUND_TYPES = ("BUYOUT", "ACQUISITION", "POST IPO EQUITY", "POST IPO CONVERTIBLE", "POST IPO DEBT", "POST IPO SECONDARY", "SPAC IPO", "SPAC PRIVATE PLACEMENT", "IPO")
+_ROUND_CUBE_SOURCES = ("rounds", "firms", "updown", "investors")
+_ROUND_CUBE_VERSION = 2  # bump when the meaning of a dimension changes, to rebuild stored cubes
+
+
+def _round_cube_path() -> Path:
+    return _find_db_out_dir() / "Fact" / "FactRoundCube.parquet"
+
+
+def _round_cube_rows() -> pd.DataFrame:
+    """DB_rounds reduced to the cube dimensions and the round amount, one row per DB_rounds row."""
+    rounds = openDB("rounds")
+    firms = openDB("firms", columns=["company_id", "company_country", "company_continent"])
+    firms = firms.dropna(subset=["company_id"]).drop_duplicates("company_id").set_index("company_id")
+    investors = openDB("investors", columns=["investor_id", "investor_types"]).dropna(subset=["investor_id"])
+    investor_type = investors.drop_duplicates("investor_id").set_index("investor_id")["investor_types"]
+
+    company_ids = rounds["company_id"]
+    firm_country = company_ids.map(firms["company_country"]).astype(object)
+    country = rounds["company_country"].astype(object) if "company_country" in rounds.columns else firm_country
+    labels = rounds["round_label"].astype(object)
+    return pd.DataFrame({
+        "year": pd.to_datetime(rounds["round_date"], errors="coerce").dt.year.astype("Int64"),
+        "company_country": country,
+        "firm_country": firm_country,
+        "company_continent": company_ids.map(firms["company_continent"]).astype(object),
+        "round_stage": normalizeRoundLabels(labels, default=OTHER_ROUND_STAGE).to_numpy(),
+        "upstream": companyFlags(company_ids, "upstream").astype(np.int8),
+        "downstream": companyFlags(company_ids, "downstream").astype(np.int8),
+        "space": companyFlags(company_ids, "space").astype(np.int8),
+        "exit": labels.astype(str).str.strip().str.upper().isin(EXIT_ROUND_TYPES).astype(np.int8).to_numpy(),
+        "investor_type": rounds["investor_id"].map(investor_type).astype(object),
+        "amount": pd.to_numeric(rounds["round_amount_usd"], errors="coerce").to_numpy(),
+    }, index=rounds.index)
+
+
+def buildRoundCube(force: bool = False) -> pd.DataFrame:
+    """(Re)build FactRoundCube when DB_rounds/firms/updown/investors changed, and return it.
+
+    The cube sums DB_rounds over ROUND_CUBE_DIMENSIONS (a few thousand rows instead
+    of one row per investor and round); descriptive tables roll it up further with
+    rollupCube. The source signatures are kept in the parquet metadata like
+    DimInvestorEligibility. Pass force=True to rebuild regardless.
+    """
+    path = _round_cube_path()
+    current = _source_signatures(_ROUND_CUBE_SOURCES)
+    current["round_normalization"] = list(_file_signature(ROUND_NORMALIZATION_PATH))
+    current["dimensions"] = list(ROUND_CUBE_DIMENSIONS)
+    current["version"] = _ROUND_CUBE_VERSION
+    if path.is_file() and not force:
+        metadata = pq.read_schema(path).metadata or {}
+        if json.loads(metadata.get(b"sources", b"{}")) == current:
+            return pd.read_parquet(path)
+
+    rows = _round_cube_rows()
+    cube = (
+        rows.groupby(list(ROUND_CUBE_DIMENSIONS), dropna=False, observed=True, sort=True)["amount"]
+        .agg(amount_usd="sum", n_rounds="size", n_amounts="count")
+        .reset_index()
+    )
+
+    table = pyarrow.Table.from_pandas(cube, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), b"sources": json.dumps(current).encode()})
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_suffix(".tmp")
+    pq.write_table(table, staging)
+    staging.replace(path)
+    return cube
+
+
+def roundCube() -> pd.DataFrame:
+    """Load FactRoundCube (refreshed first if the source tables changed)."""
+    return buildRoundCube()
+
+
+def _with_segment(cube: pd.DataFrame) -> pd.DataFrame:
+    """Cube rows labelled upstream/downstream/other; a company flagged both counts in both segments."""
+    upstream = cube["upstream"] == 1
+    downstream = cube["downstream"] == 1
+    return pd.concat([
+        cube[upstream].assign(segment="upstream"),
+        cube[downstream].assign(segment="downstream"),
+        cube[~upstream & ~downstream].assign(segment="other"),
+    ], ignore_index=True)
+
+
+def rollupCube(
+    by: Iterable[str],
+    where: Optional[dict] = None,
+    cube: Optional[pd.DataFrame] = None,
+) -> pd.DataFrame:
+    """Sum ROUND_CUBE_MEASURES of the round cube over the `by` dimensions.
+
+    `where` filters dimensions before the roll-up: a scalar keeps equal values, a
+    list/tuple/set/range keeps the listed ones, e.g.
+        rollupCube(["year", "segment"], where={"space": 1, "year": range(2010, 2026)})
+    Besides ROUND_CUBE_DIMENSIONS, "segment" (upstream/downstream/other, see
+    _with_segment) can be used in `by` and `where`.
+    """
+    cube = roundCube() if cube is None else cube
+    by = list(by)
+    where = where or {}
+    if "segment" in by or "segment" in where:
+        cube = _with_segment(cube)
+    mask = np.ones(len(cube), dtype=bool)
+    for dimension, value in where.items():
+        if isinstance(value, (list, tuple, set, frozenset, range, pd.Index, np.ndarray)):
+            mask &= cube[dimension].isin(list(value)).to_numpy()
+        else:
+            mask &= (cube[dimension] == value).fillna(False).to_numpy(dtype=bool)
+    cube = cube[mask]
+    measures = list(ROUND_CUBE_MEASURES)
+    if not by:
+        return pd.DataFrame({measure: [cube[measure].sum()] for measure in measures})
+    return cube.groupby(by, dropna=False, observed=True, sort=True)[measures].sum().reset_index()
+
+
+# --- US city -> state resolution -----------------------------------------------------
+# GeoNames US postal data (pgeocode) reduced to one row per (casefolded place name, state)
+# with its number of postal codes, materialized in DB_Out/Dim/DimUSPlaceState.parquet.
+# Deterministic overrides for ambiguous US city names -> state code
+CITY_STATE_OVERRIDE = {
+    "Laconia": "NH", "Lafayette": "LA", "Livermore": "CA", "Long Beach": "CA", "Louisville": "KY",
+    "Manassas": "VA", "Marietta": "GA", "McLean": "VA", "Mesa": "AZ", "Miami": "FL", "Midland": "TX",
+    "Monrovia": "CA", "Mountain View": "CA", "Newark": "NJ", "North Bethesda": "MD", "Orange": "CA",
+    "Orlando": "FL", "Pasadena": "CA", "Portland": "OR", "Raleigh": "NC", "Redmond": "WA", "Reno": "NV",
+    "Rockville": "MD", "Saint Louis": "MO", "Saint Petersburg": "FL", "San Diego": "CA", "San Jose": "CA",
+    "San Mateo": "CA", "Santa Clara": "CA", "Santa Cruz": "CA", "Santa Fe": "NM", "Somerville": "MA",
+    "Stanford": "CA", "Sullivan's Island": "SC", "Sullivan\"s Island": "SC", "Sunnyvale": "CA", "Syracuse": "NY",
+    "Titusville": "FL", "Toledo": "OH", "Torrance": "CA", "Troy": "MI", "Tysons": "VA", "Wakefield": "MA",
+    "Washington": "DC", "Westfield": "NJ",
+    "Alexandria": "VA", "Arlington": "VA", "Atlanta": "GA", "Austin": "TX", "Bedminster Township": "NJ",
+    "Bellevue": "WA", "Berkeley": "CA", "Bishop": "CA", "Boston": "MA", "Boulder": "CO", "Brownsville": "TX",
+    "Buffalo": "NY", "Cambridge": "MA", "Carlsbad": "CA", "Chatsworth": "CA", "Cincinnati": "OH", "Dallas": "TX",
+    "Dearborn": "MI", "Denver": "CO", "Detroit": "MI", "Durham": "NC", "Fremont": "CA", "Glendale": "CA",
+    "Golden": "CO", "Grandview": "MO", "Hawthorne": "CA", "Herndon": "VA", "Houston": "TX", "Huntsville": "AL",
+    "Irvine": "CA", "Ithaca": "NY", "Jacksonville": "FL", "Kansas City": "MO", "Kirkland": "WA",
+}
+# (file signature, sorted place names, CSR offsets into the state rows, state codes, postal-code counts)
+_US_PLACE_INDEX: Optional[tuple[tuple[int, int], np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = None
+
+
+def _us_place_path() -> Path:
+    return _find_db_out_dir() / "Dim" / "DimUSPlaceState.parquet"
+
+
+def buildUSPlaceIndex(force: bool = False) -> Path:
+    """Write DimUSPlaceState from pgeocode's GeoNames US data (once) and return its path.
+
+    Once the file exists city resolution no longer needs pgeocode; pass force=True
+    to rebuild it after a pgeocode data update.
+    """
+    path = _us_place_path()
+    if path.is_file() and not force:
+        return path
+    if not HAS_PGEO:
+        raise ImportError("pgeocode is required for city->state resolution. Install with: pip install pgeocode")
+
+    data = pgeocode.Nominatim("US")._data
+    places = pd.DataFrame({
+        "place": data["place_name"].astype(str).str.strip().str.casefold(),
+        "state_code": data["state_code"].astype("string").str.upper(),
+    }).dropna(subset=["state_code"])
+    index = places.groupby(["place", "state_code"], sort=True).size().rename("postal_codes").reset_index()
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    staging = path.with_suffix(".tmp")
+    index.to_parquet(staging, index=False)
+    staging.replace(path)
+    return path
+
+
+def _us_place_index() -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Sorted unique place names and, per place, its slice of (state, postal-code count) rows."""
+    global _US_PLACE_INDEX
+    path = buildUSPlaceIndex()
+    signature = _file_signature(path)
+    if _US_PLACE_INDEX is not None and _US_PLACE_INDEX[0] == signature:
+        return _US_PLACE_INDEX[1:]
+
+    index = pd.read_parquet(path).sort_values(["place", "state_code"], kind="stable")
+    place = index["place"].to_numpy(dtype=str)
+    starts = np.flatnonzero(np.r_[True, place[1:] != place[:-1]]) if len(place) else np.zeros(0, dtype=np.int64)
+    offsets = np.r_[starts, len(place)]
+    _US_PLACE_INDEX = (
+        signature,
+        place[starts],
+        offsets,
+        index["state_code"].to_numpy(dtype=str),
+        index["postal_codes"].to_numpy(dtype=np.int64),
+    )
+    return _US_PLACE_INDEX[1:]
+
+
+def resolveUSStates(
+    cities: pd.Series,
+    ambiguous: Literal["skip", "majority"] = "skip",
+    overrides: bool = True,
+) -> tuple[pd.Series, set[str], set[str]]:
+    """Resolve a column of US city names to USPS state codes with one lookup per distinct city.
+
+    A city matches the GeoNames places with the same casefolded name or, when there is
+    none, every place starting with it (e.g. "st louis" -> "st louis park"). A city
+    matching a single state gets it; one matching several is left unresolved with
+    ambiguous="skip" or gets the state with most postal codes with "majority".
+    CITY_STATE_OVERRIDE (casefolded) takes precedence when `overrides` is True.
+
+    Returns (state codes aligned to `cities`, None when unresolved; ambiguous cities;
+    cities not found), the two sets holding stripped names and leaving out overridden ones.
+    """
+    cities = pd.Series(cities)
+    categorical = cities.astype("category")
+    names = pd.Index(categorical.cat.categories)
+    display = pd.Series(names.astype(str), dtype=object).str.strip()
+    is_text = np.array([isinstance(name, str) for name in names], dtype=bool)
+    keys = display.str.casefold().to_numpy(dtype=str) if len(names) else np.zeros(0, dtype=str)
+    searchable = is_text & (keys != "")
+
+    places, offsets, states, counts = _us_place_index()
+    lo = np.searchsorted(places, keys, side="left")
+    found = np.minimum(lo, max(len(places) - 1, 0))
+    exact = (lo < len(places)) & (places[found] == keys) if len(places) else np.zeros(len(keys), dtype=bool)
+    # prefix matches form one contiguous run of the sorted names
+    prefix_end = np.searchsorted(places, np.char.add(keys, "\U0010ffff"), side="left")
+    hi = np.where(exact, lo + 1, prefix_end)
+    hi = np.where(searchable, hi, lo)
+
+    start, stop = offsets[lo], offsets[hi]
+    lengths = stop - start
+    owner = np.repeat(np.arange(len(keys)), lengths)
+    rows = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths) + np.repeat(start, lengths)
+    matches = (
+        pd.DataFrame({"key": owner, "state": states[rows], "n": counts[rows]})
+        .groupby(["key", "state"], sort=True)["n"].sum()
+        .reset_index()
+    )
+    n_states = matches.groupby("key").size().reindex(range(len(keys)), fill_value=0).to_numpy()
+    # most postal codes first, ties broken by state code
+    best = matches.sort_values(["key", "n", "state"], ascending=[True, False, True]).drop_duplicates("key")
+    resolved = pd.Series(best["state"].to_numpy(dtype=object), index=best["key"].to_numpy(), dtype=object).reindex(range(len(keys)))
+    if ambiguous == "skip":
+        resolved[n_states > 1] = None
+    elif ambiguous != "majority":
+        raise ValueError("ambiguous must be 'skip' or 'majority'")
+
+    overridden = np.zeros(len(keys), dtype=bool)
+    if overrides:
+        override = {city.strip().casefold(): state for city, state in CITY_STATE_OVERRIDE.items()}
+        forced = pd.Series(keys).map(override)
+        overridden = forced.notna().to_numpy() & searchable
+        resolved[overridden] = forced[overridden].to_numpy()
+
+    resolved[~searchable] = None
+    lookup = np.append(resolved.astype(object).where(resolved.notna(), None).to_numpy(), np.array([None], dtype=object))
+    result = pd.Series(lookup[categorical.cat.codes.to_numpy()], index=cities.index, name="StateCode", dtype=object)
+    ambiguous_cities = set(display[searchable & ~overridden & (n_states > 1)])
+    missing_cities = set(display[searchable & ~overridden & (n_states == 0)])
+    return result, ambiguous_cities, missing_cities
+
+
+# --- Choropleth maps ------------------------------------------------------------------
+# Population references (total people) for the per-capita maps.
+# Countries, approx. 2020-2023, keyed by ISO3
+COUNTRY_POP = {
+    "USA": 333287557, "GBR": 67508936, "DEU": 83294633, "FRA": 68042591,
+    "ITA": 58870762, "ESP": 47450795, "CAN": 38929902, "CHN": 1411750000,
+    "IND": 1380004385, "JPN": 125171000, "AUS": 26177413, "NLD": 17650200,
+    "SWE": 10549347, "NOR": 5455260, "FIN": 5536146, "DNK": 5910912,
+    "CHE": 8740443, "AUT": 9006400, "BEL": 11655930, "IRL": 5070000,
+    "ISR": 9732000, "BRA": 215313498, "KOR": 51780579, "SGP": 5703600,
+    "ARE": 9276129, "RUS": 144444359, "LUX": 654768, "NZL": 5135300,
+    "PRT": 10310211, "GRC": 10341277, "POL": 37797200, "CZE": 10736784,
+    "HUN": 9596000, "ROU": 19053800, "BGR": 6843000, "HRV": 3871833,
+    "SVN": 2119777, "SVK": 5459642, "LTU": 2860000, "LVA": 1890000,
+    "EST": 1331000, "TUR": 85341241, "MEX": 126705138, "ISL": 387800,
+    "CYP": 1244184, "MLT": 535000, "UKR": 41130432, "ZAF": 60414495,
+    "EGY": 109262178, "CHL": 19603733, "COL": 51520000, "ARG": 45773884,
+}
+# US states (2020 Census approx.), keyed by 2-letter codes
+US_STATE_POP = {
+    "AL": 5024279, "AK": 733391, "AZ": 7151502, "AR": 3011524, "CA": 39538223,
+    "CO": 5773714, "CT": 3605944, "DE": 989948, "FL": 21538187, "GA": 10711908,
+    "HI": 1455271, "ID": 1839106, "IL": 12812508, "IN": 6785528, "IA": 3190369,
+    "KS": 2937880, "KY": 4505836, "LA": 4657757, "ME": 1362359, "MD": 6177224,
+    "MA": 7029917, "MI": 10077331, "MN": 5706494, "MS": 2961279, "MO": 6154913,
+    "MT": 1084225, "NE": 1961504, "NV": 3104614, "NH": 1377529, "NJ": 9288994,
+    "NM": 2117522, "NY": 20201249, "NC": 10439388, "ND": 779094, "OH": 11799448,
+    "OK": 3959353, "OR": 4237256, "PA": 13002700, "RI": 1097379, "SC": 5118425,
+    "SD": 886667, "TN": 6910840, "TX": 29145505, "UT": 3271616, "VT": 643077,
+    "VA": 8631393, "WA": 7705281, "WV": 1793716, "WI": 5893718, "WY": 576851,
+    "DC": 689545,
+}
+# European countries (approx. 2020), keyed by ISO3; also the country set of the Europe maps
+EUROPE_POP_ISO3 = {
+    "ALB": 2877797, "AND": 77265, "AUT": 8917205, "BEL": 11555997, "BGR": 6927288,
+    "BIH": 3280815, "BLR": 9398861, "CHE": 8654618, "CYP": 1207359, "CZE": 10693939,
+    "DEU": 83166711, "DNK": 5831404, "ESP": 47351567, "EST": 1331057, "FIN": 5540718,
+    "FRA": 67391582, "GBR": 67215293, "GRC": 10715549, "HRV": 4047200, "HUN": 9749763,
+    "IRL": 4994724, "ISL": 368792, "ITA": 59554023, "LTU": 2790845, "LUX": 634814,
+    "LVA": 1901548, "MCO": 39242, "MDA": 2617820, "MKD": 2083459, "MLT": 514564,
+    "MNE": 628066, "NLD": 17441139, "NOR": 5421241, "POL": 37950802, "PRT": 10196709,
+    "ROU": 19286123, "RUS": 146171015, "SMR": 33938, "SRB": 6908224, "SVK": 5458827,
+    "SVN": 2100126, "SWE": 10353442, "TUR": 84339067, "UKR": 44134693, "VAT": 825,
+    "XKX": 1831000, "LIE": 38137,
+}
+MAP_SCOPES = {
+    "world": {"locationmode": "ISO-3", "geo": {"scope": "world", "projection_type": "natural earth"}},
+    "europe": {"locationmode": "ISO-3", "geo": {"scope": "europe"}},
+    "usa": {"locationmode": "USA-states", "geo": {"scope": "usa"}},
+}
+STATIC_MAP_FORMATS = (".png", ".jpg", ".jpeg", ".webp", ".svg", ".pdf")
+
+
+def perCapita(values: pd.Series, codes: pd.Series, population: dict[str, float], people: int = 1_000_000) -> pd.Series:
+    """values per `people` inhabitants of the area in `codes`; NaN where the population is unknown."""
+    population = pd.to_numeric(pd.Series(codes).map(population), errors="coerce")
+    population = population.where(population > 0)
+    return pd.to_numeric(values, errors="coerce") / (population.to_numpy() / people)
+
+
+def choroplethMap(
+    df: pd.DataFrame,
+    locations: str,
+    value: str,
+    scope: Literal["world", "europe", "usa"] = "world",
+    title: str = "",
+    colorscale: str = "Reds",
+    colorbar_title: Optional[str] = None,
+    population: Optional[dict[str, float]] = None,
+    people: int = 1_000_000,
+    labels: bool = True,
+    decimals: int = 2,
+    label_size: int = 12,
+    hover_name: Optional[str] = None,
+) -> go.Figure:
+    """Choropleth of `value` by `locations` (ISO3 codes, or state codes for scope="usa").
+
+    With `population` (e.g. COUNTRY_POP, US_STATE_POP, EUROPE_POP_ISO3) the value is
+    shown per `people` inhabitants and areas without a population are dropped. The
+    value labels are one Scattergeo trace with array-valued locations/text, not one
+    trace per area.
+    """
+    settings = MAP_SCOPES[scope]
+    codes = df[locations]
+    values = pd.to_numeric(df[value], errors="coerce")
+    if population is not None:
+        values = perCapita(values, codes, population, people)
+    keep = (codes.notna() & values.notna()).to_numpy()
+    codes, values = codes[keep].to_numpy(), values[keep]
+
+    fig = go.Figure(
+        go.Choropleth(
+            locations=codes,
+            z=values.to_numpy(),
+            locationmode=settings["locationmode"],
+            colorscale=colorscale,
+            colorbar_title=colorbar_title if colorbar_title is not None else value,
+            hovertext=df.loc[keep, hover_name].to_numpy() if hover_name else None,
+        )
+    )
+    if labels and len(codes):
+        text = values.round().astype("int64").astype(str) if decimals == 0 else values.round(decimals).astype(str)
+        fig.add_trace(
+            go.Scattergeo(
+                locationmode=settings["locationmode"],
+                locations=codes,
+                text=text.to_numpy(),
+                mode="text",
+                textfont=dict(color="black", size=label_size),
+                showlegend=False,
+                hoverinfo="skip",
+            )
+        )
+    fig.update_layout(title_text=title, geo=settings["geo"], margin=dict(l=0, r=0, t=40, b=0), font=dict(size=16))
+    return fig
+
+
+def writeMap(fig: go.Figure, path, plotlyjs_dir: Optional[Path] = None, scale: float = 2.0) -> Path:
+    """Write a figure as a static image (STATIC_MAP_FORMATS, needs kaleido) or as compact HTML.
+
+    HTML pages load one shared plotly-<version>.min.js from `plotlyjs_dir` (default:
+    the page's folder), written there once, instead of embedding plotly.js in every page.
+    """
+    path = Path(path)
+    if path.suffix.lower() in STATIC_MAP_FORMATS:
+        fig.write_image(path, scale=scale)
+        return path
+
+    import plotly
+    from plotly.offline import get_plotlyjs
+
+    js_dir = Path(plotlyjs_dir) if plotlyjs_dir is not None else path.parent
+    js_path = js_dir / f"plotly-{plotly.__version__}.min.js"
+    if not js_path.is_file():
+        js_dir.mkdir(parents=True, exist_ok=True)
+        staging = js_path.with_suffix(".tmp")
+        staging.write_text(get_plotlyjs(), encoding="utf-8")
+        staging.replace(js_path)
+    src = Path(os.path.relpath(js_path.resolve(), path.parent.resolve())).as_posix()
+    fig.write_html(path, include_plotlyjs=src, include_mathjax=False, full_html=True)
+    return path
+
+
+# --- Rolling specialization engine ---------------------------------------------------
+def _cumulative_years(matrix: np.ndarray) -> np.ndarray:
+    """Cumulative sums along the years axis with a leading zero column: sum(cols a..b-1) = cum[:, b] - cum[:, a]."""
+    cumulative = np.zeros((matrix.shape[0], matrix.shape[1] + 1))
+    np.cumsum(matrix, axis=1, out=cumulative[:, 1:])
+    return cumulative
+
+
+def yearlyAmountMatrices(
+    rounds: pd.DataFrame,
+    investor_ids: pd.Index,
+    years: Iterable[int],
+    amount_column: str = "round_amount_usd",
+    space_column: str = "space_amount",
+    year_column: str = "year",
+) -> tuple[np.ndarray, np.ndarray]:
+    """Dense (investors x years) matrices of total and space amounts.
+
+    Rows follow `investor_ids`, columns follow `years`; rounds of other investors or
+    outside the years are ignored and missing cells are 0.
+    """
+    years = pd.Index(list(years))
+    rows = pd.Index(investor_ids).get_indexer(rounds["investor_id"])
+    cols = years.get_indexer(rounds[year_column])
+    keep = (rows >= 0) & (cols >= 0)
+    cells = rows[keep] * len(years) + cols[keep]
+    size = len(investor_ids) * len(years)
+    shape = (len(investor_ids), len(years))
+
+    def _dense(column: str) -> np.ndarray:
+        weights = pd.to_numeric(rounds[column], errors="coerce").fillna(0.0).to_numpy(dtype=float)[keep]
+        return np.bincount(cells, weights=weights, minlength=size).reshape(shape)
+
+    return _dense(amount_column), _dense(space_column)
+
+
+def windowSpecialization(
+    total: np.ndarray,
+    space: np.ndarray,
+    lookback: int,
+    threshold: Optional[float] = None,
+    min_periods: Optional[int] = None,
+) -> tuple[np.ndarray, Optional[np.ndarray]]:
+    """Space share over the `lookback` years preceding each column (current year excluded).
+
+    Window sums come from a cumulative sum along the years axis, so the cost does
+    not depend on `lookback`. A cell gets a ratio only when at least `min_periods`
+    window years fall inside the matrix (default: the full lookback) and the window
+    total is positive; otherwise it is 0. Returns (ratio, flags) with
+    flags = ratio >= threshold, or None when no threshold is given.
+    """
+    if min_periods is None:
+        min_periods = lookback
+    n_years = total.shape[1]
+    cum_total = _cumulative_years(total)
+    cum_space = _cumulative_years(space)
+
+    end = np.arange(n_years)
+    start = np.maximum(end - lookback, 0)
+    window_total = cum_total[:, end] - cum_total[:, start]
+    window_space = cum_space[:, end] - cum_space[:, start]
+
+    valid = (window_total > 0) & ((end - start) >= max(min_periods, 1))[None, :]
+    ratio = np.divide(window_space, window_total, out=np.zeros_like(window_total), where=valid)
+    np.clip(ratio, 0.0, 1.0, out=ratio)
+    flags = None if threshold is None else ratio >= threshold
+    return ratio, flags
+
+
+def sweepSpecialization(
+    total: np.ndarray,
+    space: np.ndarray,
+    years: Iterable[int],
+    investor_ids: pd.Index,
+    lookbacks: Iterable[int],
+    start_years: Iterable[int],
+    thresholds: Iterable[float],
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Space share for every (start_year, lookback) window and specialized counts per threshold.
+
+    A configuration covers the years start_year .. start_year + lookback - 1 and is
+    skipped when that window leaves `years`. All windows come from one cumulative
+    sum of the (investors x years) matrices, so the grid size barely affects the cost.
+
+    Returns (long, counts):
+    - long: investor_id, start_year, lookback, total_amount, space_amount, ratio
+      (ratio 0 when the window total is 0)
+    - counts: start_year, lookback, threshold, specialized_investors (ratio >= threshold),
+      active_investors (window total > 0)
+    """
+    years = list(years)
+    thresholds = np.asarray(sorted(set(thresholds)), dtype=float)
+    configs = [
+        (start, lookback)
+        for lookback in sorted(set(lookbacks))
+        for start in sorted(set(start_years))
+        if start in years and start + lookback - 1 in years
+    ]
+    if not configs:
+        raise ValueError(f"No (start_year, lookback) window fits inside years {years[0]}..{years[-1]}")
+
+    first = np.array([years.index(start) for start, _ in configs])
+    last = first + np.array([lookback for _, lookback in configs])
+    cum_total = _cumulative_years(total)
+    cum_space = _cumulative_years(space)
+    window_total = cum_total[:, last] - cum_total[:, first]
+    window_space = cum_space[:, last] - cum_space[:, first]
+    ratio = np.divide(window_space, window_total, out=np.zeros_like(window_total), where=window_total > 0)
+    np.clip(ratio, 0.0, 1.0, out=ratio)
+
+    n_investors, n_configs = ratio.shape
+    config_frame = pd.DataFrame(configs, columns=["start_year", "lookback"])
+    long = pd.DataFrame({
+        "investor_id": np.tile(np.asarray(investor_ids), n_configs),
+        "start_year": np.repeat(config_frame["start_year"].to_numpy(), n_investors),
+        "lookback": np.repeat(config_frame["lookback"].to_numpy(), n_investors),
+        "total_amount": window_total.ravel(order="F"),
+        "space_amount": window_space.ravel(order="F"),
+        "ratio": ratio.ravel(order="F"),
+    })
+
+    # count ratio >= threshold for every threshold with one sort per configuration
+    ordered = np.sort(ratio, axis=0)
+    specialized = np.stack([
+        n_investors - np.searchsorted(ordered[:, k], thresholds, side="left") for k in range(n_configs)
+    ])
+    counts = pd.DataFrame({
+        "start_year": np.repeat(config_frame["start_year"].to_numpy(), len(thresholds)),
+        "lookback": np.repeat(config_frame["lookback"].to_numpy(), len(thresholds)),
+        "threshold": np.tile(thresholds, n_configs),
+        "specialized_investors": specialized.ravel(),
+        "active_investors": np.repeat((window_total > 0).sum(axis=0), len(thresholds)),
+    })
+    return long, counts
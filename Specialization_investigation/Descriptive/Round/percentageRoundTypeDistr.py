@@ -1,6 +1,3 @@
-import json
-from pathlib import Path
-
 import matplotlib.pyplot as plt
 import pandas as pd
 
@@ -8,40 +5,6 @@ import Library as mylib
 from Tesi_SpaceEconomy.Specialization_investigation.flagSpaceSpec import spacePercentage
 
 
-def _load_round_normalization(json_path: Path) -> dict:
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-
-    # Build reverse map: raw_label_lower -> standardized_category
-    reverse = {}
-    for std_cat, raw_list in data.items():
-        for raw in raw_list:
-            if raw is None:
-                continue
-            key = str(raw).strip().lower()
-            if key:
-                reverse[key] = std_cat
-    return reverse
-
-
-def _standardize_round_labels(df: pd.DataFrame, normalizer: dict) -> pd.Series:
-    # Accept either 'round_label' or 'Round type' as the source column
-    source_col = None
-    for c in ("round_label", "Round type"):
-        if c in df.columns:
-            source_col = c
-            break
-    if source_col is None:
-        raise KeyError("Neither 'round_label' nor 'Round type' column found in rounds DB")
-
-    def map_label(val):
-        if pd.isna(val):
-            return None
-        key = str(val).strip().lower()
-        return normalizer.get(key)
-
-    return df[source_col].apply(map_label)
-
 COLOR_MAP = {
     "Seed": "#1f77b4",
     "Early Stage": "#ff7f0e",
@@ -177,9 +140,7 @@ def main() -> None:
     )
 
     # Normalize round labels to 4 standardized categories
-    json_path = Path(__file__).with_name("RoundNormaliz.JSON")
-    normalizer = _load_round_normalization(json_path)
-    rounds["std_round"] = _standardize_round_labels(rounds, normalizer)
+    rounds["std_round"] = mylib.stdRound(rounds)
 
     # Keep only mapped categories and valid classes
     std_order = ["Seed", "Early Stage", "Early Growth", "Later Stage"]
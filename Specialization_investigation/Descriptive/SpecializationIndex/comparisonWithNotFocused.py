@@ -9,7 +9,6 @@ characteristics evolve with specialization intensity.
 
 from __future__ import annotations
 
-import json
 import sys
 from pathlib import Path
 from typing import Sequence, Tuple
@@ -21,75 +20,28 @@ if str(PROJECT_ROOT) not in sys.path:
     sys.path.append(str(PROJECT_ROOT))
 
 import Library as mylib  # noqa: E402  (import after sys.path tweak)
+from Tesi_SpaceEconomy.Specialization_investigation.investorKPI import (  # noqa: E402
+    CLASS_EDGES,
+    DAYS_PER_MONTH,
+    INVESTOR_METRIC_MAP,
+    ROW_LABELS,
+    assign_classes,
+    build_round_metrics,
+)
+from Tesi_SpaceEconomy.Specialization_investigation.reportWriter import (  # noqa: E402
+    COMPARISON_FORMATS,
+    write_report,
+)
+from Tesi_SpaceEconomy.Specialization_investigation.significance import (  # noqa: E402
+    bootstrap_class_means,
+    flag_significance,
+    permutation_class_test,
+)
 
-ROUND_TYPES = ["Seed", "Early Stage", "Early Growth", "Later Stage"]
-ROW_LABELS = [
-    "Number of entities",
-    "Average round size (space firms, USD mn)",
-    "Average round size (non-space firms, USD mn)",
-    "Average number of rounds (space firms)",
-    "Average number of rounds (non-space firms)",
-    "Average time between investments (months)",
-    "Segments - % upstream",
-    "Segments - % downstream",
-    "Segments - % others",
-    "Round distribution (space firms) - % seed",
-    "Round distribution (space firms) - % early stage",
-    "Round distribution (space firms) - % early growth",
-    "Round distribution (space firms) - % later stage",
-    "Round distribution (non-space firms) - % seed",
-    "Round distribution (non-space firms) - % early stage",
-    "Round distribution (non-space firms) - % early growth",
-    "Round distribution (non-space firms) - % later stage",
-    "Domestic investments (%)",
-]
-CLASS_BINS = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0000001]
-CLASS_LABELS = ["0-20%", "20%-40%", "40%-60%", "60%-80%", "80%-100%"]
 FACT_TABLE_PATH = "DB_Out\Fact\FactInvestorYearSpecialization.parquet"
 OUTPUT_XLSX = Path(__file__).with_name("comparison_with_not_focused_tables.xlsx")
-
-
-def load_round_normalizer(script_path: Path) -> dict[str, str]:
-    """Load the round label normalization dictionary if available."""
-    candidates = [
-        script_path.parent / "Round" / "RoundNormaliz.JSON",
-        script_path.parents[1] / "Round" / "RoundNormaliz.JSON",
-    ]
-    json_path = next((path for path in candidates if path.exists()), None)
-    if json_path is None:
-        return {}
-
-    with open(json_path, "r", encoding="utf-8") as handle:
-        raw = json.load(handle)
-
-    mapping: dict[str, str] = {}
-    for category, aliases in raw.items():
-        if not aliases:
-            continue
-        for alias in aliases:
-            key = str(alias).strip().lower()
-            if key:
-                mapping[key] = category
-    return mapping
-
-
-def mean_std(series: pd.Series, multiplier: float = 1.0) -> tuple[float, float, int]:
-    """Return mean, population std, and sample size after scaling."""
-    if series.empty:
-        return 0.0, 0.0, 0
-    cleaned = series.dropna().astype(float)
-    if cleaned.empty:
-        return 0.0, 0.0, 0
-    scaled = cleaned * multiplier
-    count = int(len(scaled))
-    mean_val = float(scaled.mean())
-    std_val = float(scaled.std(ddof=0)) if count > 1 else 0.0
-    return mean_val, std_val, count
-
-
-def normalize_country(series: pd.Series) -> pd.Series:
-    """Canonical lower-case representation for domestic comparisons."""
-    return series.fillna("").astype(str).str.strip().str.casefold()
+RESAMPLES = 10_000  # bootstrap / permutation resamples per class
+RESAMPLE_SEED = 42  # fixed seed so the exported intervals are reproducible
 
 
 def load_original_vc_ids(investors: pd.DataFrame) -> pd.Index:
@@ -136,16 +88,12 @@ def prepare_round_dataset() -> tuple[pd.DataFrame, list[str]]:
     rounds["round_amount_usd"] = pd.to_numeric(
         rounds.get("round_amount_usd"), errors="coerce"
     ).fillna(0.0)
-    rounds = mylib.space(rounds, "company_id", False)
+    rounds = mylib.space(rounds, "company_id", False, flags=mylib.COMPANY_FLAGS)
     for col in ["space", "upstream", "downstream"]:
         rounds[col] = rounds.get(col, 0).fillna(0).astype(int)
 
-    normalizer = load_round_normalizer(Path(__file__))
-    round_labels = rounds.get("round_label")
-    if round_labels is not None and normalizer:
-        rounds["std_round"] = round_labels.astype(str).str.strip().str.lower().map(normalizer)
-    else:
-        rounds["std_round"] = pd.NA
+    # std_round stored at ingestion (or normalized from round_label via RoundNormaliz.JSON)
+    rounds["std_round"] = mylib.stdRound(rounds)
 
     firms = pd.read_parquet("DB_Out/DB_firms.parquet")[
         ["company_id", "company_country"]
@@ -169,189 +117,146 @@ def prepare_round_dataset() -> tuple[pd.DataFrame, list[str]]:
     ).astype("Int64")
     rounds = rounds.merge(investor_country, on="investor_id", how="left")
 
-    rounds["domestic_flag"] = (
-        normalize_country(rounds["investor_country"])
-        == normalize_country(rounds["company_country"])
+    rounds["domestic_flag"] = mylib.sameLabel(
+        rounds["investor_country"], rounds["company_country"]
     ).astype(int)
 
     spec = load_specialization_index()
     rounds = rounds.merge(spec, on=["investor_id", "year"], how="left")
     rounds = rounds.dropna(subset=["specialization_index"])
 
-    rounds["class"] = pd.cut(
-        rounds["specialization_index"],
-        bins=CLASS_BINS,
-        labels=CLASS_LABELS,
-        include_lowest=True,
-        right=True,
-    )
+    rounds["class"], labels = assign_classes(rounds["specialization_index"], CLASS_EDGES)
     rounds = rounds.dropna(subset=["class"])
     rounds["class"] = rounds["class"].astype("category")
-    return rounds, CLASS_LABELS
+    return rounds, labels
 
 
-def time_between_investments(subset: pd.DataFrame) -> tuple[float, float, int]:
-    """Average months between consecutive investments inside the subset."""
-    if subset.empty:
-        return 0.0, 0.0, 0
-    ordered = subset.sort_values(["investor_id", "round_date"])
-    gaps = ordered.groupby("investor_id")["round_date"].diff().dropna()
-    if gaps.empty:
-        return 0.0, 0.0, 0
-    months = gaps.dt.total_seconds() / (60 * 60 * 24 * 30.4375)
-    return mean_std(months)
+def _stats_by_class(
+    values: pd.DataFrame, class_labels: Sequence[str]
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Mean, population std and non-null count of every column per class."""
+    grouped = values.groupby("class", observed=False)
+    return (
+        grouped.mean().reindex(class_labels),
+        grouped.std(ddof=0).reindex(class_labels),
+        grouped.count().reindex(class_labels),
+    )
 
 
 def compute_metrics_by_class(
     rounds: pd.DataFrame, class_labels: Sequence[str]
 ) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """Aggregate round-level KPIs for each specialization class."""
-    means = {row: [] for row in ROW_LABELS}
-    stds = {row: [] for row in ROW_LABELS}
-    counts = {row: [] for row in ROW_LABELS}
-
-    for label in class_labels:
-        subset = rounds[rounds["class"] == label]
-        investor_count = subset["investor_id"].nunique()
-        means["Number of entities"].append(float(investor_count))
-        stds["Number of entities"].append(0.0)
-        counts["Number of entities"].append(investor_count)
-
-        space_rounds = subset[subset["space"] == 1]
-        other_rounds = subset[subset["space"] != 1]
-
-        for row_label, data in [
-            (
-                "Average round size (space firms, USD mn)",
-                (space_rounds["round_amount_usd"] / 1_000_000),
-            ),
-            (
-                "Average round size (non-space firms, USD mn)",
-                (other_rounds["round_amount_usd"] / 1_000_000),
-            ),
-        ]:
-            mean_val, std_val, count_val = mean_std(data)
-            means[row_label].append(mean_val)
-            stds[row_label].append(std_val)
-            counts[row_label].append(count_val)
-
-        space_company_counts = (
-            space_rounds.dropna(subset=["company_id"]).groupby("company_id").size()
-        )
-        other_company_counts = (
-            other_rounds.dropna(subset=["company_id"]).groupby("company_id").size()
+    round_metrics = build_round_metrics(rounds)
+    round_metrics["class"] = rounds["class"]
+
+    # rounds per company and months between consecutive rounds of an investor
+    # are not round attributes: build them inside each class separately
+    company_rounds = rounds.dropna(subset=["company_id"])
+    company_space = company_rounds["space"] == 1
+    company_counts = [
+        company_rounds[mask]
+        .groupby(["class", "company_id"], observed=True)
+        .size()
+        .rename(column)
+        .reset_index(level="class")
+        for column, mask in (
+            ("rounds_space_count", company_space),
+            ("rounds_other_count", ~company_space),
         )
+    ]
+    ordered = rounds.sort_values(["investor_id", "round_date"])
+    gaps = ordered.groupby(["class", "investor_id"], observed=True)["round_date"].diff()
+    time_gaps = pd.DataFrame(
+        {
+            "class": ordered["class"],
+            "avg_time_between_months": gaps.dt.total_seconds() / (60 * 60 * 24 * DAYS_PER_MONTH),
+        }
+    )
 
-        for row_label, data in [
-            ("Average number of rounds (space firms)", space_company_counts),
-            ("Average number of rounds (non-space firms)", other_company_counts),
-        ]:
-            mean_val, std_val, count_val = mean_std(data)
-            means[row_label].append(mean_val)
-            stds[row_label].append(std_val)
-            counts[row_label].append(count_val)
-
-        mean_val, std_val, count_val = time_between_investments(subset)
-        means["Average time between investments (months)"].append(mean_val)
-        stds["Average time between investments (months)"].append(std_val)
-        counts["Average time between investments (months)"].append(count_val)
-
-        segment_base = space_rounds.copy()
-        segment_base["other_flag"] = (
-            (segment_base["upstream"] == 0) & (segment_base["downstream"] == 0)
-        ).astype(int)
-        for row_label, column in [
-            ("Segments - % upstream", "upstream"),
-            ("Segments - % downstream", "downstream"),
-            ("Segments - % others", "other_flag"),
-        ]:
-            mean_val, std_val, count_val = mean_std(segment_base[column], multiplier=100.0)
-            means[row_label].append(mean_val)
-            stds[row_label].append(std_val)
-            counts[row_label].append(count_val)
-
-        valid_space = segment_base[segment_base["std_round"].isin(ROUND_TYPES)]
-        valid_other = other_rounds[other_rounds["std_round"].isin(ROUND_TYPES)]
-
-        def stage_stats(df: pd.DataFrame, stages: list[str], prefix: str) -> None:
-            for stage in stages:
-                indicator = (df["std_round"] == stage).astype(int)
-                row_label = f"{prefix} - % {stage.lower()}"
-                mean_val, std_val, count_val = mean_std(indicator, multiplier=100.0)
-                means[row_label].append(mean_val)
-                stds[row_label].append(std_val)
-                counts[row_label].append(count_val)
-
-        stage_stats(valid_space, ROUND_TYPES, "Round distribution (space firms)")
-        stage_stats(valid_other, ROUND_TYPES, "Round distribution (non-space firms)")
-
-        mean_val, std_val, count_val = mean_std(subset["domestic_flag"], multiplier=100.0)
-        means["Domestic investments (%)"].append(mean_val)
-        stds["Domestic investments (%)"].append(std_val)
-        counts["Domestic investments (%)"].append(count_val)
-
-    means_df = pd.DataFrame(means, index=class_labels).T.reindex(ROW_LABELS).fillna(0.0)
-    stds_df = pd.DataFrame(stds, index=class_labels).T.reindex(ROW_LABELS).fillna(0.0)
-    counts_df = (
-        pd.DataFrame(counts, index=class_labels).T.reindex(ROW_LABELS).fillna(0).astype(int)
+    stats = [
+        _stats_by_class(frame, class_labels)
+        for frame in (round_metrics, *company_counts, time_gaps)
+    ]
+    means, stds, counts = (
+        pd.concat([part[i] for part in stats], axis=1) for i in range(3)
+    )
+
+    entities = rounds.groupby("class", observed=False)["investor_id"].nunique()
+    entities = entities.reindex(class_labels).fillna(0)
+    means.insert(0, "Number of entities", entities.astype(float))
+    stds.insert(0, "Number of entities", 0.0)
+    counts.insert(0, "Number of entities", entities)
+
+    labels = {column: row for row, column in INVESTOR_METRIC_MAP.items()}
+    means_df, stds_df, counts_df = (
+        frame.rename(columns=labels).T.reindex(ROW_LABELS) for frame in (means, stds, counts)
+    )
+    return (
+        means_df.fillna(0.0),
+        stds_df.fillna(0.0),
+        counts_df.fillna(0).astype(int),
     )
-    return means_df, stds_df, counts_df
-
-
-def flag_significance(
-    means: pd.DataFrame, stds: pd.DataFrame, counts: pd.DataFrame, alpha: float = 0.05
-) -> pd.DataFrame:
-    """Two-tailed z-test using the provided std/count metadata."""
-    if alpha != 0.05:
-        raise ValueError("Currently only alpha=0.05 is supported.")
-    z_threshold = 1.96
-    significance = pd.DataFrame(False, index=means.index, columns=means.columns)
-
-    for row in means.index:
-        if row == "Number of entities":
-            continue
-        for col in means.columns:
-            mean_val = float(means.loc[row, col])
-            std_val = float(stds.loc[row, col])
-            count_val = counts.loc[row, col]
-            if pd.isna(count_val) or count_val <= 1:
-                continue
-            if std_val == 0.0:
-                significance.loc[row, col] = mean_val != 0.0
-                continue
-            se = std_val
-            if se == 0.0:
-                significance.loc[row, col] = mean_val != 0.0
-                continue
-            significance.loc[row, col] = abs(mean_val) >= z_threshold * se
-    return significance
 
 
 def main() -> None:
     rounds, labels = prepare_round_dataset()
     means, stds, counts = compute_metrics_by_class(rounds, labels)
 
-    significance = flag_significance(means, stds, counts, alpha=0.05)
-    means_out = means.round(2)
-    stds_out = stds.round(2)
+    # dispersion is the round-level std (not std/sqrt(n)), as in the original table
+    significance = flag_significance(means, stds, counts, alpha=0.05, standard_error=False)
+
+    # Rounds are resampled by investor (cluster bootstrap) for the round-attribute KPIs
+    round_metrics = build_round_metrics(rounds)
+    row_names = {column: row for row, column in INVESTOR_METRIC_MAP.items()}
+    ci_low, ci_high = bootstrap_class_means(
+        round_metrics,
+        rounds["class"],
+        labels,
+        clusters=rounds["investor_id"],
+        n_resamples=RESAMPLES,
+        seed=RESAMPLE_SEED,
+    )
+    permutation_p = permutation_class_test(
+        round_metrics,
+        rounds["class"],
+        labels,
+        clusters=rounds["investor_id"],
+        n_resamples=RESAMPLES,
+        seed=RESAMPLE_SEED,
+    )
+    ci_low, ci_high, permutation_p = (
+        table.rename(index=row_names).reindex(ROW_LABELS)
+        for table in (ci_low, ci_high, permutation_p)
+    )
 
-    with pd.ExcelWriter(OUTPUT_XLSX, engine="openpyxl") as writer:
-        means_out.to_excel(writer, sheet_name="Means")
-        stds_out.to_excel(writer, sheet_name="StdDev")
-        counts.to_excel(writer, sheet_name="SampleSize")
-        significance.to_excel(writer, sheet_name="Significance (5%)")
+    # Canonical tables go to parquet first, then each to its dedicated Excel sheet
+    write_report(
+        OUTPUT_XLSX,
+        {
+            "Means": means,
+            "StdDev": stds,
+            "SampleSize": counts,
+            "Significance (5%)": significance,
+            "Bootstrap CI low": ci_low,
+            "Bootstrap CI high": ci_high,
+            "Permutation p-value": permutation_p,
+        },
+        formats=COMPARISON_FORMATS,
+    )
 
     significance_display = significance.replace({True: "Yes", False: ""})
-    means_display = means_out.astype(str).applymap(lambda v: f"{float(v):.2f}")
 
     print("Average metrics by specialization class (* = significant at 5%):")
-    print(means_display)
+    print(means.to_string(float_format="{:.2f}".format))
     print("\nStandard deviation by specialization class:")
-    print(stds_out)
+    print(stds.round(2))
     print("\nSample size used for each metric (per class):")
     print(counts)
     print("\nSignificance (5% level):")
     print(significance_display)
+    print(f"\nPermutation p-values vs {labels[0]} ({RESAMPLES} resamples):")
+    print(permutation_p.round(4))
     print(f"\nExcel output saved to: {OUTPUT_XLSX}")
 
 
@@ -6,12 +6,17 @@ space-tagged rounds over the preceding five calendar years (exclusive of the
 current year). Calculations start in 2006 so every point leverages a full
 five-year history (2001-2005 for 2006, ..., 2020-2024 for 2025) while the raw
 round history spans 2000-2025.
+
+By default main() refreshes the table incrementally from the per-(investor, year)
+aggregates kept in FactInvestorYearAmounts.parquet; pass --full to rebuild it.
 """
 
+import argparse
 import sys
 from pathlib import Path
 from typing import Sequence
 
+import numpy as np
 import pandas as pd
 
 PROJECT_ROOT = Path(__file__).resolve().parents[4]
@@ -26,6 +31,16 @@ START_YEAR = 2006  # first year with a complete five-year lookback
 LOOKBACK_YEARS = 5
 YEARS: Sequence[int] = tuple(range(MIN_YEAR, MAX_YEAR + 1))
 OUTPUT_PATH = PROJECT_ROOT / "DB_Out" / "Fact" / "FactInvestorYearSpecialization.parquet"
+AMOUNTS_PATH = PROJECT_ROOT / "DB_Out" / "Fact" / "FactInvestorYearAmounts.parquet"
+# round fields whose change invalidates the (investor, year) cell the round falls in
+HASHED_COLUMNS = ["investor_id", "company_id", "round_date", "round_amount_usd", "space"]
+CELL_COLUMNS = {
+    "investor_id": "Int64",
+    "year": "int64",
+    "total_amount": "float64",
+    "space_amount": "float64",
+    "digest": "UInt64",
+}
 
 
 def _coerce_investor_ids(series: pd.Series) -> pd.Series:
@@ -49,13 +64,12 @@ def _load_original_vc_ids() -> pd.Index:
 
 
 def _prepare_rounds(valid_ids: pd.Index, years: Sequence[int]) -> pd.DataFrame:
-    rounds = mylib.openDB("rounds")
     required = ["investor_id", "company_id", "round_amount_usd", "round_date"]
-    missing = [col for col in required if col not in rounds.columns]
-    if missing:
-        raise KeyError(f"Missing columns in rounds table: {missing}")
-
-    rounds = rounds[required].copy()
+    rounds = mylib.openDB(
+        "rounds",
+        columns=required,
+        filters={"years": (min(years), max(years)), "investor_id": valid_ids},
+    )
     rounds["investor_id"] = _coerce_investor_ids(rounds["investor_id"])
     rounds = rounds.dropna(subset=["investor_id"])
     rounds = rounds[rounds["investor_id"].isin(valid_ids)]
@@ -80,73 +94,119 @@ def _prepare_rounds(valid_ids: pd.Index, years: Sequence[int]) -> pd.DataFrame:
 def _compute_specialization(
     rounds: pd.DataFrame, valid_ids: pd.Index, years: Sequence[int]
 ) -> pd.DataFrame:
-    if rounds.empty:
-        return pd.DataFrame(0.0, index=valid_ids, columns=years)
+    total, space = mylib.yearlyAmountMatrices(rounds, valid_ids, years)
+    ratio, _ = mylib.windowSpecialization(total, space, LOOKBACK_YEARS)
+    ratio[:, np.asarray(years) < START_YEAR] = 0.0
+
+    pivot = pd.DataFrame(ratio, index=valid_ids, columns=pd.Index(years, name="year"))
+    pivot.index.name = "investor_id"
+    return pivot
+
 
-    grouped = (
-        rounds.groupby(["investor_id", "year"])
+def _aggregate_cells(rounds: pd.DataFrame) -> pd.DataFrame:
+    """Per-(investor, year) amounts plus an order-independent digest of the rounds in the cell."""
+    if rounds.empty:
+        return pd.DataFrame(
+            {col: pd.Series(dtype=dtype) for col, dtype in CELL_COLUMNS.items()}
+        )
+    round_hash = pd.util.hash_pandas_object(rounds[HASHED_COLUMNS], index=False)
+    cells = (
+        rounds.assign(round_hash=round_hash.to_numpy())
+        .groupby(["investor_id", "year"])
         .agg(
             total_amount=("round_amount_usd", "sum"),
             space_amount=("space_amount", "sum"),
+            digest=("round_hash", "sum"),  # uint64 sum wraps around: stable for a set of rounds
         )
-        .sort_index()
+        .reset_index()
     )
+    return cells.astype(CELL_COLUMNS)
+
 
-    full_index = pd.MultiIndex.from_product(
-        [valid_ids, years], names=["investor_id", "year"]
+def _specialization_from_cells(
+    cells: pd.DataFrame, investor_ids: pd.Index, years: Sequence[int]
+) -> pd.DataFrame:
+    return _compute_specialization(
+        cells.rename(columns={"total_amount": "round_amount_usd"}), investor_ids, years
     )
-    grouped = grouped.reindex(full_index, fill_value=0.0).reset_index()
-
-    def apply_window(df: pd.DataFrame) -> pd.DataFrame:
-        df = df.sort_values("year")
-        df["total_window"] = (
-            df["total_amount"]
-            .shift(1)
-            .rolling(window=LOOKBACK_YEARS, min_periods=LOOKBACK_YEARS)
-            .sum()
-        )
-        df["space_window"] = (
-            df["space_amount"]
-            .shift(1)
-            .rolling(window=LOOKBACK_YEARS, min_periods=LOOKBACK_YEARS)
-            .sum()
-        )
-        return df
 
-    grouped = grouped.groupby("investor_id", group_keys=False).apply(apply_window)
-    grouped["specialization_index"] = 0.0
 
-    valid_window = (
-        (grouped["year"] >= START_YEAR) & grouped["total_window"].gt(0)
-    )
-    grouped.loc[valid_window, "specialization_index"] = (
-        grouped.loc[valid_window, "space_window"]
-        .div(grouped.loc[valid_window, "total_window"])
-        .clip(0.0, 1.0)
-    )
+def update_fact_table(
+    years: Sequence[int] = YEARS, full: bool = False
+) -> tuple[pd.DataFrame, pd.DataFrame, int]:
+    """Refresh the fact table and the FactInvestorYearAmounts side table.
+
+    The side table keeps total/space amounts and a digest of the rounds of every
+    (investor, year) cell. Cells whose digest changed since the last run (new,
+    edited or removed rounds, or a change of the space flag) only invalidate the
+    LOOKBACK_YEARS columns that follow them, so a refresh touching a few investors
+    rewrites a few cells. Falls back to a full build when no previous state exists,
+    the year grid changed or full=True. Returns (fact table, side table, number of
+    fact cells recomputed).
+    """
+    years = list(years)
+    valid_ids = _load_original_vc_ids()
+    cells = _aggregate_cells(_prepare_rounds(valid_ids, years))
 
-    pivot = (
-        grouped.pivot(index="investor_id", columns="year", values="specialization_index")
-        .reindex(columns=years, fill_value=0.0)
-        .reindex(valid_ids, fill_value=0.0)
-    )
-    pivot.index.name = "investor_id"
-    return pivot
+    previous_fact = previous_cells = None
+    if not full and OUTPUT_PATH.is_file() and AMOUNTS_PATH.is_file():
+        previous_fact = pd.read_parquet(OUTPUT_PATH)
+        previous_cells = pd.read_parquet(AMOUNTS_PATH)
+        if list(previous_fact.columns) != years:
+            previous_fact = previous_cells = None
 
+    if previous_fact is None:
+        fact = _specialization_from_cells(cells, valid_ids, years)
+        return fact, cells, fact.size
 
-def build_fact_table(years: Sequence[int] = YEARS) -> pd.DataFrame:
-    valid_ids = _load_original_vc_ids()
-    rounds = _prepare_rounds(valid_ids, years)
-    return _compute_specialization(rounds, valid_ids, years)
+    fact = previous_fact.reindex(valid_ids, fill_value=0.0)
+    fact.columns = pd.Index(years, name="year")
+    fact.index.name = "investor_id"
+
+    compared = cells.merge(
+        previous_cells, on=["investor_id", "year"], how="outer", suffixes=("", "_previous"), indicator=True
+    )
+    digest_changed = (compared["digest"] != compared["digest_previous"]).fillna(True)
+    changed = compared[(compared["_merge"] != "both") | digest_changed]
+    changed = changed[changed["investor_id"].isin(valid_ids)]
+
+    # cells (investor, year) that feed a window: columns year+1 .. year+LOOKBACK_YEARS
+    affected = np.zeros(fact.shape, dtype=bool)
+    rows = valid_ids.get_indexer(changed["investor_id"])
+    first_col = np.searchsorted(years, changed["year"].to_numpy(), side="right")
+    for offset in range(LOOKBACK_YEARS):
+        cols = first_col + offset
+        inside = cols < len(years)
+        affected[rows[inside], cols[inside]] = True
+    # investors new to the universe get their whole row
+    affected[~valid_ids.isin(previous_fact.index)] = True
+
+    touched = affected.any(axis=1)
+    if touched.any():
+        touched_ids = valid_ids[touched]
+        recomputed = _specialization_from_cells(
+            cells[cells["investor_id"].isin(touched_ids)], touched_ids, years
+        ).to_numpy()
+        values = fact.to_numpy(copy=True)
+        block = values[touched]
+        block[affected[touched]] = recomputed[affected[touched]]
+        values[touched] = block
+        fact = pd.DataFrame(values, index=fact.index, columns=fact.columns)
+    return fact, cells, int(affected.sum())
 
 
 def main() -> None:
-    fact_df = build_fact_table()
+    parser = argparse.ArgumentParser(description="Rebuild FactInvestorYearSpecialization.")
+    parser.add_argument("--full", action="store_true", help="recompute every investor and year")
+    args = parser.parse_args()
+
+    fact_df, cells, rewritten = update_fact_table(full=args.full)
     OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
     fact_df.to_parquet(OUTPUT_PATH)
+    cells.to_parquet(AMOUNTS_PATH, index=False)
     print(
         f"Saved specialization index for {fact_df.shape[0]} investors "
-        f"across {fact_df.shape[1]} years -> {OUTPUT_PATH}"
+        f"across {fact_df.shape[1]} years ({rewritten} cells recomputed) -> {OUTPUT_PATH}"
     )
 
 
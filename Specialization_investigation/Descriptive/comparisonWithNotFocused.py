@@ -3,7 +3,6 @@
 #  - flags 5% significant deviations using simple z-tests
 #  - exports means, std devs, sample sizes, and significance to Excel
 #  - restricts to venture capital investors with >=4 deals and at least one European space deal
-import json
 from pathlib import Path
 
 import pandas as pd
@@ -12,72 +11,28 @@ import Library as mylib
 from Tesi_SpaceEconomy.Specialization_investigation.flagSpaceSpec import (
     spacePercentage,
 )
+from Tesi_SpaceEconomy.Specialization_investigation.investorKPI import (
+    CAPITAL_COLUMN,
+    CLASS_EDGES,
+    INVESTOR_METRIC_MAP,
+    ROW_LABELS,
+    assign_classes,
+    build_investor_metrics,
+    compute_metrics_by_class,
+)
+from Tesi_SpaceEconomy.Specialization_investigation.reportWriter import (
+    COMPARISON_FORMATS,
+    write_report,
+)
+from Tesi_SpaceEconomy.Specialization_investigation.significance import (
+    bootstrap_class_means,
+    flag_significance,
+    permutation_class_test,
+)
 
-# Canonical round buckets used to standardize round labels before aggregation
-ROUND_TYPES = ["Seed", "Early Stage", "Early Growth", "Later Stage"]
-# Explicit row ordering for the exported tables
-ROW_LABELS = [
-    "Number of entities",
-    "Average round size (space firms, USD mn)",
-    "Average round size (non-space firms, USD mn)",
-    "Average number of rounds (space firms)",
-    "Average number of rounds (non-space firms)",
-    "Average time between investments (months)",
-    "Segments - % upstream",
-    "Segments - % downstream",
-    "Segments - % others",
-    "Round distribution (space firms) - % seed",
-    "Round distribution (space firms) - % early stage",
-    "Round distribution (space firms) - % early growth",
-    "Round distribution (space firms) - % later stage",
-    "Round distribution (non-space firms) - % seed",
-    "Round distribution (non-space firms) - % early stage",
-    "Round distribution (non-space firms) - % early growth",
-    "Round distribution (non-space firms) - % later stage",
-    "Domestic investments (%)",
-]
-# Mapping between row labels and investor-level metric columns
-INVESTOR_METRIC_MAP = {
-    "Average round size (space firms, USD mn)": "avg_size_space_musd",
-    "Average round size (non-space firms, USD mn)": "avg_size_other_musd",
-    "Average number of rounds (space firms)": "rounds_space_count",
-    "Average number of rounds (non-space firms)": "rounds_other_count",
-    "Average time between investments (months)": "avg_time_between_months",
-    "Segments - % upstream": "upstream_pct",
-    "Segments - % downstream": "downstream_pct",
-    "Segments - % others": "other_segments_pct",
-    "Round distribution (space firms) - % seed": "round_seed_pct_space",
-    "Round distribution (space firms) - % early stage": "round_early_stage_pct_space",
-    "Round distribution (space firms) - % early growth": "round_early_growth_pct_space",
-    "Round distribution (space firms) - % later stage": "round_later_stage_pct_space",
-    "Round distribution (non-space firms) - % seed": "round_seed_pct_other",
-    "Round distribution (non-space firms) - % early stage": "round_early_stage_pct_other",
-    "Round distribution (non-space firms) - % early growth": "round_early_growth_pct_other",
-    "Round distribution (non-space firms) - % later stage": "round_later_stage_pct_other",
-    "Domestic investments (%)": "domestic_pct",
-}
-
-
-def load_round_normalizer(script_path: Path) -> dict[str, str]:
-    # Normalizes raw round labels so we can aggregate clean round distributions
-    """Load the round type normalization dictionary if available."""
-    json_path = script_path.parent / "Round" / "RoundNormaliz.JSON"
-    if not json_path.exists():
-        return {}
-
-    with open(json_path, "r", encoding="utf-8") as handle:
-        raw = json.load(handle)
-
-    mapping: dict[str, str] = {}
-    for category, aliases in raw.items():
-        if not aliases:
-            continue
-        for alias in aliases:
-            # Keep lowercase/stripped keys to avoid downstream case mismatches
-            key = str(alias).strip().lower()
-            if key:
-                mapping[key] = category
-    return mapping
+RESAMPLES = 10_000  # bootstrap / permutation resamples per class
+RESAMPLE_SEED = 42  # fixed seed so the exported intervals are reproducible
+WEIGHT_BY_CAPITAL = False  # weight class means/stds by each investor's capital deployed
 
 
 def mean_std(series: pd.Series, multiplier: float = 1.0) -> tuple[float, float, int]:
@@ -125,146 +80,11 @@ def average_rounds_per_investor(rounds: pd.DataFrame) -> tuple[float, float, int
     return avg, std, int(len(counts))
 
 
-def build_investor_metrics(rounds: pd.DataFrame, class_labels: list[str]) -> pd.DataFrame:
-    """Compute per-investor KPIs prior to class-level aggregation."""
-    investor_classes = (
-        rounds[["investor_id", "class"]]
-        .drop_duplicates()
-        .dropna(subset=["investor_id"])
-        .set_index("investor_id")
-    )
-    metrics = investor_classes.copy()
-
-    space_rounds = rounds[rounds["space"] == 1]
-    other_rounds = rounds[rounds["space"] != 1]
-
-    metrics["avg_size_space_musd"] = (
-        space_rounds.groupby("investor_id")["round_amount_usd"].mean() / 1_000_000
-    )
-    metrics["avg_size_other_musd"] = (
-        other_rounds.groupby("investor_id")["round_amount_usd"].mean() / 1_000_000
-    )
-
-    metrics["rounds_space_count"] = space_rounds.groupby("investor_id").size()
-    metrics["rounds_other_count"] = other_rounds.groupby("investor_id").size()
-
-    rounds_sorted = rounds.sort_values(["investor_id", "round_date"])
-    diffs = rounds_sorted.groupby("investor_id")["round_date"].diff()
-    months = diffs.dt.total_seconds() / (60 * 60 * 24 * 30.4375)
-    avg_time = (
-        months.groupby(rounds_sorted["investor_id"]).mean().rename("avg_time_between_months")
-    )
-    metrics = metrics.join(avg_time, how="left")
-
-    if not space_rounds.empty:
-        seg = space_rounds.copy()
-        seg["upstream"] = seg["upstream"].fillna(0)
-        seg["downstream"] = seg["downstream"].fillna(0)
-        upstream_pct = (
-            seg.groupby("investor_id")["upstream"].mean() * 100.0
-        ).rename("upstream_pct")
-        downstream_pct = (
-            seg.groupby("investor_id")["downstream"].mean() * 100.0
-        ).rename("downstream_pct")
-        other_pct = (
-            ((seg["upstream"] == 0) & (seg["downstream"] == 0))
-            .astype(int)
-            .groupby(seg["investor_id"])
-            .mean()
-            * 100.0
-        ).rename("other_segments_pct")
-        metrics = metrics.join(upstream_pct, how="left")
-        metrics = metrics.join(downstream_pct, how="left")
-        metrics = metrics.join(other_pct, how="left")
-
-    space_stage_map = {
-        "Seed": "round_seed_pct_space",
-        "Early Stage": "round_early_stage_pct_space",
-        "Early Growth": "round_early_growth_pct_space",
-        "Later Stage": "round_later_stage_pct_space",
-    }
-    other_stage_map = {
-        "Seed": "round_seed_pct_other",
-        "Early Stage": "round_early_stage_pct_other",
-        "Early Growth": "round_early_growth_pct_other",
-        "Later Stage": "round_later_stage_pct_other",
-    }
-
-    for subset, stage_map in [
-        (space_rounds, space_stage_map),
-        (other_rounds, other_stage_map),
-    ]:
-        valid = subset[subset["std_round"].isin(ROUND_TYPES)].copy()
-        if valid.empty:
-            continue
-        amount_table = (
-            valid.groupby(["investor_id", "std_round"])["round_amount_usd"].sum()
-        ).unstack(fill_value=0)
-        totals = amount_table.sum(axis=1).replace(0, pd.NA)
-        share_table = amount_table.divide(totals, axis=0) * 100.0
-        share_table = share_table.rename(columns=stage_map)
-        for col in stage_map.values():
-            if col not in share_table.columns:
-                share_table[col] = pd.NA
-        metrics = metrics.join(share_table[list(stage_map.values())], how="left")
-
-    domestic_pct = (
-        rounds.groupby("investor_id")["domestic_flag"].mean() * 100.0
-    ).rename("domestic_pct")
-    metrics = metrics.join(domestic_pct, how="left")
-
-    for col in INVESTOR_METRIC_MAP.values():
-        if col not in metrics.columns:
-            metrics[col] = pd.NA
-
-    metrics = metrics.reset_index().rename(columns={"class": "class"})
-    metrics["class"] = pd.Categorical(
-        metrics["class"], categories=class_labels, ordered=True
-    )
-    return metrics
-
-
-def compute_metrics_by_class(
-    investor_metrics: pd.DataFrame,
-    class_labels: list[str],
-) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    """Aggregate investor-level metrics by specialization class."""
-    means: dict[str, list[float]] = {row: [] for row in ROW_LABELS}
-    stds: dict[str, list[float]] = {row: [] for row in ROW_LABELS}
-    counts: dict[str, list[int]] = {row: [] for row in ROW_LABELS}
-
-    for label in class_labels:
-        subset = investor_metrics[investor_metrics["class"] == label]
-        investor_count = len(subset)
-        means["Number of entities"].append(float(investor_count))
-        stds["Number of entities"].append(0.0)
-        counts["Number of entities"].append(investor_count)
-
-        for row_label, column in INVESTOR_METRIC_MAP.items():
-            series = subset[column]
-            valid = series.dropna()
-            if valid.empty:
-                means[row_label].append(0.0)
-                stds[row_label].append(0.0)
-                counts[row_label].append(0)
-            else:
-                means[row_label].append(float(valid.mean()))
-                stds[row_label].append(
-                    float(valid.std(ddof=0)) if len(valid) > 1 else 0.0
-                )
-                counts[row_label].append(len(valid))
-
-    means_df = pd.DataFrame.from_dict(means, orient="index", columns=class_labels)
-    stds_df = pd.DataFrame.from_dict(stds, orient="index", columns=class_labels)
-    counts_df = pd.DataFrame.from_dict(counts, orient="index", columns=class_labels)
-    return means_df, stds_df, counts_df
-
-
 def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
     # Consolidates all cleaning/enrichment steps needed before aggregation
     """Load, merge, and enrich the rounds dataset."""
     investors = mylib.openDB("investors")
-    rounds_raw = mylib.openDB("rounds")
+    rounds_raw = mylib.openDB("rounds", compact=True)
 
     # Use the shared helper to retain only VCs with >=4 deals and at least one
     # European space deal (across the 2015-2025 window), returning the filtered
@@ -274,7 +94,7 @@ def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
         raise ValueError("No venture capital investors satisfied the specialization filters.")
 
     # Enrich rounds with space/up/down flags before applying time and geography filters
-    rounds = mylib.space(rounds_raw.copy(), "company_id", False)
+    rounds = mylib.space(rounds_raw, "company_id", False, flags=mylib.COMPANY_FLAGS)
 
     # Normalize the space/upstream/downstream flags to numeric values for aggregation
     if "space" in rounds.columns:
@@ -321,35 +141,18 @@ def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
     country_cols = specialized_investors[["investor_id", "investor_country"]].drop_duplicates()
     rounds = rounds.merge(country_cols, on="investor_id", how="left")
 
-    rounds["investor_country"] = rounds["investor_country"].fillna("").astype(str)
     if "company_country" not in rounds.columns:
         rounds["company_country"] = ""
-    rounds["company_country"] = rounds["company_country"].fillna("").astype(str)
     # Domestic flag later feeds the average % domestic investment metric
-    rounds["domestic_flag"] = (
-        rounds["investor_country"].str.strip().str.casefold()
-        == rounds["company_country"].str.strip().str.casefold()
+    rounds["domestic_flag"] = mylib.sameLabel(
+        rounds["investor_country"], rounds["company_country"]
     ).astype(int)
 
-    # Build five even bins between 0% and 100% specialized
-    edges = [0, 0.2, 0.4, 0.6, 0.8, 1.0000001]
-    labels = ["0-20%", "20%-40%", "40%-60%", "60%-80%", "80%-100%"]
-    # Translate the continuous specialization score into five evenly spaced classes
-    rounds["class"] = pd.cut(
-        rounds["space_percentage"],
-        bins=edges,
-        labels=labels,
-        include_lowest=True,
-        right=True,
-    )
+    # Translate the continuous specialization score into classes (five 20% bins by default)
+    rounds["class"], labels = assign_classes(rounds["space_percentage"], CLASS_EDGES)
 
-    normalizer = load_round_normalizer(Path(__file__))
-    if normalizer:
-        rounds["std_round"] = rounds["round_label"].apply(
-            lambda val: normalizer.get(str(val).strip().lower()) if pd.notna(val) else None
-        )
-    else:
-        rounds["std_round"] = pd.NA
+    # std_round stored at ingestion (or normalized from round_label via RoundNormaliz.JSON)
+    rounds["std_round"] = mylib.stdRound(rounds)
 
     investor_metrics = build_investor_metrics(rounds, labels)
 
@@ -357,91 +160,67 @@ def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
     return rounds, investor_metrics, labels
 
 
-def flag_significance(
-    means: pd.DataFrame,
-    stds: pd.DataFrame,
-    counts: pd.DataFrame,
-    alpha: float = 0.05,
-) -> pd.DataFrame:
-    # Performs a quick z-test (sigma known approximation) using the collected std/count info
-    """Return boolean mask where mean differs from zero at given alpha (two-tailed)."""
-    # 5% threshold is the only scenario we calibrated; bail out otherwise
-    if alpha != 0.05:
-        raise ValueError("Currently only alpha=0.05 is supported")
-    z_threshold = 1.96  # two-tailed 5%
-
-    # Preallocate a boolean table mirroring the means layout
-    significance = pd.DataFrame(False, index=means.index, columns=means.columns)
-    for row in means.index:
-        if row == "Number of entities":
-            continue
-        for col in means.columns:
-            mean_val = float(means.loc[row, col])
-            std_val = float(stds.loc[row, col])
-            count_val = counts.loc[row, col]
-
-            if pd.isna(count_val) or count_val <= 1:
-                continue
-
-            if std_val == 0.0:
-                if mean_val != 0.0:
-                    significance.loc[row, col] = True
-                continue
-
-            standard_error = std_val / (count_val ** 0.5)
-            if standard_error == 0.0:
-                if mean_val != 0.0:
-                    significance.loc[row, col] = True
-                continue
-
-            # Compare absolute mean against 1.96 * standard error (two-tailed 5%)
-            significance.loc[row, col] = abs(mean_val) >= z_threshold * standard_error
-
-    return significance
-
-
 def main() -> None:
     rounds, investor_metrics, labels = prepare_data()
-    means, stds, counts = compute_metrics_by_class(investor_metrics, labels)
-
-    # Align row order and fill gaps so every KPI appears in the final tables
-    means = means.reindex(index=ROW_LABELS).fillna(0.0)
-    stds = stds.reindex(index=ROW_LABELS).fillna(0.0)
-    counts = counts.reindex(index=ROW_LABELS).fillna(0).astype(int)
+    means, stds, counts = compute_metrics_by_class(
+        investor_metrics, labels, weights=CAPITAL_COLUMN if WEIGHT_BY_CAPITAL else None
+    )
 
     significance = flag_significance(means, stds, counts, alpha=0.05)
 
-    # Prepare nicely formatted copies for printing/export
-    means_out = means.round(2)
-    stds_out = stds.round(2)
-    # Keep both raw boolean mask (for Excel) and human-readable view (for console)
-    significance_out = significance.copy()
+    # Cluster-bootstrap CIs and permutation p-values (vs the least specialized class)
+    metric_columns = list(INVESTOR_METRIC_MAP.values())
+    row_names = {column: row for row, column in INVESTOR_METRIC_MAP.items()}
+    ci_low, ci_high = bootstrap_class_means(
+        investor_metrics[metric_columns],
+        investor_metrics["class"],
+        labels,
+        n_resamples=RESAMPLES,
+        seed=RESAMPLE_SEED,
+    )
+    permutation_p = permutation_class_test(
+        investor_metrics[metric_columns],
+        investor_metrics["class"],
+        labels,
+        n_resamples=RESAMPLES,
+        seed=RESAMPLE_SEED,
+    )
+    ci_low, ci_high, permutation_p = (
+        table.rename(index=row_names).reindex(ROW_LABELS)
+        for table in (ci_low, ci_high, permutation_p)
+    )
+
     # Friendly view for console output (blank for non-significant cells)
     significance_display = significance.replace({True: "Yes", False: ""})
 
-    means_display = means_out.astype(str)
-    for row in means_display.index:
-        for col in means_display.columns:
-            means_display.loc[row, col] = f"{means_out.loc[row, col]:.2f}"
-
     # Store everything next to the script so downstream notebooks can pick it up easily
     output_path = Path(__file__).with_name("comparison_with_not_focused_tables.xlsx")
-    # Send each table to its dedicated Excel sheet for downstream analysis
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-        means_out.to_excel(writer, sheet_name="Means")
-        stds_out.to_excel(writer, sheet_name="StdDev")
-    counts.to_excel(writer, sheet_name="SampleSize")
-    significance_out.to_excel(writer, sheet_name="Significance (5%)")
+    # Canonical tables go to parquet first, then each to its dedicated Excel sheet
+    write_report(
+        output_path,
+        {
+            "Means": means,
+            "StdDev": stds,
+            "SampleSize": counts,
+            "Significance (5%)": significance,
+            "Bootstrap CI low": ci_low,
+            "Bootstrap CI high": ci_high,
+            "Permutation p-value": permutation_p,
+        },
+        formats=COMPARISON_FORMATS,
+    )
 
     # Mirror the Excel output in the terminal for quick inspection during runs
     print("Average metrics by specialization class (* = significant at 5%):")
-    print(means_display)
+    print(means.to_string(float_format="{:.2f}".format))
     print("\nStandard deviation by specialization class:")
-    print(stds_out.round(2))
+    print(stds.round(2))
     print("\nSample size used for each metric (per class):")
     print(counts)
     print("\nSignificance (5% level):")
     print(significance_display)
+    print(f"\nPermutation p-values vs {labels[0]} ({RESAMPLES} resamples):")
+    print(permutation_p.round(4))
     print(f"\nExcel output saved to: {output_path}")
 
 
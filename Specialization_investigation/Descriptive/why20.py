@@ -1,19 +1,17 @@
-import pandas as pd
 import Library as mylib
 import Tesi_SpaceEconomy.Specialization_investigation.flagSpaceSpec as flag
 
 
 inv=mylib.openDB("investors")
-rounds=mylib.openDB("rounds")
-firm=pd.read_parquet("DB_Out/DB_firms.parquet")
 print(len(inv))
 
 #filtro gli investitori che hanno un deal in aziende space europee
-rounds=mylib.space(rounds, "company_id", False)
-firmEu=firm[firm["company_continent"]=="Europe"]["company_id"] 
-roundsLen=rounds[(rounds["Space"]==1) & (rounds["company_id"].isin(firmEu))]["investor_id"].drop_duplicates()
-ids=set(roundsLen)
-inv=inv[inv["investor_id"].isin(roundsLen)]
+eligibility=mylib.investorEligibility()
+inv=inv[inv["investor_id"].isin(eligibility.loc[eligibility["flag_european_space"]==1, "investor_id"])]
+
+#quanti investitori risultano specializzati al variare di finestra e soglia (una sola lettura dei round)
+_, sweep_counts=flag.specializationSweep(inv, lookbacks=[5, 10], start_years=range(2010, 2016), thresholds=[0.1, 0.15, 0.2, 0.25, 0.3])
+print(sweep_counts.pivot_table(index=["start_year", "lookback"], columns="threshold", values="specialized_investors"))
 
 #troviamo la distribuzione degli investitori definiti sinora (la funzione filtra per venture capital e almeno 4 deals)
 inv=flag.spacePercentage(inv, 2015, 0)
@@ -3,11 +3,11 @@
 #  - investor metrics only consider rounds executed between 2022 and 2025
 #  - keeps the venture-capital / >=4 deals / European space exposure filters used elsewhere
 #  - exports mean/std/count/significance tables for reuse in downstream notebooks
-import json
 from pathlib import Path
 import sys
 import types
 
+import numpy as np
 import pandas as pd
 
 # Ensure the repository root (hosting Library.py and DB_Out) is importable when
@@ -69,61 +69,29 @@ except ModuleNotFoundError:  # pragma: no cover
     pycountry = types.SimpleNamespace(countries=_CountryLookup())
     sys.modules["pycountry"] = pycountry
 
-try:  # pragma: no cover
-    import statsmodels.api as sm  # type: ignore
-except ModuleNotFoundError as exc:  # pragma: no cover
-    raise ModuleNotFoundError(
-        "statsmodels is required for the OLS correlation sheet. Install it via 'pip install statsmodels'."
-    ) from exc
-
 import Library as mylib
 from Tesi_SpaceEconomy.Specialization_investigation.flagSpaceSpec import (
     spacePercentage,
 )
-
-# Canonical round buckets used to standardize round labels before aggregation
-ROUND_TYPES = ["Seed", "Early Stage", "Early Growth", "Later Stage"]
-# Explicit row ordering for the exported tables
-ROW_LABELS = [
-    "Number of entities",
-    "Average round size (space firms, USD mn)",
-    "Average round size (non-space firms, USD mn)",
-    "Average number of rounds (space firms)",
-    "Average number of rounds (non-space firms)",
-    "Average time between investments (months)",
-    "Segments - % upstream",
-    "Segments - % downstream",
-    "Segments - % others",
-    "Round distribution (space firms) - % seed",
-    "Round distribution (space firms) - % early stage",
-    "Round distribution (space firms) - % early growth",
-    "Round distribution (space firms) - % later stage",
-    "Round distribution (non-space firms) - % seed",
-    "Round distribution (non-space firms) - % early stage",
-    "Round distribution (non-space firms) - % early growth",
-    "Round distribution (non-space firms) - % later stage",
-    "Domestic investments (%)",
-]
-# Mapping between row labels and investor-level metric columns
-INVESTOR_METRIC_MAP = {
-    "Average round size (space firms, USD mn)": "avg_size_space_musd",
-    "Average round size (non-space firms, USD mn)": "avg_size_other_musd",
-    "Average number of rounds (space firms)": "rounds_space_count",
-    "Average number of rounds (non-space firms)": "rounds_other_count",
-    "Average time between investments (months)": "avg_time_between_months",
-    "Segments - % upstream": "upstream_pct",
-    "Segments - % downstream": "downstream_pct",
-    "Segments - % others": "other_segments_pct",
-    "Round distribution (space firms) - % seed": "round_seed_pct_space",
-    "Round distribution (space firms) - % early stage": "round_early_stage_pct_space",
-    "Round distribution (space firms) - % early growth": "round_early_growth_pct_space",
-    "Round distribution (space firms) - % later stage": "round_later_stage_pct_space",
-    "Round distribution (non-space firms) - % seed": "round_seed_pct_other",
-    "Round distribution (non-space firms) - % early stage": "round_early_stage_pct_other",
-    "Round distribution (non-space firms) - % early growth": "round_early_growth_pct_other",
-    "Round distribution (non-space firms) - % later stage": "round_later_stage_pct_other",
-    "Domestic investments (%)": "domestic_pct",
-}
+from Tesi_SpaceEconomy.Specialization_investigation.batchOLS import fit_batch_ols
+from Tesi_SpaceEconomy.Specialization_investigation.investorKPI import (
+    CAPITAL_COLUMN,
+    CLASS_EDGES,
+    INVESTOR_METRIC_MAP,
+    ROW_LABELS,
+    assign_classes,
+    build_investor_metrics,
+    compute_metrics_by_class,
+)
+from Tesi_SpaceEconomy.Specialization_investigation.reportWriter import (
+    COMPARISON_FORMATS,
+    write_report,
+)
+from Tesi_SpaceEconomy.Specialization_investigation.significance import (
+    bootstrap_class_means,
+    flag_significance,
+    permutation_class_test,
+)
 
 PERCENT_COLUMNS = {
     "upstream_pct",
@@ -148,39 +116,9 @@ ANALYSIS_END_YEAR = 2024
 SPECIALIZATION_REFERENCE_YEAR = 2021  # 2016-2020 lookback in FactInvestorYearSpecialization
 WINDOW_SPECIALIZATION_COL = "window1518_space_percentage"
 MIN_WINDOW_DEALS = 0  # minimum rounds required within the analysis window
-
-
-def load_round_normalizer(script_path: Path) -> dict[str, str]:
-    # Normalizes raw round labels so we can aggregate clean round distributions
-    """Load the round type normalization dictionary if available."""
-    search_dirs = [script_path.parent]
-    upper = script_path.parent.parent
-    if upper not in search_dirs:
-        search_dirs.append(upper)
-
-    json_path: Path | None = None
-    for directory in search_dirs:
-        candidate = directory / "Round" / "RoundNormaliz.JSON"
-        if candidate.exists():
-            json_path = candidate
-            break
-
-    if json_path is None:
-        return {}
-
-    with open(json_path, "r", encoding="utf-8") as handle:
-        raw = json.load(handle)
-
-    mapping: dict[str, str] = {}
-    for category, aliases in raw.items():
-        if not aliases:
-            continue
-        for alias in aliases:
-            # Keep lowercase/stripped keys to avoid downstream case mismatches
-            key = str(alias).strip().lower()
-            if key:
-                mapping[key] = category
-    return mapping
+RESAMPLES = 10_000  # bootstrap / permutation resamples per class
+RESAMPLE_SEED = 42  # fixed seed so the exported intervals are reproducible
+WEIGHT_BY_CAPITAL = False  # weight class means/stds by each investor's capital deployed
 
 
 def find_project_root(script_path: Path) -> Path:
@@ -234,26 +172,30 @@ def apply_window_specialization(
     return merged
 
 
-def trim_outliers(
-    df: pd.DataFrame,
-    column: str,
+def trim_outlier_mask(
+    values: pd.DataFrame,
+    keep: pd.DataFrame,
+    min_keep: int = 1,
     zscore: float = OUTLIER_ZSCORE,
 ) -> pd.DataFrame:
-    """Return df filtered to values within mean ± zscore*std for the specified column."""
-    if df.empty:
-        return df
-    series = df[column].dropna()
-    if len(series) < 3:
-        return df
-    std = float(series.std(ddof=0))
-    if std == 0 or pd.isna(std):
-        return df
-    mean = float(series.mean())
-    lower = mean - (zscore * std)
-    upper = mean + (zscore * std)
-    trimmed = df[(df[column] >= lower) & (df[column] <= upper)]
-    # Avoid over-trimming: keep original subset if filtering removes everything
-    return trimmed if not trimmed.empty else df
+    """Column-wise trim of the kept values to mean ± zscore*std (population std).
+
+    A column keeps its current mask when it has fewer than 3 kept values, a zero
+    std, or when fewer than `min_keep` values (at least one) survive the trim.
+    """
+    data = values.to_numpy(dtype=float)
+    mask = keep.to_numpy(dtype=bool)
+    count = mask.sum(axis=0)
+    filled = np.where(mask, data, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean = filled.sum(axis=0) / count
+        std = np.sqrt((np.where(mask, data - mean, 0.0) ** 2).sum(axis=0) / count)
+    inside = (data >= mean - zscore * std) & (data <= mean + zscore * std)
+    trimmed = mask & inside
+    apply = (count >= 3) & (std > 0) & (trimmed.sum(axis=0) >= max(min_keep, 1))
+    return pd.DataFrame(
+        np.where(apply, trimmed, mask), index=values.index, columns=values.columns
+    )
 
 
 def mean_std(series: pd.Series, multiplier: float = 1.0) -> tuple[float, float, int]:
@@ -301,301 +243,89 @@ def average_rounds_per_investor(rounds: pd.DataFrame) -> tuple[float, float, int
     return avg, std, int(len(counts))
 
 
-def build_investor_metrics(rounds: pd.DataFrame, class_labels: list[str]) -> pd.DataFrame:
-    """Compute per-investor KPIs prior to class-level aggregation."""
-    investor_classes = (
-        rounds[["investor_id", "class"]]
-        .drop_duplicates()
-        .dropna(subset=["investor_id"])
-        .set_index("investor_id")
-    )
-    metrics = investor_classes.copy()
-    spec_share = (
-        rounds.groupby("investor_id")["space_percentage"].mean().rename("space_percentage")
-    )
-    metrics = metrics.join(spec_share, how="left")
-
-    space_rounds = rounds[rounds["space"] == 1]
-    other_rounds = rounds[rounds["space"] != 1]
-
-    metrics["avg_size_space_musd"] = (
-        space_rounds.groupby("investor_id")["round_amount_usd"].mean() / 1_000_000
-    )
-    metrics["avg_size_other_musd"] = (
-        other_rounds.groupby("investor_id")["round_amount_usd"].mean() / 1_000_000
-    )
-
-    metrics["rounds_space_count"] = space_rounds.groupby("investor_id").size()
-    metrics["rounds_other_count"] = other_rounds.groupby("investor_id").size()
-
-    rounds_sorted = rounds.sort_values(["investor_id", "round_date"])
-    diffs = rounds_sorted.groupby("investor_id")["round_date"].diff()
-    months = diffs.dt.total_seconds() / (60 * 60 * 24 * 30.4375)
-    avg_time = (
-        months.groupby(rounds_sorted["investor_id"]).mean().rename("avg_time_between_months")
-    )
-    metrics = metrics.join(avg_time, how="left")
-
-    if not space_rounds.empty:
-        seg = space_rounds.copy()
-        seg["upstream"] = seg["upstream"].fillna(0)
-        seg["downstream"] = seg["downstream"].fillna(0)
-        upstream_pct = (
-            seg.groupby("investor_id")["upstream"].mean() * 100.0
-        ).rename("upstream_pct")
-        downstream_pct = (
-            seg.groupby("investor_id")["downstream"].mean() * 100.0
-        ).rename("downstream_pct")
-        other_pct = (
-            ((seg["upstream"] == 0) & (seg["downstream"] == 0))
-            .astype(int)
-            .groupby(seg["investor_id"])
-            .mean()
-            * 100.0
-        ).rename("other_segments_pct")
-        metrics = metrics.join(upstream_pct, how="left")
-        metrics = metrics.join(downstream_pct, how="left")
-        metrics = metrics.join(other_pct, how="left")
-
-    space_stage_map = {
-        "Seed": "round_seed_pct_space",
-        "Early Stage": "round_early_stage_pct_space",
-        "Early Growth": "round_early_growth_pct_space",
-        "Later Stage": "round_later_stage_pct_space",
+def _kpi_targets(investor_metrics: pd.DataFrame, spec_col: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """KPI columns (percentages rescaled to shares) and their rows usable in a regression."""
+    columns = list(INVESTOR_METRIC_MAP.values())
+    targets = investor_metrics[columns].astype(float)
+    keep = targets.notna() & investor_metrics[[spec_col]].notna().to_numpy()
+    percent = [column for column in columns if column in PERCENT_COLUMNS]
+    targets[percent] = targets[percent] / 100.0
+    return targets, keep
+
+
+def _coefficient_stats(fit: dict, regressor: str, fitted: pd.Series) -> dict[str, pd.Series]:
+    """Estimate, std error and 5%/1% significance of one regressor, 0/False when not fitted."""
+    p_value = fit["pvalues"][regressor]
+    return {
+        "estimate": fit["params"][regressor].where(fitted, 0.0),
+        "std": fit["bse"][regressor].where(fitted, 0.0),
+        "sig5": (p_value < 0.05) & fitted,
+        "sig1": (p_value < 0.01) & fitted,
     }
-    other_stage_map = {
-        "Seed": "round_seed_pct_other",
-        "Early Stage": "round_early_stage_pct_other",
-        "Early Growth": "round_early_growth_pct_other",
-        "Later Stage": "round_later_stage_pct_other",
-    }
-
-    for subset, stage_map in [
-        (space_rounds, space_stage_map),
-        (other_rounds, other_stage_map),
-    ]:
-        valid = subset[subset["std_round"].isin(ROUND_TYPES)].copy()
-        if valid.empty:
-            continue
-        amount_table = (
-            valid.groupby(["investor_id", "std_round"])["round_amount_usd"].sum()
-        ).unstack(fill_value=0)
-        totals = amount_table.sum(axis=1).replace(0, pd.NA)
-        share_table = amount_table.divide(totals, axis=0) * 100.0
-        share_table = share_table.rename(columns=stage_map)
-        for col in stage_map.values():
-            if col not in share_table.columns:
-                share_table[col] = pd.NA
-        metrics = metrics.join(share_table[list(stage_map.values())], how="left")
-
-    domestic_pct = (
-        rounds.groupby("investor_id")["domestic_flag"].mean() * 100.0
-    ).rename("domestic_pct")
-    metrics = metrics.join(domestic_pct, how="left")
-
-    for col in INVESTOR_METRIC_MAP.values():
-        if col not in metrics.columns:
-            metrics[col] = pd.NA
-
-    metrics = metrics.reset_index().rename(columns={"class": "class"})
-    metrics["class"] = pd.Categorical(
-        metrics["class"], categories=class_labels, ordered=True
-    )
-    return metrics
-
-
-def compute_metrics_by_class(
-    investor_metrics: pd.DataFrame,
-    class_labels: list[str],
-) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
-    """Aggregate investor-level metrics by specialization class."""
-    means: dict[str, list[float]] = {row: [] for row in ROW_LABELS}
-    stds: dict[str, list[float]] = {row: [] for row in ROW_LABELS}
-    counts: dict[str, list[int]] = {row: [] for row in ROW_LABELS}
-
-    for label in class_labels:
-        subset = investor_metrics[investor_metrics["class"] == label]
-        investor_count = len(subset)
-        means["Number of entities"].append(float(investor_count))
-        stds["Number of entities"].append(0.0)
-        counts["Number of entities"].append(investor_count)
-
-        for row_label, column in INVESTOR_METRIC_MAP.items():
-            series = subset[column]
-            valid = series.dropna()
-            if valid.empty:
-                means[row_label].append(0.0)
-                stds[row_label].append(0.0)
-                counts[row_label].append(0)
-            else:
-                means[row_label].append(float(valid.mean()))
-                stds[row_label].append(
-                    float(valid.std(ddof=0)) if len(valid) > 1 else 0.0
-                )
-                counts[row_label].append(len(valid))
-
-    means_df = pd.DataFrame.from_dict(means, orient="index", columns=class_labels)
-    stds_df = pd.DataFrame.from_dict(stds, orient="index", columns=class_labels)
-    counts_df = pd.DataFrame.from_dict(counts, orient="index", columns=class_labels)
-    return means_df, stds_df, counts_df
 
 
 def compute_ols_correlations(investor_metrics: pd.DataFrame) -> pd.DataFrame:
     """Estimate OLS slope vs specialization for each KPI and collect dispersion/significance."""
-    metric_keys = [
-        "Intercept (b0)",
-        "Intercept significant (5%)",
-        "Intercept significant (1%)",
-        "Correlation (slope)",
-        "Std dev (slope)",
-        "Adjusted R-squared",
-        "Significant (5%)",
-        "Significant (1%)",
-    ]
-    column_stats: dict[str, dict[str, float | bool]] = {}
     spec_col = "space_percentage"
-
-    for label, column in INVESTOR_METRIC_MAP.items():
-        subset = investor_metrics[[spec_col, column]].dropna()
-        subset = subset[
-            subset[spec_col].notna() & subset[column].notna()
-        ]
-        trimmed_subset = trim_outliers(subset, column)
-        if len(trimmed_subset) >= 4:
-            subset = trimmed_subset
-        trimmed_subset = trim_outliers(subset, column)
-        if len(trimmed_subset) >= 3:
-            subset = trimmed_subset
-        intercept = 0.0
-        slope = 0.0
-        std_dev = 0.0
-        sig_5 = False
-        sig_1 = False
-        intercept_sig5 = False
-        intercept_sig1 = False
-        r_squared = 0.0
-
-        if len(subset) >= 3 and subset[spec_col].nunique() > 1:
-            y = subset[column].astype(float)
-            if column in PERCENT_COLUMNS:
-                y = y / 100.0
-            X = sm.add_constant(subset[spec_col].astype(float), has_constant="add")
-            model = sm.OLS(y, X).fit()
-            intercept = float(model.params.get("const", 0.0))
-            slope = float(model.params[spec_col])
-            std_dev = float(model.bse[spec_col])
-            p_value = float(model.pvalues[spec_col])
-            sig_5 = p_value < 0.05
-            sig_1 = p_value < 0.01
-            if "const" in model.pvalues:
-                const_p = float(model.pvalues["const"])
-                intercept_sig5 = const_p < 0.05
-                intercept_sig1 = const_p < 0.01
-            r_squared = float(model.rsquared_adj)
-
-        column_stats[label] = {
-            "Intercept (b0)": intercept,
-            "Intercept significant (5%)": intercept_sig5,
-            "Intercept significant (1%)": intercept_sig1,
-            "Correlation (slope)": slope,
-            "Std dev (slope)": std_dev,
-            "Adjusted R-squared": r_squared,
-            "Significant (5%)": sig_5,
-            "Significant (1%)": sig_1,
+    targets, keep = _kpi_targets(investor_metrics, spec_col)
+    # outliers are trimmed on the raw KPI values, twice (keeping >=4 then >=3 points)
+    raw = investor_metrics[targets.columns]
+    keep = trim_outlier_mask(raw, keep, min_keep=4)
+    keep = trim_outlier_mask(raw, keep, min_keep=3)
+
+    fit = fit_batch_ols(
+        investor_metrics[[spec_col]], targets.where(keep), min_obs=3, min_unique=spec_col
+    )
+    fitted = fit["nobs"] > 0
+    const = _coefficient_stats(fit, "const", fitted)
+    slope = _coefficient_stats(fit, spec_col, fitted)
+
+    correlation_df = pd.DataFrame(
+        {
+            "Intercept (b0)": const["estimate"],
+            "Intercept significant (5%)": const["sig5"],
+            "Intercept significant (1%)": const["sig1"],
+            "Correlation (slope)": slope["estimate"],
+            "Std dev (slope)": slope["std"],
+            "Adjusted R-squared": fit["rsquared_adj"].where(fitted, 0.0),
+            "Significant (5%)": slope["sig5"],
+            "Significant (1%)": slope["sig1"],
         }
-
-    correlation_df = pd.DataFrame(column_stats).T
-    correlation_df = correlation_df[metric_keys]
+    )
+    correlation_df.index = list(INVESTOR_METRIC_MAP)
     return correlation_df
 
 
 def compute_quadratic_regressions(investor_metrics: pd.DataFrame) -> pd.DataFrame:
     """Run OLS with linear and squared specialization terms for each KPI."""
     spec_col = "space_percentage"
-    metric_keys = [
-        "Intercept (b0)",
-        "Intercept significant (5%)",
-        "Intercept significant (1%)",
-        "Slope (linear)",
-        "Std dev (linear)",
-        "Significant 5% (linear)",
-        "Significant 1% (linear)",
-        "Slope (squared)",
-        "Std dev (squared)",
-        "Significant 5% (squared)",
-        "Significant 1% (squared)",
-        "Adjusted R-squared",
-    ]
-    column_stats: dict[str, dict[str, float | bool]] = {}
-
-    for label, column in INVESTOR_METRIC_MAP.items():
-        subset = investor_metrics[[spec_col, column]].dropna()
-        subset = subset[
-            subset[spec_col].notna() & subset[column].notna()
-        ]
-        lin_slope = 0.0
-        lin_std = 0.0
-        lin_sig5 = False
-        lin_sig1 = False
-        intercept = 0.0
-        quad_slope = 0.0
-        quad_std = 0.0
-        quad_sig5 = False
-        quad_sig1 = False
-        intercept_sig5 = False
-        intercept_sig1 = False
-        r_squared = 0.0
-
-        if len(subset) >= 4 and subset[spec_col].nunique() > 1:
-            spec = subset[spec_col].astype(float)
-            y = subset[column].astype(float)
-            if column in PERCENT_COLUMNS:
-                y = y / 100.0
-            X = pd.DataFrame(
-                {
-                    "space": spec,
-                    "space_sq": spec**2,
-                }
-            )
-            X = sm.add_constant(X, has_constant="add")
-            model = sm.OLS(y, X).fit()
-            intercept = float(model.params.get("const", 0.0))
-            r_squared = float(model.rsquared_adj)
-            if "const" in model.pvalues:
-                const_p = float(model.pvalues["const"])
-                intercept_sig5 = const_p < 0.05
-                intercept_sig1 = const_p < 0.01
-
-            if "space" in model.params:
-                lin_slope = float(model.params["space"])
-                lin_std = float(model.bse["space"])
-                p_val = float(model.pvalues["space"])
-                lin_sig5 = p_val < 0.05
-                lin_sig1 = p_val < 0.01
-            if "space_sq" in model.params:
-                quad_slope = float(model.params["space_sq"])
-                quad_std = float(model.bse["space_sq"])
-                p_val = float(model.pvalues["space_sq"])
-                quad_sig5 = p_val < 0.05
-                quad_sig1 = p_val < 0.01
-
-        column_stats[label] = {
-            "Slope (linear)": lin_slope,
-            "Std dev (linear)": lin_std,
-            "Significant 5% (linear)": lin_sig5,
-            "Significant 1% (linear)": lin_sig1,
-            "Slope (squared)": quad_slope,
-            "Std dev (squared)": quad_std,
-            "Significant 5% (squared)": quad_sig5,
-            "Significant 1% (squared)": quad_sig1,
-            "Adjusted R-squared": r_squared,
-            "Intercept (b0)": intercept,
-            "Intercept significant (5%)": intercept_sig5,
-            "Intercept significant (1%)": intercept_sig1,
+    targets, keep = _kpi_targets(investor_metrics, spec_col)
+    spec = investor_metrics[spec_col].astype(float)
+    X = pd.DataFrame({"space": spec, "space_sq": spec**2})
+
+    fit = fit_batch_ols(X, targets.where(keep), min_obs=4, min_unique="space")
+    fitted = fit["nobs"] > 0
+    const = _coefficient_stats(fit, "const", fitted)
+    linear = _coefficient_stats(fit, "space", fitted)
+    squared = _coefficient_stats(fit, "space_sq", fitted)
+
+    quad_df = pd.DataFrame(
+        {
+            "Intercept (b0)": const["estimate"],
+            "Intercept significant (5%)": const["sig5"],
+            "Intercept significant (1%)": const["sig1"],
+            "Slope (linear)": linear["estimate"],
+            "Std dev (linear)": linear["std"],
+            "Significant 5% (linear)": linear["sig5"],
+            "Significant 1% (linear)": linear["sig1"],
+            "Slope (squared)": squared["estimate"],
+            "Std dev (squared)": squared["std"],
+            "Significant 5% (squared)": squared["sig5"],
+            "Significant 1% (squared)": squared["sig1"],
+            "Adjusted R-squared": fit["rsquared_adj"].where(fitted, 0.0),
         }
-
-    quad_df = pd.DataFrame(column_stats).T
-    quad_df = quad_df[metric_keys]
+    )
+    quad_df.index = list(INVESTOR_METRIC_MAP)
     return quad_df
 
 
@@ -606,7 +336,9 @@ def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
     project_root = find_project_root(script_path)
 
     investors = mylib.openDB("investors")
-    rounds_raw = mylib.openDB("rounds")
+    rounds_raw = mylib.openDB(
+        "rounds", filters={"years": (ANALYSIS_START_YEAR, ANALYSIS_END_YEAR)}, compact=True
+    )
 
     # Use the shared helper to retain only VCs with >=4 deals and at least one
     # European space deal (baseline filters), then overwrite specialization shares
@@ -619,7 +351,7 @@ def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
         raise ValueError("No venture capital investors satisfied the specialization filters.")
 
     # Enrich rounds with space/up/down flags before applying time and geography filters
-    rounds = mylib.space(rounds_raw.copy(), "company_id", False)
+    rounds = mylib.space(rounds_raw, "company_id", False, flags=mylib.COMPANY_FLAGS)
 
     # Normalize the space/upstream/downstream flags to numeric values for aggregation
     if "space" in rounds.columns:
@@ -643,36 +375,16 @@ def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
     )
     original_vc_ids = set(original_vc_df["investor_id"].dropna().unique())
 
-    rounds_all = mylib.openDB("rounds")
-    rounds_all_space = mylib.space(rounds_all.copy(), "company_id", False)
-    deals_per_investor = (
-        rounds_all.dropna(subset=["investor_id"]).groupby("investor_id").size()
-    )
-    four_plus_ids = set(deals_per_investor[deals_per_investor >= 4].index)
-
-    firms_path = project_root / "DB_Out" / "DB_firms.parquet"
-    firms = pd.read_parquet(firms_path)
-    if "company_continent" in firms.columns:
-        continent_series = firms["company_continent"].astype(str).str.strip().str.casefold()
-    else:
-        continent_series = pd.Series("", index=firms.index)
-    europe_company_ids = set(
-        firms.loc[continent_series == "europe", "company_id"].dropna().unique()
-    )
-    europe_space_ids = set(
-        rounds_all_space.loc[
-            (rounds_all_space["space"] == 1)
-            & (rounds_all_space["company_id"].isin(europe_company_ids)),
-            "investor_id",
-        ]
-        .dropna()
-        .unique()
+    # >=4 deals overall and at least one European space deal (DimInvestorEligibility)
+    eligible_ids = set(
+        mylib.investorEligibility(
+            eligible_only=True, require=("flag_min_deals", "flag_european_space_casefold")
+        )["investor_id"]
     )
 
     valid_ids = (
         original_vc_ids
-        & four_plus_ids
-        & europe_space_ids
+        & eligible_ids
         & set(specialized_investors["investor_id"].dropna().unique())
     )
     specialized_investors = specialized_investors[
@@ -722,132 +434,92 @@ def prepare_data() -> tuple[pd.DataFrame, pd.DataFrame, list[str]]:
     country_cols = specialized_investors[["investor_id", "investor_country"]].drop_duplicates()
     rounds = rounds.merge(country_cols, on="investor_id", how="left")
 
-    rounds["investor_country"] = rounds["investor_country"].fillna("").astype(str)
     if "company_country" not in rounds.columns:
         rounds["company_country"] = ""
-    rounds["company_country"] = rounds["company_country"].fillna("").astype(str)
     # Domestic flag later feeds the average % domestic investment metric
-    rounds["domestic_flag"] = (
-        rounds["investor_country"].str.strip().str.casefold()
-        == rounds["company_country"].str.strip().str.casefold()
+    rounds["domestic_flag"] = mylib.sameLabel(
+        rounds["investor_country"], rounds["company_country"]
     ).astype(int)
 
-    # Build five even bins between 0% and 100% specialized
-    edges = [0, 0.2, 0.4, 0.6, 0.8, 1.0000001]
-    labels = ["0-20%", "20%-40%", "40%-60%", "60%-80%", "80%-100%"]
-    rounds["class"] = pd.cut(
-        rounds["space_percentage"],
-        bins=edges,
-        labels=labels,
-        include_lowest=True,
-        right=True,
-    )
+    # Translate the continuous specialization score into classes (five 20% bins by default)
+    rounds["class"], labels = assign_classes(rounds["space_percentage"], CLASS_EDGES)
 
-    normalizer = load_round_normalizer(script_path)
-    if normalizer:
-        rounds["std_round"] = rounds["round_label"].apply(
-            lambda val: normalizer.get(str(val).strip().lower()) if pd.notna(val) else None
-        )
-    else:
-        rounds["std_round"] = pd.NA
+    # std_round stored at ingestion (or normalized from round_label via RoundNormaliz.JSON)
+    rounds["std_round"] = mylib.stdRound(rounds)
 
-    investor_metrics = build_investor_metrics(rounds, labels)
+    investor_metrics = build_investor_metrics(rounds, labels, extra_means=["space_percentage"])
 
     # Hand back the enriched rounds table, investor metrics, and class labels
     return rounds, investor_metrics, labels
 
 
-def flag_significance(
-    means: pd.DataFrame,
-    stds: pd.DataFrame,
-    counts: pd.DataFrame,
-    alpha: float = 0.05,
-) -> pd.DataFrame:
-    # Performs a quick z-test (sigma known approximation) using the collected std/count info
-    """Return boolean mask where mean differs from zero at given alpha (two-tailed)."""
-    # 5% threshold is the only scenario we calibrated; bail out otherwise
-    if alpha != 0.05:
-        raise ValueError("Currently only alpha=0.05 is supported")
-    z_threshold = 1.96  # two-tailed 5%
-
-    # Preallocate a boolean table mirroring the means layout
-    significance = pd.DataFrame(False, index=means.index, columns=means.columns)
-    for row in means.index:
-        if row == "Number of entities":
-            continue
-        for col in means.columns:
-            mean_val = float(means.loc[row, col])
-            std_val = float(stds.loc[row, col])
-            count_val = counts.loc[row, col]
-
-            if pd.isna(count_val) or count_val <= 1:
-                continue
-
-            if std_val == 0.0:
-                if mean_val != 0.0:
-                    significance.loc[row, col] = True
-                continue
-
-            standard_error = std_val / (count_val ** 0.5)
-            if standard_error == 0.0:
-                if mean_val != 0.0:
-                    significance.loc[row, col] = True
-                continue
-
-            # Compare absolute mean against 1.96 * standard error (two-tailed 5%)
-            significance.loc[row, col] = abs(mean_val) >= z_threshold * standard_error
-
-    return significance
-
-
 def main() -> None:
     rounds, investor_metrics, labels = prepare_data()
-    means, stds, counts = compute_metrics_by_class(investor_metrics, labels)
+    means, stds, counts = compute_metrics_by_class(
+        investor_metrics, labels, weights=CAPITAL_COLUMN if WEIGHT_BY_CAPITAL else None
+    )
     correlation_df = compute_ols_correlations(investor_metrics)
     quadratic_df = compute_quadratic_regressions(investor_metrics)
 
-    # Align row order and fill gaps so every KPI appears in the final tables
-    means = means.reindex(index=ROW_LABELS).fillna(0.0)
-    stds = stds.reindex(index=ROW_LABELS).fillna(0.0)
-    counts = counts.reindex(index=ROW_LABELS).fillna(0).astype(int)
-
     significance = flag_significance(means, stds, counts, alpha=0.05)
 
-    # Prepare nicely formatted copies for printing/export
-    means_out = means.round(2)
-    stds_out = stds.round(2)
-    # Keep both raw boolean mask (for Excel) and human-readable view (for console)
-    significance_out = significance.copy()
+    # Cluster-bootstrap CIs and permutation p-values (vs the least specialized class)
+    metric_columns = list(INVESTOR_METRIC_MAP.values())
+    row_names = {column: row for row, column in INVESTOR_METRIC_MAP.items()}
+    ci_low, ci_high = bootstrap_class_means(
+        investor_metrics[metric_columns],
+        investor_metrics["class"],
+        labels,
+        n_resamples=RESAMPLES,
+        seed=RESAMPLE_SEED,
+    )
+    permutation_p = permutation_class_test(
+        investor_metrics[metric_columns],
+        investor_metrics["class"],
+        labels,
+        n_resamples=RESAMPLES,
+        seed=RESAMPLE_SEED,
+    )
+    ci_low, ci_high, permutation_p = (
+        table.rename(index=row_names).reindex(ROW_LABELS)
+        for table in (ci_low, ci_high, permutation_p)
+    )
+
     # Friendly view for console output (blank for non-significant cells)
     significance_display = significance.replace({True: "Yes", False: ""})
 
-    means_display = means_out.astype(str)
-    for row in means_display.index:
-        for col in means_display.columns:
-            means_display.loc[row, col] = f"{means_out.loc[row, col]:.2f}"
-
     # Store everything next to the script so downstream notebooks can pick it up easily
     output_path = Path(__file__).with_name("comparison_with_not_focused_window1518.xlsx")
-    # Send each table to its dedicated Excel sheet for downstream analysis
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-        means_out.to_excel(writer, sheet_name="Means")
-        stds_out.to_excel(writer, sheet_name="StdDev")
-        counts.to_excel(writer, sheet_name="SampleSize")
-        significance_out.to_excel(writer, sheet_name="Significance (5%)")
-        correlation_df.to_excel(writer, sheet_name="OLS_Correlation")
-        quadratic_df.to_excel(writer, sheet_name="OLS_Correlation_Quadratic")
+    # Canonical tables go to parquet first, then each to its dedicated Excel sheet
+    write_report(
+        output_path,
+        {
+            "Means": means,
+            "StdDev": stds,
+            "SampleSize": counts,
+            "Significance (5%)": significance,
+            "Bootstrap CI low": ci_low,
+            "Bootstrap CI high": ci_high,
+            "Permutation p-value": permutation_p,
+            "OLS_Correlation": correlation_df,
+            "OLS_Correlation_Quadratic": quadratic_df,
+        },
+        formats=COMPARISON_FORMATS,
+    )
 
     # Mirror the Excel output in the terminal for quick inspection during runs
     print(
         "Average metrics by specialization class (2022-2025 rounds, 2016-2020 specialization; * = significant at 5%):"
     )
-    print(means_display)
+    print(means.to_string(float_format="{:.2f}".format))
     print("\nStandard deviation by specialization class:")
-    print(stds_out.round(2))
+    print(stds.round(2))
     print("\nSample size used for each metric (per class):")
     print(counts)
     print("\nSignificance (5% level):")
     print(significance_display)
+    print(f"\nPermutation p-values vs {labels[0]} ({RESAMPLES} resamples):")
+    print(permutation_p.round(4))
     print("\nOLS slope vs specialization (rows: slope/std/significance):")
     print(correlation_df.round(4))
     print("\nOLS with squared term (linear + quadratic coefficients):")
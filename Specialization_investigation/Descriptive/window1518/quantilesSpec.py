@@ -14,6 +14,7 @@ import sys
 import pandas as pd
 
 import Library as mylib
+from Tesi_SpaceEconomy.Specialization_investigation.reportWriter import write_report
 
 CURRENT_FILE = Path(__file__).resolve()
 QUANTILES = [0.50, 0.70, 0.90, 0.99]
@@ -51,7 +52,6 @@ def load_specialization(project_root: Path) -> pd.DataFrame:
 def build_investor_universe() -> pd.DataFrame:
     project_root = find_project_root(CURRENT_FILE)
     investors = mylib.openDB("investors")
-    rounds = mylib.openDB("rounds")
 
     specialization = load_specialization(project_root)
     investors = investors.merge(specialization, on="investor_id", how="left")
@@ -65,10 +65,7 @@ def build_investor_universe() -> pd.DataFrame:
     if investors.empty:
         return investors
 
-    lifetime_counts = (
-        rounds.dropna(subset=["investor_id"]).groupby("investor_id").size().rename("deal_count")
-    )
-    eligible_ids = set(lifetime_counts[lifetime_counts >= 4].index)
+    eligible_ids = mylib.investorEligibility(eligible_only=True, require=("flag_min_deals",))["investor_id"]
     investors = investors[investors["investor_id"].isin(eligible_ids)].copy()
     return investors.drop_duplicates(subset=["investor_id"])
 
@@ -137,9 +134,20 @@ def main() -> None:
     )
 
     output_path = Path(__file__).with_name("quantiles_specialization_window1518.xlsx")
-    with pd.ExcelWriter(output_path, engine="openpyxl") as writer:
-        quantiles_df.to_excel(writer, sheet_name="Quantiles", index=False)
-        investor_list.to_excel(writer, sheet_name="Investors_by_SSI", index=False)
+    # The investor list is the large sheet: parquet first, then a streamed workbook
+    write_report(
+        output_path,
+        {"Quantiles": quantiles_df, "Investors_by_SSI": investor_list},
+        formats={
+            "Quantiles": {
+                "Threshold (SSI)": "0.0000",
+                "Space amount (USD mn)": "0.00",
+                "Non-space amount (USD mn)": "0.00",
+            },
+            "Investors_by_SSI": {"space_percentage": "0.0000"},
+        },
+        index=False,
+    )
 
     print("Quantile summary (amounts in USD millions):")
     print(quantiles_df.to_string(index=False, float_format=lambda x: f"{x:.2f}"))
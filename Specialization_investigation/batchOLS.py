@@ -0,0 +1,111 @@
+"""
+Batched least squares for the per-KPI regressions on specialization.
+
+All KPI targets that share a design matrix (same regressors, same valid rows)
+are solved together with one QR factorization; standard errors, two-sided
+t-test p-values and adjusted R-squared follow in closed form. Targets are
+grouped by their NaN mask, so a KPI only gets its own solve when its valid rows
+differ from the others. The statistics are those of statsmodels OLS(y,
+add_constant(X)).fit() (pinv solution and df_resid = n - rank on rank-deficient
+designs).
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+CONSTANT = "const"
+
+
+def _fit_group(X: np.ndarray, Y: np.ndarray) -> dict[str, np.ndarray]:
+    """OLS of every column of Y on X (rows already restricted to the valid ones)."""
+    n, k = X.shape
+    rank = np.linalg.matrix_rank(X)
+    if rank == k:
+        Q, R = np.linalg.qr(X)
+        R_inv = np.linalg.solve(R, np.eye(k))
+        params = R_inv @ (Q.T @ Y)
+        cov_unscaled = R_inv @ R_inv.T
+    else:
+        X_pinv = np.linalg.pinv(X)
+        params = X_pinv @ Y
+        cov_unscaled = X_pinv @ X_pinv.T
+
+    resid = Y - X @ params
+    ssr = np.einsum("ij,ij->j", resid, resid)
+    df_resid = n - rank
+    centered = Y - Y.mean(axis=0)
+    centered_tss = np.einsum("ij,ij->j", centered, centered)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = ssr / df_resid
+        bse = np.sqrt(np.outer(np.diag(cov_unscaled), scale))
+        tvalues = params / bse
+        pvalues = 2 * stats.t.sf(np.abs(tvalues), df_resid)
+        rsquared = 1 - ssr / centered_tss
+        rsquared_adj = 1 - (n - 1) / df_resid * (1 - rsquared)
+    return {
+        "params": params,
+        "bse": bse,
+        "pvalues": pvalues,
+        "rsquared_adj": rsquared_adj,
+        "nobs": np.full(Y.shape[1], n),
+    }
+
+
+def fit_batch_ols(
+    X: pd.DataFrame,
+    Y: pd.DataFrame,
+    min_obs: int = 1,
+    min_unique: Optional[str] = None,
+) -> dict[str, pd.DataFrame | pd.Series]:
+    """Regress every column of `Y` on a constant plus the columns of `X`.
+
+    Rows where a target or any regressor is NaN are dropped for that target only.
+    Targets with fewer than `min_obs` valid rows, or (when `min_unique` names a
+    regressor) with a single distinct value of it, are not fitted and keep NaN
+    statistics. Returns "params", "bse", "pvalues" (targets x [const, *X])
+    and "rsquared_adj", "nobs" (indexed by target).
+    """
+    regressors = [CONSTANT, *X.columns]
+    design = np.column_stack([np.ones(len(X)), X.to_numpy(dtype=float)])
+    targets = Y.to_numpy(dtype=float)
+    valid = ~np.isnan(targets) & ~np.isnan(design).any(axis=1)[:, None]
+
+    fittable = valid.sum(axis=0) >= min_obs
+    if min_unique is not None:
+        spec = X[min_unique].to_numpy(dtype=float)
+        for j in np.flatnonzero(fittable):
+            fittable[j] = np.unique(spec[valid[:, j]]).size > 1
+
+    params = np.full((len(regressors), targets.shape[1]), np.nan)
+    bse = params.copy()
+    pvalues = params.copy()
+    rsquared_adj = np.full(targets.shape[1], np.nan)
+    nobs = np.zeros(targets.shape[1], dtype=int)
+
+    # one solve per distinct row mask; the usual case is a single group
+    groups: dict[bytes, list[int]] = {}
+    packed = np.packbits(valid, axis=0)
+    for j in np.flatnonzero(fittable):
+        groups.setdefault(packed[:, j].tobytes(), []).append(j)
+    for columns in groups.values():
+        mask = valid[:, columns[0]]
+        fit = _fit_group(design[mask], targets[np.ix_(mask, columns)])
+        params[:, columns] = fit["params"]
+        bse[:, columns] = fit["bse"]
+        pvalues[:, columns] = fit["pvalues"]
+        rsquared_adj[columns] = fit["rsquared_adj"]
+        nobs[columns] = fit["nobs"]
+
+    def _frame(values: np.ndarray) -> pd.DataFrame:
+        return pd.DataFrame(values.T, index=Y.columns, columns=regressors)
+
+    return {
+        "params": _frame(params),
+        "bse": _frame(bse),
+        "pvalues": _frame(pvalues),
+        "rsquared_adj": pd.Series(rsquared_adj, index=Y.columns),
+        "nobs": pd.Series(nobs, index=Y.columns),
+    }
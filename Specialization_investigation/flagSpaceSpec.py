@@ -1,10 +1,31 @@
 import pandas as pd
 import Library as mylib
 from pathlib import Path
-from typing import Optional, Literal
+from typing import Iterable, Optional, Literal
 
 investor = mylib.openDB("investors")
 
+# >=4 total rounds and a European space deal (company_continent == "Europe"), from DimInvestorEligibility
+DEAL_FLAGS = ("flag_min_deals", "flag_european_space")
+
+
+def _vc_mask(df_investor: pd.DataFrame) -> pd.Series:
+    """Row mask of the venture capital investors of `df_investor`.
+
+    Uses the rows' own investor_types when the column is there (so a non-VC row of an
+    investor that also has a VC row is not VC); otherwise the investor-level
+    flag_venture_capital of DimInvestorEligibility (any DB_investors row of a VC type).
+    """
+    if "investor_types" in df_investor.columns:
+        types_series = df_investor["investor_types"].astype(str)
+        return types_series.str.contains(mylib.VC_PATTERN, case=False, regex=True, na=False)
+    eligibility = mylib.investorEligibility().set_index("investor_id")
+    return df_investor["investor_id"].map(eligibility["flag_venture_capital"]).fillna(0).astype(bool)
+
+
+def _deal_eligible_ids() -> pd.Series:
+    return mylib.investorEligibility(eligible_only=True, require=DEAL_FLAGS)["investor_id"]
+
 def spaceSpecialization(df_investor: pd.DataFrame, threshold_year: int, threshold_percentage: float) -> pd.DataFrame:
     """
     Adds a flag to the investor dataset. 
@@ -19,52 +40,18 @@ def spaceSpecialization(df_investor: pd.DataFrame, threshold_year: int, threshol
         raise KeyError("df_investor must contain column 'investor_id'")
 
     # Venture capital flag (case-insensitive; matches 'venture capital' or 'venture_capital')
-    vc_pattern = r"\bventure[_ ]?capital\b"
-    if "investor_types" in df_investor.columns:
-        types_series = df_investor["investor_types"].astype(str)
-    else:
-        inv_db = mylib.openDB("investors")
-        if "investor_types" not in inv_db.columns:
-            raise KeyError("investors DB must contain column 'investor_types'")
-        types_map = inv_db.set_index("investor_id")["investor_types"].astype(str)
-        types_series = df_investor["investor_id"].map(types_map).fillna("")
-
     df_investor = df_investor.copy()
-    df_investor["investor_flag_venture_capital"] = (
-        types_series.str.contains(vc_pattern, case=False, regex=True, na=False).astype(int)
-    )
+    df_investor["investor_flag_venture_capital"] = _vc_mask(df_investor).astype(int)
 
-    # Exclude investors with fewer than 4 total rounds (overall, not window-limited)
-    rounds_all_for_filter = mylib.openDB("rounds")
-    if "investor_id" not in rounds_all_for_filter.columns:
-        raise KeyError("rounds DB must contain column 'investor_id'")
-    counts_all = (
-        rounds_all_for_filter.dropna(subset=["investor_id"]).groupby("investor_id").size().rename("rounds_count")
-    )
-    eligible_ids = set(counts_all[counts_all >= 4].index)
-
-    #investor having sustained a round in european companies
-    firm=pd.read_parquet("DB_Out/DB_firms.parquet")
-    rounds2=mylib.openDB("rounds")
-    firmEu=firm[firm["company_continent"]=="Europe"]["company_id"]
-    rounds2=mylib.space(rounds2, "company_id", False)
-    firmEu=firm[firm["company_continent"]=="Europe"]["company_id"] 
-    roundsLen=rounds2[(rounds2["space"]==1) & (rounds2["company_id"].isin(firmEu))]["investor_id"].drop_duplicates()
-    ids=set(roundsLen)
-    eligible_ids=eligible_ids.intersection(ids)
-    df_investor = df_investor[df_investor["investor_id"].isin(eligible_ids)]
+    # Exclude investors with fewer than 4 total rounds or without a European space deal
+    df_investor = df_investor[df_investor["investor_id"].isin(_deal_eligible_ids())]
 
     # Simplified specialization: consider window [threshold_year .. 2025] inclusive
     start_year = int(threshold_year)
     end_year = 2025
 
-    rounds = mylib.openDB("rounds")
     needed_cols = ["company_id", "investor_id", "round_date", "round_amount_usd"]
-    missing = [c for c in needed_cols if c not in rounds.columns]
-    if missing:
-        raise KeyError(f"Missing columns in rounds table: {missing}")
-
-    rounds = rounds[needed_cols].copy()
+    rounds = mylib.openDB("rounds", columns=needed_cols, filters={"years": (start_year, end_year - 1)})
     rounds["round_amount_usd"] = pd.to_numeric(rounds["round_amount_usd"], errors="coerce").fillna(0.0)
     rounds["round_date"] = pd.to_datetime(rounds["round_date"], errors="coerce")
     rounds = rounds.dropna(subset=["investor_id", "round_date"])  # cannot use rows missing investor or date
@@ -113,59 +100,21 @@ def spacePercentage(df_investor: pd.DataFrame, threshold_year: int, threshold_pe
     over the inclusive window [threshold_year..2025). Investors with no activity receive 0.
 
     Filter the dataframe in order to exclude investor with less than 4 deals. 
+    Only venture capital rows are kept (see _vc_mask), and only investors with a
+    European space deal.
     """
 
     if "investor_id" not in df_investor.columns:
         raise KeyError("df_investor must contain column 'investor_id'")
 
-    # Exclude investors with fewer than 4 total rounds (overall, not window-limited)
-    rounds_all_for_filter = mylib.openDB("rounds")
-    if "investor_id" not in rounds_all_for_filter.columns:
-        raise KeyError("rounds DB must contain column 'investor_id'")
-    counts_all = (
-        rounds_all_for_filter.dropna(subset=["investor_id"]).groupby("investor_id").size().rename("rounds_count")
-    )
-    eligible_ids = set(counts_all[counts_all >= 4].index)
-
-    # Venture capital filter (case-insensitive; matches 'venture capital' or 'venture_capital')
-    vc_pattern = r"\bventure[_ ]?capital\b"
-    if "investor_types" in df_investor.columns:
-        # Filter using types from the provided dataframe
-        types_series = df_investor["investor_types"].astype(str)
-        mask_vc = types_series.str.contains(vc_pattern, case=False, regex=True, na=False)
-        df_investor = df_investor[mask_vc]
-    else:
-        # Pull investor types from the investors DB and filter
-        inv_db = mylib.openDB("investors")
-        if "investor_types" not in inv_db.columns:
-            raise KeyError("investors DB must contain column 'investor_types'")
-        types_map = inv_db.set_index("investor_id")["investor_types"].astype(str)
-        types_series = df_investor["investor_id"].map(types_map).fillna("")
-        mask_vc = types_series.str.contains(vc_pattern, case=False, regex=True, na=False)
-        df_investor = df_investor[mask_vc]
-
-    #investor having sustained a round in european companies
-    firm=pd.read_parquet("DB_Out/DB_firms.parquet")
-    rounds2=mylib.openDB("rounds")
-    firmEu=firm[firm["company_continent"]=="Europe"]["company_id"]
-    rounds2=mylib.space(rounds2, "company_id", False)
-    firmEu=firm[firm["company_continent"]=="Europe"]["company_id"] 
-    roundsLen=rounds2[(rounds2["space"]==1) & (rounds2["company_id"].isin(firmEu))]["investor_id"].drop_duplicates()
-    ids=set(roundsLen)
-    eligible_ids=eligible_ids.intersection(ids)
-
-    df_investor = df_investor[df_investor["investor_id"].isin(eligible_ids)]
+    # Venture capital rows, >=4 total rounds (overall, not window-limited) and a European space deal
+    df_investor = df_investor[_vc_mask(df_investor) & df_investor["investor_id"].isin(_deal_eligible_ids())]
 
     start_year = int(threshold_year)
     end_year = 2025
 
-    rounds = mylib.openDB("rounds")
     needed_cols = ["company_id", "investor_id", "round_date", "round_amount_usd"]
-    missing = [c for c in needed_cols if c not in rounds.columns]
-    if missing:
-        raise KeyError(f"Missing columns in rounds table: {missing}")
-
-    rounds = rounds[needed_cols].copy()
+    rounds = mylib.openDB("rounds", columns=needed_cols, filters={"years": (start_year, end_year - 1)})
     rounds["round_amount_usd"] = pd.to_numeric(rounds["round_amount_usd"], errors="coerce").fillna(0.0)
     rounds["round_date"] = pd.to_datetime(rounds["round_date"], errors="coerce")
     rounds = rounds.dropna(subset=["investor_id", "round_date"])  # ensure usable rows
@@ -204,6 +153,43 @@ def spacePercentage(df_investor: pd.DataFrame, threshold_year: int, threshold_pe
 
     return df_out
 
+def specializationSweep(
+    df_investor: pd.DataFrame,
+    lookbacks: Iterable[int],
+    start_years: Iterable[int],
+    thresholds: Iterable[float],
+    end_year: int = 2025,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Evaluate spacePercentage-style specialization over a grid of windows and thresholds.
+
+    Uses the same investor universe as spacePercentage (VC, >=4 deals, European space
+    deal). Each (start_year, lookback) window covers start_year .. start_year+lookback-1
+    and must end before `end_year` (spacePercentage(inv, 2015, t) is start_year=2015,
+    lookback=10). Rounds are read once; see Library.sweepSpecialization for the
+    returned (long, counts) tables.
+    """
+    if "investor_id" not in df_investor.columns:
+        raise KeyError("df_investor must contain column 'investor_id'")
+
+    lookbacks, start_years = list(lookbacks), list(start_years)
+    base_ids = pd.Index(df_investor["investor_id"].dropna().unique())
+    vc_ids = df_investor.loc[_vc_mask(df_investor), "investor_id"]
+    investor_ids = pd.Index(base_ids[base_ids.isin(vc_ids) & base_ids.isin(_deal_eligible_ids())], name="investor_id")
+    years = list(range(min(start_years), end_year))
+
+    needed_cols = ["company_id", "investor_id", "round_date", "round_amount_usd"]
+    rounds = mylib.openDB("rounds", columns=needed_cols, filters={"years": (years[0], years[-1])})
+    rounds["round_amount_usd"] = pd.to_numeric(rounds["round_amount_usd"], errors="coerce").fillna(0.0)
+    rounds["round_date"] = pd.to_datetime(rounds["round_date"], errors="coerce")
+    rounds = rounds.dropna(subset=["investor_id", "round_date"])
+    rounds["year"] = rounds["round_date"].dt.year
+    rounds["space_amount"] = rounds["round_amount_usd"] * (mylib.companyFlags(rounds["company_id"], "space") == 1)
+
+    total, space_amount = mylib.yearlyAmountMatrices(rounds, investor_ids, years)
+    return mylib.sweepSpecialization(
+        total, space_amount, years, investor_ids, lookbacks, start_years, thresholds
+    )
+
 def spaceSpecYear(df_investor : pd.DataFrame, threshold_percentage: float) -> pd.DataFrame:
     """Return a matrix of specialization flags by year (2010..2025).
 
@@ -225,57 +211,14 @@ def spaceSpecYear(df_investor : pd.DataFrame, threshold_percentage: float) -> pd
     if "investor_id" not in df_investor.columns:
         raise KeyError("df_investor must contain column 'investor_id'")
 
-    # Filter to Venture Capital investors only (case-insensitive, matches 'venture_capital' or 'Venture capital')
-    vc_pattern = r"\bventure[_ ]?capital\b"
-    if "investor_types" in df_investor.columns:
-        inv_type_df = df_investor[["investor_id", "investor_types"]].copy()
-    else:
-        inv_db = mylib.openDB("investors")
-        if "investor_types" not in inv_db.columns:
-            raise KeyError("investors DB must contain column 'investor_types'")
-        inv_type_df = inv_db[["investor_id", "investor_types"]].copy()
-
-    inv_type_df["investor_types"] = inv_type_df["investor_types"].astype(str)
-    vc_ids = inv_type_df[inv_type_df["investor_types"].str.contains(vc_pattern, case=False, regex=True, na=False)][
-        "investor_id"
-    ].dropna().unique()
-
-    # Keep only investor_ids both present in the input df and matching VC filter
-    base_ids = df_investor["investor_id"].dropna().unique()
-    vc_set = set(vc_ids)
-    filtered_ids = [iid for iid in base_ids if iid in vc_set]
-
-    # Now exclude investors with fewer than 4 total rounds (overall, not window-limited)
-    rounds_all_for_filter = mylib.openDB("rounds")
-    if "investor_id" not in rounds_all_for_filter.columns:
-        raise KeyError("rounds DB must contain column 'investor_id'")
-    counts_all = (
-        rounds_all_for_filter.dropna(subset=["investor_id"]).groupby("investor_id").size().rename("rounds_count")
-    )
-    eligible_ids = set(counts_all[counts_all >= 4].index)
-
-    #investor having sustained a round in european companies
-    firm=pd.read_parquet("DB_Out/DB_firms.parquet")
-    rounds2=mylib.openDB("rounds")
-    firmEu=firm[firm["company_continent"]=="Europe"]["company_id"]
-    rounds2=mylib.space(rounds2, "company_id", False)
-    firmEu=firm[firm["company_continent"]=="Europe"]["company_id"] 
-    roundsLen=rounds2[(rounds2["space"]==1) & (rounds2["company_id"].isin(firmEu))]["investor_id"].drop_duplicates()
-    ids=set(roundsLen)
-    eligible_ids=eligible_ids.intersection(ids)
-
-    filtered_ids = [iid for iid in filtered_ids if iid in eligible_ids]
-    investor_ids = pd.Index(filtered_ids, name="investor_id")
-
-    # Load rounds and enrich with space flag
-    rounds = mylib.openDB("rounds")
-    # Keep only columns we need; tolerate missing by using .get
-    needed_cols = ["company_id", "investor_id", "round_date", "round_amount_usd"]
-    missing = [c for c in needed_cols if c not in rounds.columns]
-    if missing:
-        raise KeyError(f"Missing columns in rounds table: {missing}")
+    # Keep only investor_ids of the input df that are VC with >=4 total rounds and a European space deal
+    base_ids = pd.Index(df_investor["investor_id"].dropna().unique())
+    vc_ids = df_investor.loc[_vc_mask(df_investor), "investor_id"]
+    investor_ids = pd.Index(base_ids[base_ids.isin(vc_ids) & base_ids.isin(_deal_eligible_ids())], name="investor_id")
 
-    rounds = rounds[needed_cols].copy()
+    # Load only the columns and years we need (pushed down into the parquet reader)
+    needed_cols = ["company_id", "investor_id", "round_date", "round_amount_usd"]
+    rounds = mylib.openDB("rounds", columns=needed_cols, filters={"years": (start_year, end_year - 1)})
 
     # Ensure types
     rounds["round_amount_usd"] = pd.to_numeric(rounds["round_amount_usd"], errors="coerce").fillna(0.0)
@@ -296,43 +239,14 @@ def spaceSpecYear(df_investor : pd.DataFrame, threshold_percentage: float) -> pd
     # Amount attributed to space companies
     rounds["space_amount"] = rounds["round_amount_usd"] * (rounds["space"].fillna(0) == 1).astype(int)
 
-    # Restrict to investors of interest for efficiency
-    if len(investor_ids) > 0:
-        rounds = rounds[rounds["investor_id"].isin(investor_ids)]
-
-    yearly = (
-        rounds.groupby(["investor_id", "year"])
-        .agg(total_amount=("round_amount_usd", "sum"), space_amount=("space_amount", "sum"))
-        .sort_index()
-    )
-
-    # Build the result matrix initialized to 0
-    result = pd.DataFrame(0, index=investor_ids, columns=years, dtype=int)
-
-    # Compute 5-year lookback ratio (excluding current year) for each investor
-    # For each investor, reindex years to full grid [2010..2025] so rolling works consistently
-    full_year_index = pd.Index(years, name="year")
-
-    # Iterate by investor group to avoid extremely complex pivot logic
-    for inv_id, grp in yearly.groupby(level=0):
-        # Extract this investor's yearly amounts
-        s = grp.droplevel(0)
-        s = s.reindex(full_year_index, fill_value=0)
-
-        # 5-year sums excluding current year (Y-5..Y-1)
-        prev5_total = s["total_amount"].shift(1).rolling(window=5, min_periods=1).sum()
-        prev5_space = s["space_amount"].shift(1).rolling(window=5, min_periods=1).sum()
-
-        # Compute ratio, handle division by zero -> 0
-        with pd.option_context('mode.use_inf_as_na', True):
-            ratio = prev5_space.divide(prev5_total).fillna(0.0)
-
-        flags = (ratio >= threshold_percentage).astype(int)
+    # Dense (investor x year) amounts; 5-year lookback ratio excluding the current year,
+    # clipped at 2010 (partial windows allowed, an empty window gives ratio 0)
+    total, space_amount = mylib.yearlyAmountMatrices(rounds, investor_ids, years)
+    _, flags = mylib.windowSpecialization(total, space_amount, 5, threshold_percentage, min_periods=1)
 
-        # Ensure we only write for investors requested; others are ignored
-        if inv_id in result.index:
-            result.loc[inv_id, years] = flags.values
+    # Investors without any round in the period keep all-zero flags
+    flags &= investor_ids.isin(rounds["investor_id"])[:, None]
 
-    # Ensure dtype int and index name
+    result = pd.DataFrame(flags.astype(int), index=investor_ids, columns=years)
     result.index.name = "investor_id"
     return result
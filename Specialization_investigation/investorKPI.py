@@ -0,0 +1,296 @@
+"""
+Shared KPI engine for the comparisonWithNotFocused tables.
+
+The rounds are sorted once by (investor_id, round_date); every investor-level KPI
+is then a ratio of segment sums taken with np.add.reduceat over precomputed
+indicator/amount columns, instead of one groupby + join per KPI. The row labels
+and KPI column names are defined here once for all the script variants.
+The class tables are built by compute_metrics_by_class with one groupby over all
+KPI columns, for any set of class edges and optionally weighted by capital.
+"""
+
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Canonical round buckets used to standardize round labels before aggregation
+ROUND_TYPES = ["Seed", "Early Stage", "Early Growth", "Later Stage"]
+# Explicit row ordering for the exported tables
+ROW_LABELS = [
+    "Number of entities",
+    "Average round size (space firms, USD mn)",
+    "Average round size (non-space firms, USD mn)",
+    "Average number of rounds (space firms)",
+    "Average number of rounds (non-space firms)",
+    "Average time between investments (months)",
+    "Segments - % upstream",
+    "Segments - % downstream",
+    "Segments - % others",
+    "Round distribution (space firms) - % seed",
+    "Round distribution (space firms) - % early stage",
+    "Round distribution (space firms) - % early growth",
+    "Round distribution (space firms) - % later stage",
+    "Round distribution (non-space firms) - % seed",
+    "Round distribution (non-space firms) - % early stage",
+    "Round distribution (non-space firms) - % early growth",
+    "Round distribution (non-space firms) - % later stage",
+    "Domestic investments (%)",
+]
+# Mapping between row labels and investor-level metric columns
+INVESTOR_METRIC_MAP = {
+    "Average round size (space firms, USD mn)": "avg_size_space_musd",
+    "Average round size (non-space firms, USD mn)": "avg_size_other_musd",
+    "Average number of rounds (space firms)": "rounds_space_count",
+    "Average number of rounds (non-space firms)": "rounds_other_count",
+    "Average time between investments (months)": "avg_time_between_months",
+    "Segments - % upstream": "upstream_pct",
+    "Segments - % downstream": "downstream_pct",
+    "Segments - % others": "other_segments_pct",
+    "Round distribution (space firms) - % seed": "round_seed_pct_space",
+    "Round distribution (space firms) - % early stage": "round_early_stage_pct_space",
+    "Round distribution (space firms) - % early growth": "round_early_growth_pct_space",
+    "Round distribution (space firms) - % later stage": "round_later_stage_pct_space",
+    "Round distribution (non-space firms) - % seed": "round_seed_pct_other",
+    "Round distribution (non-space firms) - % early stage": "round_early_stage_pct_other",
+    "Round distribution (non-space firms) - % early growth": "round_early_growth_pct_other",
+    "Round distribution (non-space firms) - % later stage": "round_later_stage_pct_other",
+    "Domestic investments (%)": "domestic_pct",
+}
+STAGE_SUFFIX = {
+    "Seed": "seed",
+    "Early Stage": "early_stage",
+    "Early Growth": "early_growth",
+    "Later Stage": "later_stage",
+}
+DAYS_PER_MONTH = 30.4375
+# Default specialization classes: five 20% bins (upper edge nudged to keep 100% in)
+CLASS_EDGES = [0.0, 0.2, 0.4, 0.6, 0.8, 1.0000001]
+# Total round amount (USD) of the investor, used as weight for capital-weighted means
+CAPITAL_COLUMN = "capital_deployed_usd"
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray, scale: float = 1.0) -> np.ndarray:
+    """numerator / denominator * scale, NaN where the denominator is 0 (empty segment)."""
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator != 0)
+    return out * scale
+
+
+def _stage_labels(values: pd.Series) -> np.ndarray:
+    """Standardized round labels as an object array with "" for missing labels."""
+    return values.astype(object).where(values.notna(), "").to_numpy(dtype=object)
+
+
+def _segment_sums(values: dict[str, np.ndarray], starts: np.ndarray) -> dict[str, np.ndarray]:
+    if len(starts) == 0:
+        return {name: np.zeros(0) for name in values}
+    return {name: np.add.reduceat(column, starts) for name, column in values.items()}
+
+
+def build_investor_metrics(
+    rounds: pd.DataFrame,
+    class_labels: list[str],
+    extra_means: Sequence[str] = (),
+) -> pd.DataFrame:
+    """Compute per-investor KPIs prior to class-level aggregation.
+
+    Expects the enriched rounds (investor_id, class, round_date, round_amount_usd,
+    space, upstream, downstream, std_round, domestic_flag). KPIs of an empty
+    subset (e.g. no space rounds) are NaN, so they drop out of the class means.
+    `extra_means` lists further round columns averaged per investor (e.g.
+    space_percentage). CAPITAL_COLUMN holds the investor's total round amount.
+    """
+    investor_classes = (
+        rounds[["investor_id", "class"]]
+        .drop_duplicates()
+        .dropna(subset=["investor_id"])
+    )
+
+    data = rounds.dropna(subset=["investor_id"]).sort_values(
+        ["investor_id", "round_date"], kind="stable"
+    )
+    ids = data["investor_id"].to_numpy()
+    n = len(ids)
+    starts = (
+        np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if n else np.zeros(0, dtype=int)
+    )
+
+    def _values(column: str) -> np.ndarray:
+        return pd.to_numeric(data[column], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+
+    amount = _values("round_amount_usd")
+    has_amount = ~np.isnan(amount)
+    amount = np.where(has_amount, amount, 0.0)
+    is_space = (_values("space") == 1).astype(float)
+    is_other = 1.0 - is_space
+    upstream = np.nan_to_num(_values("upstream"))
+    downstream = np.nan_to_num(_values("downstream"))
+    std_round = _stage_labels(data["std_round"])
+    domestic = _values("domestic_flag")
+
+    # months since the previous round of the same investor (NaN on each investor's first round)
+    dates = pd.to_datetime(data["round_date"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+    gaps = np.full(n, np.nan)
+    if n > 1:
+        gaps[1:] = (dates[1:] - dates[:-1]) / np.timedelta64(1, "D") / DAYS_PER_MONTH
+    gaps[starts] = np.nan
+    has_gap = ~np.isnan(gaps)
+
+    columns = {
+        "n_space": is_space,
+        "n_other": is_other,
+        "n_amount_space": is_space * has_amount,
+        "n_amount_other": is_other * has_amount,
+        "amount_space": amount * is_space,
+        "amount_other": amount * is_other,
+        "gap_sum": np.where(has_gap, gaps, 0.0),
+        "gap_count": has_gap.astype(float),
+        "upstream": upstream * is_space,
+        "downstream": downstream * is_space,
+        "other_segment": ((upstream == 0) & (downstream == 0)) * is_space,
+        "domestic_sum": np.nan_to_num(domestic),
+        "domestic_count": (~np.isnan(domestic)).astype(float),
+    }
+    stage_present = {}
+    for scope, mask in (("space", is_space), ("other", is_other)):
+        for stage, suffix in STAGE_SUFFIX.items():
+            in_stage = (std_round == stage) * mask
+            columns[f"stage_{suffix}_{scope}"] = amount * in_stage
+            # a stage that never occurs in the scope yields a missing column, as with unstack
+            stage_present[(stage, scope)] = bool(in_stage.any())
+    for column in extra_means:
+        values = _values(column)
+        columns[f"{column}_sum"] = np.nan_to_num(values)
+        columns[f"{column}_count"] = (~np.isnan(values)).astype(float)
+
+    sums = _segment_sums(columns, starts)
+
+    kpis = {
+        "avg_size_space_musd": _ratio(sums["amount_space"], sums["n_amount_space"], 1 / 1_000_000),
+        "avg_size_other_musd": _ratio(sums["amount_other"], sums["n_amount_other"], 1 / 1_000_000),
+        "rounds_space_count": np.where(sums["n_space"] > 0, sums["n_space"], np.nan),
+        "rounds_other_count": np.where(sums["n_other"] > 0, sums["n_other"], np.nan),
+        "avg_time_between_months": _ratio(sums["gap_sum"], sums["gap_count"]),
+        "upstream_pct": _ratio(sums["upstream"], sums["n_space"], 100.0),
+        "downstream_pct": _ratio(sums["downstream"], sums["n_space"], 100.0),
+        "other_segments_pct": _ratio(sums["other_segment"], sums["n_space"], 100.0),
+    }
+    for scope in ("space", "other"):
+        stage_total = sum(sums[f"stage_{suffix}_{scope}"] for suffix in STAGE_SUFFIX.values())
+        for stage, suffix in STAGE_SUFFIX.items():
+            share = _ratio(sums[f"stage_{suffix}_{scope}"], stage_total, 100.0)
+            if not stage_present[(stage, scope)]:
+                share = np.full(len(starts), np.nan)
+            kpis[f"round_{suffix}_pct_{scope}"] = share
+    kpis["domestic_pct"] = _ratio(sums["domestic_sum"], sums["domestic_count"], 100.0)
+    for column in extra_means:
+        kpis[column] = _ratio(sums[f"{column}_sum"], sums[f"{column}_count"])
+    kpis[CAPITAL_COLUMN] = sums["amount_space"] + sums["amount_other"]
+
+    per_investor = pd.DataFrame(kpis, index=pd.Index(ids[starts], name="investor_id"))
+    ordered = [col for col in extra_means] + list(INVESTOR_METRIC_MAP.values()) + [CAPITAL_COLUMN]
+    metrics = investor_classes.merge(
+        per_investor[ordered], left_on="investor_id", right_index=True, how="left"
+    ).reset_index(drop=True)
+    metrics["class"] = pd.Categorical(
+        metrics["class"], categories=class_labels, ordered=True
+    )
+    return metrics
+
+
+def class_labels_for(edges: Sequence[float]) -> list[str]:
+    """Labels of the bins between consecutive edges, e.g. "0-20%", "20%-40%"."""
+
+    def _percent(value: float) -> str:
+        return f"{round(min(value, 1.0) * 100, 4):g}%"
+
+    return [
+        ("0" if lower == 0 else _percent(lower)) + "-" + _percent(upper)
+        for lower, upper in zip(edges[:-1], edges[1:])
+    ]
+
+
+def assign_classes(
+    shares: pd.Series, edges: Sequence[float] = CLASS_EDGES
+) -> tuple[pd.Series, list[str]]:
+    """Bin specialization shares (0..1) into right-closed classes; returns (classes, labels)."""
+    labels = class_labels_for(edges)
+    classes = pd.cut(shares, bins=list(edges), labels=labels, include_lowest=True, right=True)
+    return classes, labels
+
+
+def compute_metrics_by_class(
+    investor_metrics: pd.DataFrame,
+    class_labels: Sequence[str],
+    weights: Optional[str] = None,
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """Aggregate investor-level metrics by specialization class.
+
+    Returns the means, population stds and non-null counts of every KPI as
+    ROW_LABELS x class_labels frames (empty cells 0). With `weights` (e.g.
+    CAPITAL_COLUMN) means and stds are weighted by that column; counts and the
+    number of entities stay unweighted.
+    """
+    columns = list(INVESTOR_METRIC_MAP.values())
+    values = investor_metrics[columns].astype(float)
+    groups = pd.Categorical(investor_metrics["class"], categories=list(class_labels))
+    grouped = values.groupby(groups, observed=False)
+    counts = grouped.count()
+
+    if weights is None:
+        means = grouped.mean()
+        stds = grouped.std(ddof=0)
+    else:
+        weight = pd.to_numeric(investor_metrics[weights], errors="coerce").clip(lower=0).fillna(0.0)
+        total_weight = values.notna().mul(weight, axis=0).groupby(groups, observed=False).sum()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = values.mul(weight, axis=0).groupby(groups, observed=False).sum() / total_weight
+            row_means = means.reindex(np.asarray(groups, dtype=object)).to_numpy()
+            squares = ((values - row_means) ** 2).mul(weight, axis=0)
+            stds = np.sqrt(squares.groupby(groups, observed=False).sum() / total_weight)
+        means = means.where(total_weight > 0)
+        stds = stds.where(total_weight > 0)
+
+    entities = pd.Series(groups).value_counts().reindex(list(class_labels))
+    row_names = {column: row for row, column in INVESTOR_METRIC_MAP.items()}
+
+    def _table(frame: pd.DataFrame, entity_row: pd.Series) -> pd.DataFrame:
+        table = frame.reindex(list(class_labels)).rename(columns=row_names).T
+        table.loc["Number of entities"] = entity_row.to_numpy()
+        table.columns = list(class_labels)
+        return table.reindex(ROW_LABELS)
+
+    means_df = _table(means, entities.astype(float)).fillna(0.0)
+    stds_df = _table(stds, entities * 0.0).fillna(0.0)
+    counts_df = _table(counts, entities).fillna(0).astype(int)
+    return means_df, stds_df, counts_df
+
+
+def build_round_metrics(rounds: pd.DataFrame) -> pd.DataFrame:
+    """Round-level KPI columns (named as in INVESTOR_METRIC_MAP) for round-level tables.
+
+    Each column holds the value a round contributes to the KPI, NaN when the round
+    is outside the KPI's scope, so that a single groupby(...).agg(["mean", "std",
+    "count"]) yields the per-class statistics. The per-company round counts and
+    per-investor gaps are not round attributes and are left to the caller.
+    """
+    is_space = pd.to_numeric(rounds["space"], errors="coerce").eq(1).to_numpy()
+    amount = pd.to_numeric(rounds["round_amount_usd"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    upstream = pd.to_numeric(rounds["upstream"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    downstream = pd.to_numeric(rounds["downstream"], errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+    std_round = _stage_labels(rounds["std_round"])
+    valid_stage = np.isin(std_round, ROUND_TYPES)
+
+    out = {
+        "avg_size_space_musd": np.where(is_space, amount / 1_000_000, np.nan),
+        "avg_size_other_musd": np.where(~is_space, amount / 1_000_000, np.nan),
+        "upstream_pct": np.where(is_space, upstream * 100.0, np.nan),
+        "downstream_pct": np.where(is_space, downstream * 100.0, np.nan),
+        "other_segments_pct": np.where(is_space, ((upstream == 0) & (downstream == 0)) * 100.0, np.nan),
+        "domestic_pct": pd.to_numeric(rounds["domestic_flag"], errors="coerce").to_numpy(dtype=float, na_value=np.nan) * 100.0,
+    }
+    for scope, mask in (("space", is_space & valid_stage), ("other", ~is_space & valid_stage)):
+        for stage, suffix in STAGE_SUFFIX.items():
+            out[f"round_{suffix}_pct_{scope}"] = np.where(mask, (std_round == stage) * 100.0, np.nan)
+    return pd.DataFrame(out, index=rounds.index)
@@ -0,0 +1,150 @@
+"""
+Report output for the specialization comparison scripts.
+
+write_report stores every result table as parquet first (the canonical, full
+precision output, next to the workbook in a `<workbook stem>/` folder) and then
+streams the same tables into the xlsx workbook row by row:
+
+- xlsxwriter in constant_memory mode when it is installed, with the number
+  formats attached to whole columns (set_column);
+- otherwise openpyxl in write-only mode, with one shared style per format.
+
+Values are written as numbers and rounded only by the Excel number format (e.g.
+"0.00"), so no table is converted to formatted strings cell by cell.
+"""
+
+import re
+from pathlib import Path
+from typing import Mapping, Optional, Union
+
+import pandas as pd
+
+# number format for every numeric body cell of a sheet, or per column
+SheetFormat = Union[str, Mapping[str, str]]
+
+# Excel number formats of the comparisonWithNotFocused sheets
+COMPARISON_FORMATS: dict[str, SheetFormat] = {
+    "Means": "0.00",
+    "StdDev": "0.00",
+    "SampleSize": "0",
+    "Bootstrap CI low": "0.00",
+    "Bootstrap CI high": "0.00",
+    "Permutation p-value": "0.0000",
+    "OLS_Correlation": "0.0000",
+    "OLS_Correlation_Quadratic": "0.0000",
+}
+
+
+def _slug(name: str) -> str:
+    return re.sub(r"[^0-9A-Za-z]+", "_", name).strip("_") or "sheet"
+
+
+def _with_index(table: pd.DataFrame, index: bool) -> pd.DataFrame:
+    """Table with the index as a leading column and string column labels."""
+    table = table.copy()
+    table.columns = [str(column) for column in table.columns]
+    if index:
+        table = table.reset_index(names=table.index.name or "")
+    return table
+
+
+def _cell_values(table: pd.DataFrame) -> list[list]:
+    """Row-major python values, missing values as None (empty cells)."""
+    return table.astype(object).where(table.notna(), None).to_numpy().tolist()
+
+
+def _column_formats(table: pd.DataFrame, sheet_format: Optional[SheetFormat]) -> dict[int, str]:
+    """Position -> number format of the numeric (non-boolean) columns."""
+    if sheet_format is None:
+        return {}
+    formats = {}
+    for position, (column, dtype) in enumerate(table.dtypes.items()):
+        if not pd.api.types.is_numeric_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+            continue
+        fmt = sheet_format if isinstance(sheet_format, str) else sheet_format.get(column)
+        if fmt:
+            formats[position] = fmt
+    return formats
+
+
+def _write_xlsxwriter(path: Path, sheets: dict[str, pd.DataFrame], formats: Mapping[str, SheetFormat]) -> None:
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(str(path), {"constant_memory": True, "nan_inf_to_errors": True})
+    try:
+        cached: dict[str, object] = {}
+        for name, table in sheets.items():
+            worksheet = workbook.add_worksheet(name)
+            for position, fmt in _column_formats(table, formats.get(name)).items():
+                if fmt not in cached:
+                    cached[fmt] = workbook.add_format({"num_format": fmt})
+                worksheet.set_column(position, position, None, cached[fmt])
+            worksheet.write_row(0, 0, list(table.columns))
+            for row_number, row in enumerate(_cell_values(table), start=1):
+                worksheet.write_row(row_number, 0, row)
+    finally:
+        workbook.close()
+
+
+def _write_openpyxl(path: Path, sheets: dict[str, pd.DataFrame], formats: Mapping[str, SheetFormat]) -> None:
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    workbook = Workbook(write_only=True)
+    for name, table in sheets.items():
+        worksheet = workbook.create_sheet(title=name)
+        column_formats = _column_formats(table, formats.get(name))
+        worksheet.append(list(table.columns))
+        for row in _cell_values(table):
+            for position, fmt in column_formats.items():
+                if row[position] is not None:
+                    cell = WriteOnlyCell(worksheet, value=row[position])
+                    cell.number_format = fmt
+                    row[position] = cell
+            worksheet.append(row)
+    workbook.save(path)
+
+
+def write_report(
+    xlsx_path: Path,
+    tables: Mapping[str, pd.DataFrame],
+    formats: Optional[Mapping[str, SheetFormat]] = None,
+    index: bool = True,
+    parquet: bool = True,
+    engine: Optional[str] = None,
+) -> dict[str, Path]:
+    """Write `tables` (sheet name -> frame) to parquet and to one xlsx workbook.
+
+    `formats` maps a sheet name to an Excel number format for all its numeric
+    columns, or to a {column: format} dict. `engine` forces "xlsxwriter" or
+    "openpyxl"; by default xlsxwriter is used when available. Returns the
+    written paths (sheet name -> parquet file, plus "xlsx").
+    """
+    xlsx_path = Path(xlsx_path)
+    formats = formats or {}
+    sheets = {name: _with_index(table, index) for name, table in tables.items()}
+
+    written: dict[str, Path] = {}
+    if parquet:
+        parquet_dir = xlsx_path.with_suffix("")
+        parquet_dir.mkdir(parents=True, exist_ok=True)
+        for name, table in sheets.items():
+            target = parquet_dir / f"{_slug(name)}.parquet"
+            table.to_parquet(target, index=False)
+            written[name] = target
+
+    if engine is None:
+        try:
+            import xlsxwriter  # noqa: F401
+
+            engine = "xlsxwriter"
+        except ModuleNotFoundError:
+            engine = "openpyxl"
+    if engine == "xlsxwriter":
+        _write_xlsxwriter(xlsx_path, sheets, formats)
+    elif engine == "openpyxl":
+        _write_openpyxl(xlsx_path, sheets, formats)
+    else:
+        raise ValueError("engine must be 'xlsxwriter' or 'openpyxl'")
+    written["xlsx"] = xlsx_path
+    return written
@@ -0,0 +1,218 @@
+"""
+Significance tests for the specialization class tables.
+
+- flag_significance: z/t test of every (KPI, class) mean against zero, on the
+  mean/std/count tables at once, for any alpha.
+- bootstrap_class_means: percentile confidence intervals of every class mean by
+  resampling clusters (investors) with replacement inside each class.
+- permutation_class_test: p-values for the difference in means between two
+  classes by permuting the class labels of the pooled clusters.
+
+Resampling never copies the data: each cluster is reduced once to per-metric sums
+and non-null counts, and a resample is a matrix of cluster weights (multinomial
+counts for the bootstrap, 0/1 labels for the permutation), so every resampled
+mean is a matrix product. Resamples are drawn in chunks from child streams of
+one SeedSequence, so results depend on the seed only, not on `n_jobs`.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+RESAMPLE_CHUNK = 500
+
+
+def flag_significance(
+    means: pd.DataFrame,
+    stds: pd.DataFrame,
+    counts: pd.DataFrame,
+    alpha: float = 0.05,
+    test: str = "z",
+    standard_error: bool = True,
+    skip_rows: Iterable[str] = ("Number of entities",),
+) -> pd.DataFrame:
+    """Return boolean mask where mean differs from zero at given alpha (two-tailed).
+
+    `test` is "z" (normal critical value) or "t" (Student t with count-1 degrees
+    of freedom). With `standard_error=False` the std itself is used as the
+    dispersion of the mean instead of std/sqrt(count). Cells with count <= 1 are
+    never significant; a zero dispersion is significant when the mean is not 0.
+    """
+    if not 0 < alpha < 1:
+        raise ValueError("alpha must be between 0 and 1")
+    mean = means.to_numpy(dtype=float)
+    std = stds.to_numpy(dtype=float)
+    count = counts.to_numpy(dtype=float)
+
+    if test == "z":
+        critical = stats.norm.ppf(1 - alpha / 2)
+    elif test == "t":
+        with np.errstate(invalid="ignore"):
+            critical = stats.t.ppf(1 - alpha / 2, count - 1)
+    else:
+        raise ValueError("test must be 'z' or 't'")
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = std / np.sqrt(count) if standard_error else std
+        significant = np.where(spread == 0.0, mean != 0.0, np.abs(mean) >= critical * spread)
+    significant &= count > 1
+
+    significance = pd.DataFrame(significant, index=means.index, columns=means.columns)
+    significance.loc[significance.index.isin(list(skip_rows))] = False
+    return significance
+
+
+def _cluster_totals(
+    values: pd.DataFrame, groups: pd.Series, clusters: Optional[pd.Series]
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-cluster metric sums, non-null counts and class of each cluster."""
+    data = values.to_numpy(dtype=float)
+    present = ~np.isnan(data)
+    keys = clusters if clusters is not None else pd.Series(np.arange(len(values)), index=values.index)
+    frame = pd.DataFrame({"cluster": keys.to_numpy(), "group": groups.to_numpy()})
+    valid = frame["cluster"].notna().to_numpy() & frame["group"].notna().to_numpy()
+    # clusters are taken within each class: an investor active in two classes is two clusters
+    codes, uniques = pd.factorize(
+        pd.MultiIndex.from_frame(frame.loc[valid, ["group", "cluster"]].astype(object))
+    )
+    n_clusters = len(uniques)
+
+    sums = np.zeros((n_clusters, data.shape[1]))
+    nonnull = np.zeros((n_clusters, data.shape[1]))
+    np.add.at(sums, codes, np.where(present, data, 0.0)[valid])
+    np.add.at(nonnull, codes, present[valid].astype(float))
+    cluster_group = uniques.get_level_values(0).to_numpy()
+    return sums, nonnull, cluster_group
+
+
+def _weighted_means(weights: np.ndarray, sums: np.ndarray, nonnull: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (weights @ sums) / (weights @ nonnull)
+
+
+def _chunks(n_resamples: int) -> list[int]:
+    full, rest = divmod(n_resamples, RESAMPLE_CHUNK)
+    return [RESAMPLE_CHUNK] * full + ([rest] if rest else [])
+
+
+def _run_chunks(worker, tasks: list[tuple], n_jobs: int) -> list[np.ndarray]:
+    if n_jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            return list(pool.map(worker, *zip(*tasks)))
+    return [worker(*task) for task in tasks]
+
+
+def _bootstrap_chunk(
+    seed: np.random.SeedSequence, size: int, sums: np.ndarray, nonnull: np.ndarray
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n_clusters = len(sums)
+    # multinomial cluster weights: how often each cluster is drawn in each resample
+    draws = rng.integers(0, n_clusters, (size, n_clusters))
+    draws += np.arange(size)[:, None] * n_clusters
+    weights = np.bincount(draws.ravel(), minlength=size * n_clusters).reshape(size, n_clusters)
+    return _weighted_means(weights.astype(float), sums, nonnull)
+
+
+def bootstrap_class_means(
+    values: pd.DataFrame,
+    groups: pd.Series,
+    class_labels: Sequence[str],
+    clusters: Optional[pd.Series] = None,
+    n_resamples: int = 10_000,
+    alpha: float = 0.05,
+    seed: Optional[int] = None,
+    n_jobs: int = 1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Percentile (1 - alpha) confidence intervals of the class mean of every column.
+
+    `values` holds one row per observation and `groups` its class. Observations
+    sharing a `clusters` key (e.g. the rounds of an investor) are resampled
+    together; by default every row is its own cluster. Returns (lower, upper)
+    tables shaped like the class tables: columns of `values` x class_labels.
+    """
+    sums, nonnull, cluster_group = _cluster_totals(values, groups, clusters)
+    lower = pd.DataFrame(np.nan, index=values.columns, columns=list(class_labels))
+    upper = lower.copy()
+    root = np.random.SeedSequence(seed)
+    for label, label_seed in zip(class_labels, root.spawn(len(class_labels))):
+        in_class = cluster_group == label
+        if not in_class.any():
+            continue
+        sizes = _chunks(n_resamples)
+        tasks = [
+            (chunk_seed, size, sums[in_class], nonnull[in_class])
+            for chunk_seed, size in zip(label_seed.spawn(len(sizes)), sizes)
+        ]
+        resampled = np.vstack(_run_chunks(_bootstrap_chunk, tasks, n_jobs))
+        with np.errstate(invalid="ignore"):
+            low, high = np.nanquantile(resampled, [alpha / 2, 1 - alpha / 2], axis=0)
+        lower[label] = low
+        upper[label] = high
+    return lower, upper
+
+
+def _permutation_chunk(
+    seed: np.random.SeedSequence,
+    size: int,
+    n_first: int,
+    sums: np.ndarray,
+    nonnull: np.ndarray,
+    observed: np.ndarray,
+) -> np.ndarray:
+    """Number of label permutations whose |difference| reaches the observed one."""
+    rng = np.random.default_rng(seed)
+    # the n_first smallest of iid uniforms pick a random subset of size n_first
+    keys = rng.random((size, len(sums)))
+    cutoff = np.partition(keys, n_first - 1, axis=1)[:, n_first - 1 : n_first]
+    labels = (keys <= cutoff).astype(float)
+    difference = _weighted_means(labels, sums, nonnull) - _weighted_means(1.0 - labels, sums, nonnull)
+    with np.errstate(invalid="ignore"):
+        # tolerance keeps permutations equal to the observed split from being lost to rounding
+        return (np.abs(difference) >= np.abs(observed) - 1e-12).sum(axis=0)
+
+
+def permutation_class_test(
+    values: pd.DataFrame,
+    groups: pd.Series,
+    class_labels: Sequence[str],
+    reference: Optional[str] = None,
+    clusters: Optional[pd.Series] = None,
+    n_resamples: int = 10_000,
+    seed: Optional[int] = None,
+    n_jobs: int = 1,
+) -> pd.DataFrame:
+    """Two-sided permutation p-values of mean(class) - mean(reference) for every column.
+
+    The clusters of the two classes are pooled and their class labels permuted.
+    `reference` defaults to the first class label; the reference column itself is NaN.
+    Returns a table of columns of `values` x class_labels.
+    """
+    reference = class_labels[0] if reference is None else reference
+    sums, nonnull, cluster_group = _cluster_totals(values, groups, clusters)
+    pvalues = pd.DataFrame(np.nan, index=values.columns, columns=list(class_labels))
+    in_reference = cluster_group == reference
+    root = np.random.SeedSequence(seed)
+    for label, label_seed in zip(class_labels, root.spawn(len(class_labels))):
+        in_class = cluster_group == label
+        if label == reference or not in_class.any() or not in_reference.any():
+            continue
+        pooled = in_class | in_reference
+        pooled_sums = sums[pooled]
+        pooled_nonnull = nonnull[pooled]
+        first = in_class[pooled].astype(float)[None, :]
+        observed = (
+            _weighted_means(first, pooled_sums, pooled_nonnull)
+            - _weighted_means(1.0 - first, pooled_sums, pooled_nonnull)
+        )[0]
+        sizes = _chunks(n_resamples)
+        tasks = [
+            (chunk_seed, size, int(in_class.sum()), pooled_sums, pooled_nonnull, observed)
+            for chunk_seed, size in zip(label_seed.spawn(len(sizes)), sizes)
+        ]
+        exceed = np.sum(_run_chunks(_permutation_chunk, tasks, n_jobs), axis=0)
+        pvalues[label] = np.where(np.isnan(observed), np.nan, (exceed + 1) / (n_resamples + 1))
+    return pvalues
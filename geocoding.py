@@ -0,0 +1,338 @@
+"""
+Investor geocoding behind Library.findLocation / Library.geocodeInvestors.
+
+Every investor name is looked up once: the answers are kept in a parquet cache
+keyed by the normalized name (casefolded, whitespace collapsed), so geocoding the
+investor list again only queries the names that are not cached yet. Failed
+lookups are not cached and are retried on the next run.
+
+One cache per file and one default Places backend are kept for the whole process
+and shared by every call (findLocation asks for one name at a time): the cache is
+saved every CHECKPOINT_EVERY new answers, at the end of a batch and at exit.
+
+The new names are looked up concurrently on an asyncio loop. A thread pool drives
+the blocking backend calls; the Places backend shares one pooled HTTP session that
+retries 429/5xx answers with backoff, under one requests-per-second limit.
+
+Backends (anything with a `name` and a `lookup(investor) -> list[dict]`):
+- PlacesBackend: Google Places text search + place details. `base_url` can point
+  to a local fixture server.
+- StaticBackend: canned answers from a dict or a JSON file, for tests and
+  air-gapped runs.
+
+A lookup returns one dict per matched place: address component type -> long text,
+plus "Investor" (the shape findLocation always returned).
+"""
+
+import asyncio
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Iterable, Mapping, Optional, Protocol, Union
+
+import pandas as pd
+
+PLACES_URL = "https://places.googleapis.com/v1"
+API_KEY_ENV = "GOOGLE_PLACES_API_KEY"
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE_LIMIT = 10.0  # HTTP requests per second, shared by all workers
+CHECKPOINT_EVERY = 200  # the cache is saved every CHECKPOINT_EVERY new answers
+
+Location = dict[str, str]
+
+
+def normalize_name(name) -> str:
+    """Cache key of an investor name: casefolded with whitespace collapsed."""
+    return re.sub(r"\s+", " ", str(name)).strip().casefold()
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing calls 1/rate seconds apart (rate <= 0 disables it)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            slot = max(time.monotonic(), self._next)
+            self._next = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class GeocodingBackend(Protocol):
+    name: str
+
+    def lookup(self, investor: str) -> list[Location]:
+        """Locations found for `investor` (empty when none); raise when the lookup failed."""
+        ...
+
+
+class PlacesBackend:
+    """Google Places: a text search for "<investor> headquarter", then the details of each place."""
+
+    name = "places"
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = PLACES_URL,
+        rate_limit: float = DEFAULT_RATE_LIMIT,
+        pool_size: int = DEFAULT_CONCURRENCY,
+        retries: int = 3,
+        timeout: float = 30.0,
+    ):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        self.api_key = api_key or os.environ.get(API_KEY_ENV, "")
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.limiter = RateLimiter(rate_limit)
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=None,  # the text search is a POST
+            respect_retry_after_header=True,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _call(self, method: str, url: str, **kwargs) -> dict:
+        self.limiter.wait()
+        response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    def lookup(self, investor: str) -> list[Location]:
+        found = self._call(
+            "POST",
+            f"{self.base_url}/places:searchText",
+            headers={
+                "Content-Type": "application/json",
+                "X-Goog-Api-Key": self.api_key,
+                "X-Goog-FieldMask": "places.id",
+            },
+            json={"textQuery": f"{investor} headquarter", "languageCode": "en"},
+        )
+        locations = []
+        for place in found.get("places", []):
+            place_id = place.get("id", "")
+            if not place_id:
+                continue
+            details = self._call(
+                "GET",
+                f"{self.base_url}/places/{place_id}",
+                headers={"X-Goog-Api-Key": self.api_key, "X-Goog-FieldMask": "id,addressComponents"},
+            )
+            location = {"Investor": investor}
+            for component in details.get("addressComponents", []):
+                types = component.get("types") or [""]
+                location[types[0]] = component.get("longText", "")
+            locations.append(location)
+        return locations
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class StaticBackend:
+    """Canned answers: investor name -> list of address-component dicts (matched on the normalized name)."""
+
+    name = "static"
+
+    def __init__(self, answers: Mapping[str, Iterable[Mapping[str, str]]]):
+        self.answers = {
+            normalize_name(investor): [{k: v for k, v in location.items() if k != "Investor"} for location in locations]
+            for investor, locations in answers.items()
+        }
+
+    @classmethod
+    def from_json(cls, path: Union[str, Path]) -> "StaticBackend":
+        with open(path, "r", encoding="utf-8") as handle:
+            return cls(json.load(handle))
+
+    def lookup(self, investor: str) -> list[Location]:
+        return [{"Investor": investor, **location} for location in self.answers.get(normalize_name(investor), [])]
+
+
+class GeocodeCache:
+    """Parquet cache: normalized investor name -> locations, loaded once and saved atomically."""
+
+    COLUMNS = ["key", "investor", "backend", "locations", "fetched_at"]
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._rows: dict[str, dict] = {}
+        self._unsaved = 0
+        if self.path.is_file():
+            for row in pd.read_parquet(self.path).to_dict("records"):
+                self._rows[row["key"]] = row
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, investor: str) -> Optional[list[Location]]:
+        """Cached locations of `investor` (labelled with this spelling), None when not cached."""
+        row = self._rows.get(normalize_name(investor))
+        if row is None:
+            return None
+        return [{"Investor": investor, **location} for location in json.loads(row["locations"])]
+
+    def put(self, investor: str, backend: str, locations: list[Location]) -> None:
+        stored = [{k: v for k, v in location.items() if k != "Investor"} for location in locations]
+        self._rows[normalize_name(investor)] = {
+            "key": normalize_name(investor),
+            "investor": investor,
+            "backend": backend,
+            "locations": json.dumps(stored, ensure_ascii=False),
+            "fetched_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        self._unsaved += 1
+
+    def checkpoint(self, every: int = CHECKPOINT_EVERY) -> None:
+        """Save once `every` answers are waiting to be written."""
+        if self._unsaved >= every:
+            self.save()
+
+    def save(self) -> None:
+        if not self._unsaved:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        staging = self.path.with_suffix(".tmp")
+        pd.DataFrame(list(self._rows.values()), columns=self.COLUMNS).to_parquet(staging, index=False)
+        staging.replace(self.path)
+        self._unsaved = 0
+
+
+# resolved path -> cache, and the default backend, shared by every call of the process
+_CACHES: dict[Path, GeocodeCache] = {}
+_DEFAULT_BACKEND: Optional[PlacesBackend] = None
+
+
+def shared_cache(path: Union[str, Path]) -> GeocodeCache:
+    """The process-wide cache of `path`, read from disk on first use only."""
+    path = Path(path).resolve()
+    cache = _CACHES.get(path)
+    if cache is None:
+        cache = _CACHES[path] = GeocodeCache(path)
+    return cache
+
+
+@atexit.register
+def save_caches() -> None:
+    """Write the answers of every shared cache that are not on disk yet."""
+    for cache in _CACHES.values():
+        cache.save()
+
+
+def default_backend(pool_size: int = DEFAULT_CONCURRENCY) -> PlacesBackend:
+    """The shared PlacesBackend (one session, pool and rate limiter), rebuilt only for a larger pool."""
+    global _DEFAULT_BACKEND
+    if _DEFAULT_BACKEND is None or _DEFAULT_BACKEND.pool_size < pool_size:
+        if _DEFAULT_BACKEND is not None:
+            _DEFAULT_BACKEND.close()
+        _DEFAULT_BACKEND = PlacesBackend(pool_size=pool_size)
+    return _DEFAULT_BACKEND
+
+
+async def _lookup_all(
+    names: list[str],
+    backend: GeocodingBackend,
+    concurrency: int,
+    on_result: Callable[[str, Union[list[Location], Exception]], None],
+) -> None:
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=max(concurrency, 1)) as pool:
+
+        async def lookup(name: str) -> None:
+            try:
+                result = await loop.run_in_executor(pool, backend.lookup, name)
+            except Exception as error:  # a failed lookup must not stop the batch
+                result = error
+            on_result(name, result)
+
+        await asyncio.gather(*(lookup(name) for name in names))
+
+
+def _run(coroutine) -> None:
+    """Run `coroutine` to completion, also from code already inside an event loop (notebooks)."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(coroutine)
+        return
+    with ThreadPoolExecutor(max_workers=1) as runner:
+        runner.submit(asyncio.run, coroutine).result()
+
+
+def geocode_investors(
+    investors: Iterable[str],
+    cache: Union[GeocodeCache, str, Path],
+    backend: Optional[GeocodingBackend] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    refresh: bool = False,
+    save: bool = True,
+) -> dict[str, list[Location]]:
+    """Locations of every investor name, querying `backend` only for names missing from `cache`.
+
+    A cache path resolves to its shared_cache; `backend` defaults to the shared
+    default_backend. `refresh=True` queries every name again. Names whose lookup
+    failed map to an empty list and stay uncached. With `save=False` the new answers
+    are written at the next checkpoint or at exit instead of at the end of the call.
+    """
+    cache = cache if isinstance(cache, GeocodeCache) else shared_cache(cache)
+    names = [name for name in dict.fromkeys(investors) if isinstance(name, str) and normalize_name(name)]
+    # one query per normalized name, under its first spelling
+    first_spelling: dict[str, str] = {}
+    for name in names:
+        first_spelling.setdefault(normalize_name(name), name)
+    pending = [name for key, name in first_spelling.items() if refresh or key not in cache]
+
+    failures: dict[str, Exception] = {}
+    if pending:
+        backend = backend or default_backend(concurrency)
+
+        def on_result(name: str, result: Union[list[Location], Exception]) -> None:
+            if isinstance(result, Exception):
+                failures[name] = result
+                return
+            cache.put(name, backend.name, result)
+            cache.checkpoint()
+
+        try:
+            if len(pending) == 1:  # no event loop or thread pool for a single name
+                try:
+                    result = backend.lookup(pending[0])
+                except Exception as error:
+                    result = error
+                on_result(pending[0], result)
+            else:
+                _run(_lookup_all(pending, backend, concurrency, on_result))
+        finally:
+            if save:
+                cache.save()
+        if failures:
+            example = next(iter(failures.items()))
+            print(f"{len(failures)} of {len(pending)} geocoding lookups failed (e.g. {example[0]!r}: {example[1]}); they will be retried next run")
+
+    return {name: cache.get(name) or [] for name in names}
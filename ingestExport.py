@@ -0,0 +1,215 @@
+"""
+Stream the raw multi-round source export into DB_Out without loading it whole.
+
+The export (csv, xlsx or parquet) is read in record batches. Each batch goes
+through the same split/explode helpers used for the one-shot build
+(Library.roundSplit, Library.investorInfo) and is appended to the outputs
+through streaming parquet writers, so peak memory depends on the batch size
+only:
+
+- DB_Out/RoundSplit/round_year=YYYY/part-0.parquet  one writer per round year
+- DB_Out/InvestorInfo.parquet                         deduplicated across batches
+- DB_Out/RoundSplit_malformed.parquet                 export rows roundSplit could not parse
+
+Every round also gets its standardized stage (std_round, Library.normalizeRoundLabels)
+at ingestion, and an existing DB_Out/DB_rounds.parquet gets the same column
+(Library.storeStdRound), so readers no longer normalize the raw labels themselves.
+DB_firms and DB_investors get ISO3 and EU flag columns next to their country
+(Library.storeCountryCodes) in the same way.
+
+Usage:
+    python ingestExport.py path/to/export.xlsx [--batch-size 5000] [--out DB_Out]
+"""
+
+import argparse
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import Library as mylib
+
+DEFAULT_BATCH_SIZE = 5_000
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+ROUND_SPLIT_SCHEMA = pa.schema([
+    ("Investor", pa.string()),
+    ("Amount", pa.float64()),
+    ("Currency", pa.string()),
+    ("Amount in EUR", pa.float64()),
+    ("Round type", pa.string()),
+    ("std_round", pa.string()),
+    ("Round date", pa.timestamp("ns")),
+    ("Target firm", pa.string()),
+    ("company_id", pa.int64()),
+    ("company_country", pa.string()),
+])
+INVESTOR_INFO_SCHEMA = pa.schema([
+    ("Investor", pa.string()),
+    ("investor_types", pa.string()),
+])
+# "row" is the position of the row in the source export (0-based, header excluded)
+MALFORMED_SCHEMA = pa.schema([
+    ("row", pa.int64()),
+    ("ID", pa.int64()),
+    ("Name", pa.string()),
+    ("reason", pa.string()),
+])
+
+
+def iter_export_batches(path: Path, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[pd.DataFrame]:
+    """Yield the source export as DataFrames of at most `batch_size` rows."""
+    suffix = path.suffix.lower()
+    if suffix == ".parquet":
+        parquet_file = pq.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            yield batch.to_pandas()
+    elif suffix == ".csv":
+        for chunk in pd.read_csv(path, chunksize=batch_size, dtype=object):
+            chunk["ID"] = pd.to_numeric(chunk["ID"], errors="coerce")
+            yield chunk
+    elif suffix in (".xlsx", ".xlsm"):
+        import openpyxl
+
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(col) for col in next(rows)]
+            buffer = []
+            for row in rows:
+                buffer.append(row)
+                if len(buffer) == batch_size:
+                    yield pd.DataFrame(buffer, columns=header)
+                    buffer = []
+            if buffer:
+                yield pd.DataFrame(buffer, columns=header)
+        finally:
+            workbook.close()
+    else:
+        raise ValueError(f"Unsupported export format '{suffix}'. Expected .csv, .xlsx or .parquet")
+
+
+def _to_malformed_table(malformed: pd.DataFrame, first_row: int) -> pa.Table:
+    malformed = malformed[["row", "ID", "Name", "reason"]].copy()
+    malformed["row"] = malformed["row"].astype("int64") + first_row
+    malformed["ID"] = pd.to_numeric(malformed["ID"], errors="coerce").astype("Int64")
+    for col in ("Name", "reason"):
+        malformed[col] = malformed[col].astype("string")
+    return pa.Table.from_pandas(malformed, schema=MALFORMED_SCHEMA, preserve_index=False)
+
+
+def _to_round_split_table(rounds: pd.DataFrame) -> pa.Table:
+    rounds = rounds.copy()
+    rounds["company_id"] = pd.to_numeric(rounds["company_id"], errors="coerce").astype("Int64")
+    rounds["Round date"] = pd.to_datetime(rounds["Round date"], errors="coerce").astype("datetime64[ns]")
+    for col in ("Amount", "Amount in EUR"):
+        rounds[col] = pd.to_numeric(rounds[col], errors="coerce").astype(float)
+    rounds["std_round"] = mylib.normalizeRoundLabels(rounds["Round type"])
+    for col in ("Investor", "Currency", "Round type", "std_round", "Target firm", "company_country"):
+        rounds[col] = rounds[col].astype("string")
+    return pa.Table.from_pandas(rounds, schema=ROUND_SPLIT_SCHEMA, preserve_index=False)
+
+
+class YearPartitionedWriter:
+    """Append tables to hive-style `round_year=YYYY` partitions, one open ParquetWriter per year."""
+
+    def __init__(self, root: Path, schema: pa.Schema, date_column: str = "Round date"):
+        self.root = root
+        self.schema = schema
+        self.date_column = date_column
+        self.writers: dict[str, pq.ParquetWriter] = {}
+        self.rows_written = 0
+
+    def write(self, rounds: pd.DataFrame) -> None:
+        years = pd.to_datetime(rounds[self.date_column], errors="coerce").dt.year
+        keys = years.astype("Int64").astype("string").fillna(NULL_PARTITION)
+        for key, part in rounds.groupby(keys, sort=False):
+            writer = self.writers.get(key)
+            if writer is None:
+                directory = self.root / f"round_year={key}"
+                directory.mkdir(parents=True, exist_ok=True)
+                writer = pq.ParquetWriter(directory / "part-0.parquet", self.schema)
+                self.writers[key] = writer
+            writer.write_table(_to_round_split_table(part))
+            self.rows_written += len(part)
+
+    def close(self) -> None:
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
+
+
+def ingest_export(
+    source: Path,
+    out_dir: Optional[Path] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> dict[str, int]:
+    """Stream `source` into the RoundSplit dataset and the InvestorInfo table; returns row counts.
+
+    The rows roundSplit cannot parse are written to RoundSplit_malformed.parquet
+    (source row, ID, Name, reason), as the one-shot build reports them.
+    """
+    out_dir = out_dir or mylib._find_db_out_dir()
+    round_root = out_dir / "RoundSplit"
+    if round_root.exists() and any(round_root.iterdir()):
+        raise FileExistsError(f"{round_root} is not empty; remove it before re-ingesting the export.")
+
+    round_writer = YearPartitionedWriter(round_root, ROUND_SPLIT_SCHEMA)
+    investor_writer = pq.ParquetWriter(out_dir / "InvestorInfo.parquet", INVESTOR_INFO_SCHEMA)
+    malformed_writer = pq.ParquetWriter(out_dir / "RoundSplit_malformed.parquet", MALFORMED_SCHEMA)
+    seen_investors: set[tuple] = set()
+    counts = {"batches": 0, "source_rows": 0, "rounds": 0, "investors": 0, "malformed": 0}
+    try:
+        for batch in iter_export_batches(source, batch_size):
+            counts["batches"] += 1
+            first_row = counts["source_rows"]
+            counts["source_rows"] += len(batch)
+
+            rounds, malformed = mylib.roundSplit([], batch, return_malformed=True)
+            counts["malformed"] += len(malformed)
+            if not malformed.empty:
+                malformed_writer.write_table(_to_malformed_table(malformed, first_row))
+            if not rounds.empty:
+                round_writer.write(rounds)
+
+            investors = mylib.investorInfo(batch)
+            if not investors.empty:
+                investors = investors[["Investor", "investor_types"]].astype("string")
+                keys = pd.Series(list(zip(investors["Investor"], investors["investor_types"])), index=investors.index)
+                fresh = ~keys.isin(seen_investors)
+                seen_investors.update(keys[fresh])
+                investors = investors[fresh.to_numpy()]
+                investor_writer.write_table(
+                    pa.Table.from_pandas(investors, schema=INVESTOR_INFO_SCHEMA, preserve_index=False)
+                )
+                counts["investors"] += len(investors)
+    finally:
+        round_writer.close()
+        investor_writer.close()
+        malformed_writer.close()
+    counts["rounds"] = round_writer.rows_written
+    if (out_dir / "DB_rounds.parquet").is_file():
+        mylib.storeStdRound(out_dir)
+    mylib.storeCountryCodes(out_dir)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("source", type=Path, help="raw export (.csv, .xlsx or .parquet)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument("--out", type=Path, default=None, help="output folder (default: DB_Out)")
+    args = parser.parse_args()
+
+    counts = ingest_export(args.source, args.out, args.batch_size)
+    print(
+        f"Ingested {counts['source_rows']} export rows in {counts['batches']} batches -> "
+        f"{counts['rounds']} rounds, {counts['investors']} investor/type pairs "
+        f"({counts['malformed']} malformed rows skipped, listed in RoundSplit_malformed.parquet)"
+    )
+
+
+if __name__ == "__main__":
+    main()